@@ -2,16 +2,82 @@
 Adapter-Pattern: Universal BasePrompt → modell-spezifische Formate
 """
 
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
+from importlib import metadata
 import re
+import threading
 
 from backend.models import BasePrompt
 
 
+class PromptTextParts(NamedTuple):
+    """Text fragments of a BasePrompt, collected once and shared by all adapters."""
+    subject: List[str]
+    environment: List[str]
+    style: List[str]
+
+    def ordered(self) -> List[str]:
+        """Subject → environment → style, empty fragments dropped."""
+        return [p for p in (*self.subject, *self.environment, *self.style) if p]
+
+
+def collect_text_parts(base_prompt: BasePrompt) -> PromptTextParts:
+    """Walk the text fields of a BasePrompt once."""
+    subject_parts: List[str] = []
+    subjects = getattr(base_prompt, "subjects", None)
+    if subjects:
+        for subject in subjects:
+            if subject and subject.description:
+                subject_parts.append(subject.description)
+            subject_parts.extend(getattr(subject, "attributes", None) or [])
+    else:
+        subject = getattr(base_prompt, "subject", None)
+        if subject:
+            if subject.description:
+                subject_parts.append(subject.description)
+            subject_parts.extend(getattr(subject, "attributes", None) or [])
+
+    environment_parts: List[str] = []
+    environment = getattr(base_prompt, "environment", None)
+    if environment:
+        if environment.location:
+            environment_parts.append(environment.location)
+        if environment.atmosphere:
+            environment_parts.append(environment.atmosphere)
+        if environment.weather:
+            environment_parts.append(environment.weather)
+
+    style_parts: List[str] = []
+    style = getattr(base_prompt, "style", None)
+    if style:
+        if style.lighting:
+            style_parts.append(style.lighting)
+        if style.camera:
+            style_parts.append(style.camera)
+        if style.film_stock:
+            style_parts.append(style.film_stock)
+        style_parts.extend(getattr(style, "aesthetics", None) or [])
+
+    return PromptTextParts(subject_parts, environment_parts, style_parts)
+
+
 class BaseAdapter:
+    """
+    Adapters are stateless: one instance per target is registered and shared
+    across requests.
+    """
     model_name: str = "base"
+    aliases: Tuple[str, ...] = ()
+
+    def capabilities(self) -> Dict[str, Any]:
+        """What the target supports (samplers, aspect ratios, ...), for listings."""
+        return {}
 
-    def adapt(self, base_prompt: BasePrompt) -> Dict[str, Any]:
+    def adapt(self, base_prompt: BasePrompt, parts: Optional[PromptTextParts] = None) -> Dict[str, Any]:
+        """
+        Map a BasePrompt to the target payload.
+        ``parts`` may be passed in when the caller already collected them.
+        """
         raise NotImplementedError
 
 
@@ -26,6 +92,7 @@ class BaseAdapter:
 # - meta includes baseprompt_version and warnings
 class FluxAdapter(BaseAdapter):
     model_name = "flux"
+    aliases = ("flux",)
 
     _ASPECT_RATIO_MAP: Dict[str, Tuple[int, int]] = {
         "1:1": (1024, 1024),
@@ -42,6 +109,16 @@ class FluxAdapter(BaseAdapter):
         "dpmpp_2m_sde",
     }
 
+    def capabilities(self) -> Dict[str, Any]:
+        return {
+            "samplers": sorted(self._SUPPORTED_SAMPLERS),
+            "aspect_ratios": list(self._ASPECT_RATIO_MAP),
+            "negative_prompt": True,
+            "seed": True,
+            "steps": True,
+            "guidance": True,
+        }
+
     def _parse_resolution(self, resolution_value: Any) -> Optional[Tuple[int, int]]:
         if isinstance(resolution_value, str):
             match = re.match(r"^\s*(\d+)\s*x\s*(\d+)\s*$", resolution_value)
@@ -69,49 +146,10 @@ class FluxAdapter(BaseAdapter):
 
         return self._ASPECT_RATIO_MAP["1:1"]
 
-    def _collect_subject_parts(self, base_prompt: BasePrompt) -> List[str]:
-        parts: List[str] = []
-        subjects = getattr(base_prompt, "subjects", None)
-        if subjects:
-            for subject in subjects:
-                if subject and subject.description:
-                    parts.append(subject.description)
-                attributes = getattr(subject, "attributes", None) or []
-                parts.extend(attributes)
-            return parts
-
-        subject = getattr(base_prompt, "subject", None)
-        if subject:
-            parts.append(subject.description)
-            parts.extend(subject.attributes or [])
-        return parts
-
-    def adapt(self, base_prompt: BasePrompt) -> Dict[str, Any]:
+    def adapt(self, base_prompt: BasePrompt, parts: Optional[PromptTextParts] = None) -> Dict[str, Any]:
         warnings: List[str] = []
-
-        style_parts: List[str] = []
-        if base_prompt.style:
-            if base_prompt.style.lighting:
-                style_parts.append(base_prompt.style.lighting)
-            if base_prompt.style.camera:
-                style_parts.append(base_prompt.style.camera)
-            if base_prompt.style.film_stock:
-                style_parts.append(base_prompt.style.film_stock)
-            if base_prompt.style.aesthetics:
-                style_parts.extend(base_prompt.style.aesthetics)
-
-        prompt_parts = self._collect_subject_parts(base_prompt)
-
-        environment = getattr(base_prompt, "environment", None)
-        if environment:
-            if environment.location:
-                prompt_parts.append(environment.location)
-            if environment.atmosphere:
-                prompt_parts.append(environment.atmosphere)
-            if environment.weather:
-                prompt_parts.append(environment.weather)
-
-        prompt_parts.extend(style_parts)
+        if parts is None:
+            parts = collect_text_parts(base_prompt)
 
         width, height = self._resolve_dimensions(base_prompt)
 
@@ -133,7 +171,7 @@ class FluxAdapter(BaseAdapter):
 
         payload: Dict[str, Any] = {
             "model": "flux",
-            "prompt": ", ".join([p for p in prompt_parts if p]),
+            "prompt": ", ".join(parts.ordered()),
             "negative_prompt": negative_prompt,
             "width": width,
             "height": height,
@@ -166,50 +204,26 @@ class BananaAdapter(BaseAdapter):
     - No breaking changes from FluxAdapter
     """
     model_name = "banana-pro"
+    aliases = ("banana", "banana-pro", "nano banana", "nano-banana")
+
+    def capabilities(self) -> Dict[str, Any]:
+        return {
+            "samplers": [],
+            "aspect_ratios": [],
+            "negative_prompt": False,
+            "seed": True,
+            "steps": True,
+            "guidance": False,
+        }
 
-    def _collect_banana_text_parts(self, base_prompt: BasePrompt) -> List[str]:
-        """Collect all text parts for Banana prompt in correct order."""
-        parts: List[str] = []
-
-        # Subject (required)
-        subject = getattr(base_prompt, "subject", None)
-        if subject:
-            if subject.description:
-                parts.append(subject.description)
-            attributes = getattr(subject, "attributes", None) or []
-            parts.extend(attributes)
-
-        # Environment (optional)
-        environment = getattr(base_prompt, "environment", None)
-        if environment:
-            if environment.location:
-                parts.append(environment.location)
-            if environment.atmosphere:
-                parts.append(environment.atmosphere)
-            if environment.weather:
-                parts.append(environment.weather)
-
-        # Style (optional)
-        style = getattr(base_prompt, "style", None)
-        if style:
-            if style.lighting:
-                parts.append(style.lighting)
-            if style.camera:
-                parts.append(style.camera)
-            if style.film_stock:
-                parts.append(style.film_stock)
-            aesthetics = getattr(style, "aesthetics", None) or []
-            parts.extend(aesthetics)
-
-        return parts
-
-    def adapt(self, base_prompt: BasePrompt) -> Dict[str, Any]:
+    def adapt(self, base_prompt: BasePrompt, parts: Optional[PromptTextParts] = None) -> Dict[str, Any]:
         """
         Adapt BasePrompt to Banana-pro format.
         Returns a payload with model, contents (message structure).
         """
-        text_parts = self._collect_banana_text_parts(base_prompt)
-        text = ". ".join([p for p in text_parts if p])
+        if parts is None:
+            parts = collect_text_parts(base_prompt)
+        text = ". ".join(parts.ordered())
 
         payload: Dict[str, Any] = {
             "model": "banana-pro",
@@ -240,10 +254,135 @@ class BananaAdapter(BaseAdapter):
         return payload
 
 
+# ============================================================================
+# ADAPTER REGISTRY
+# ============================================================================
+
+# Third-party packages register adapters under this entry point group, e.g.
+#   [project.entry-points."promptos.adapters"]
+#   sdxl = "my_package.adapters:SDXLAdapter"
+ENTRY_POINT_GROUP = "promptos.adapters"
+
+
+def _normalize_alias(alias: str) -> str:
+    return alias.lower().strip()
+
+
+class AdapterRegistry:
+    """
+    Maps normalized aliases to shared adapter singletons (O(1) lookup).
+    Entry point plugins are loaded lazily on first use.
+    """
+
+    def __init__(self, entry_point_group: Optional[str] = ENTRY_POINT_GROUP):
+        self._by_alias: Dict[str, BaseAdapter] = {}
+        self._by_name: Dict[str, BaseAdapter] = {}
+        self._entry_point_group = entry_point_group
+        self._plugins_loaded = entry_point_group is None
+        self._lock = threading.Lock()
+
+    def register(self, adapter: BaseAdapter, aliases: Iterable[str] = ()) -> BaseAdapter:
+        """
+        Register an adapter instance under its model_name and aliases.
+
+        Raises:
+            ValueError: If an alias is already bound to a different model
+        """
+        names = {_normalize_alias(a) for a in (adapter.model_name, *adapter.aliases, *aliases)}
+        for alias in names:
+            existing = self._by_alias.get(alias)
+            if existing is not None and existing.model_name != adapter.model_name:
+                raise ValueError(
+                    f"Alias '{alias}' ist bereits für Modell '{existing.model_name}' registriert"
+                )
+        for alias in names:
+            self._by_alias[alias] = adapter
+        self._by_name[adapter.model_name] = adapter
+        return adapter
+
+    def load_entry_points(self) -> None:
+        """Register adapters advertised via the entry point group (once)."""
+        with self._lock:
+            if self._plugins_loaded:
+                return
+            self._plugins_loaded = True
+            for entry_point in metadata.entry_points(group=self._entry_point_group):
+                try:
+                    loaded = entry_point.load()
+                    adapter = loaded() if isinstance(loaded, type) else loaded
+                    if not isinstance(adapter, BaseAdapter):
+                        raise TypeError(f"{entry_point.value} ist kein BaseAdapter")
+                    self.register(adapter, aliases=(entry_point.name,))
+                except Exception as e:
+                    print(f"⚠️  Adapter-Plugin '{entry_point.name}' nicht geladen: {e}")
+
+    def get(self, model: str) -> BaseAdapter:
+        if not self._plugins_loaded:
+            self.load_entry_points()
+        adapter = self._by_alias.get(model) or self._by_alias.get(_normalize_alias(model))
+        if adapter is None:
+            raise ValueError(f"Unbekanntes Modell: {model}")
+        return adapter
+
+    def names(self) -> List[str]:
+        if not self._plugins_loaded:
+            self.load_entry_points()
+        return list(self._by_name)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Registered targets with aliases and capabilities."""
+        if not self._plugins_loaded:
+            self.load_entry_points()
+        return [
+            {
+                "model": adapter.model_name,
+                "aliases": sorted(a for a, bound in self._by_alias.items() if bound is adapter),
+                "capabilities": adapter.capabilities(),
+            }
+            for adapter in self._by_name.values()
+        ]
+
+
+registry = AdapterRegistry()
+registry.register(FluxAdapter())
+registry.register(BananaAdapter())
+
+
+def register_adapter(adapter: BaseAdapter, aliases: Iterable[str] = ()) -> BaseAdapter:
+    """Register an additional adapter with the default registry."""
+    return registry.register(adapter, aliases)
+
+
 def get_adapter(model: str) -> BaseAdapter:
-    model_normalized = model.lower().strip()
-    if model_normalized in {"flux"}:
-        return FluxAdapter()
-    if model_normalized in {"banana", "banana-pro", "nano banana", "nano-banana"}:
-        return BananaAdapter()
-    raise ValueError(f"Unbekanntes Modell: {model}")
+    return registry.get(model)
+
+
+def list_adapters() -> List[Dict[str, Any]]:
+    return registry.describe()
+
+
+def adapt_many(base_prompt: BasePrompt, targets: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Adapt one (already validated) BasePrompt to several targets in one pass.
+
+    Text parts are collected once and shared by all adapters. Aliases that
+    resolve to the same adapter are emitted once under its model_name.
+    Without ``targets`` every registered adapter is used.
+
+    Returns:
+        {model_name: {"data": payload, "warnings": [...]}}
+
+    Raises:
+        ValueError: If any target is unknown
+    """
+    adapters = [get_adapter(target) for target in (targets or registry.names())]
+    parts = collect_text_parts(base_prompt)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for adapter in adapters:
+        if adapter.model_name in results:
+            continue
+        payload = adapter.adapt(base_prompt, parts)
+        warnings = (payload.get("meta") or {}).get("warnings") or []
+        results[adapter.model_name] = {"data": payload, "warnings": list(warnings)}
+    return results
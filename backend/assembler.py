@@ -0,0 +1,313 @@
+"""
+Local template assembler: ZImageTurboPrompt -> prompt prose without an LLM
+
+Renders the modules in the order the JSON -> text system prompt prescribes
+(identity and physical traits, action, setting, lighting, atmosphere,
+composition, text elements, technical specs) from precompiled sentence
+templates and phrase tables for the anti-bias enums. Runs in microseconds
+and is deterministic, which makes it the default for drafts and previews;
+the Gemini path ("polish") turns the same JSON into 600-1000 words.
+
+Text elements are always set in straight double quotes; quotes inside the
+content become single quotes so the quoted span stays unambiguous.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from backend.models import (
+    ActionModule,
+    CharacterProfile,
+    EyeDescription,
+    FacialStructure,
+    HairDescription,
+    LightingType,
+    PromptAssemblyOutput,
+    SceneModule,
+    SkinTone,
+    TextElement,
+    TextElementsModule,
+    ZImageTurboPrompt,
+)
+from backend.rewrite import ForbiddenWordRewriter, RewriteResult
+
+# "local": template assembly only; "polish": Gemini writes the prose
+PROMPT_MODES = ("local", "polish")
+
+
+# ============================================================================
+# Phrase tables
+# ============================================================================
+
+SKIN_TONE_PHRASES: Dict[SkinTone, str] = {
+    SkinTone.LIGHT_WARM: "a light skin tone with natural warmth",
+    SkinTone.LIGHT_COOL: "a light skin tone with cool undertones",
+    SkinTone.MEDIUM_GOLDEN: "a medium skin tone with golden undertones",
+    SkinTone.MEDIUM_OLIVE: "a medium skin tone with olive undertones",
+    SkinTone.MEDIUM_DARK_WARM: "a medium-dark skin tone with warm undertones",
+    SkinTone.DEEP_RICH: "a deep skin tone with rich brown tones",
+}
+
+HAIR_PHRASES: Dict[HairDescription, str] = {
+    HairDescription.LONG_BLONDE: "long straight blonde hair",
+    HairDescription.SHORT_BROWN: "short curly brown hair",
+    HairDescription.WAVY_AUBURN: "wavy auburn hair that falls to the shoulders",
+    HairDescription.TIGHT_BLACK: "black hair in tight coils",
+    HairDescription.SILVER_GREY: "silver-grey hair cropped short",
+    HairDescription.STRAIGHT_BLACK: "straight black hair parted in the middle",
+}
+
+FACE_PHRASES: Dict[FacialStructure, str] = {
+    FacialStructure.OVAL: "an oval face",
+    FacialStructure.ROUND: "a round face with full cheeks",
+    FacialStructure.ANGULAR: "an angular face with defined cheekbones",
+    FacialStructure.SQUARE: "a square jawline",
+    FacialStructure.SOFT: "a soft jawline",
+    FacialStructure.HEART: "a heart-shaped face",
+}
+
+EYE_PHRASES: Dict[EyeDescription, str] = {
+    EyeDescription.LIGHT_BLUE: "light blue eyes",
+    EyeDescription.DEEP_BROWN: "deep brown eyes",
+    EyeDescription.HAZEL_GOLD: "hazel eyes with gold flecks",
+    EyeDescription.GREY_GREEN: "grey-green eyes",
+    EyeDescription.ALMOND: "almond-shaped eyes",
+    EyeDescription.DEEP_SET: "deep-set eyes",
+    EyeDescription.WIDE_SET: "wide-set eyes",
+}
+
+LIGHTING_PHRASES: Dict[LightingType, str] = {
+    LightingType.SOFT_DAYLIGHT: "soft daylight",
+    LightingType.OVERCAST_SKY: "the flat, even light of an overcast sky",
+    LightingType.SHARP_SHADOWS: "hard direct light that casts sharp shadows",
+    LightingType.GOLDEN_HOUR: "low golden hour sun",
+    LightingType.DIFFUSED_WINDOW: "diffused light from a nearby window",
+    LightingType.HARSH_MIDDAY: "harsh midday sun from almost directly overhead",
+    LightingType.WARM_INCANDESCENT: "the warm glow of incandescent bulbs",
+    LightingType.COOL_FLUORESCENT: "cool fluorescent light",
+    LightingType.RIM_LIGHTING: "rim light from behind that outlines the figure",
+    LightingType.DAPPLED_LEAVES: "dappled light filtering through leaves",
+}
+
+
+# ============================================================================
+# Sentence templates (bound ``str.format``, parsed once at import)
+# ============================================================================
+
+_IDENTITY = "{name} is {article} {age}-year-old {background}.".format
+_PHYSICAL = "{first} has {skin}, {hair}, {face} and {eyes}.".format
+_FEATURES = "{first} also has {features}.".format
+_CLOTHING = "{first} wears {clothing}.".format
+_NOTES = "Further distinguishing details: {notes}.".format
+_ACTION_GERUND = "{first} is {action}.".format
+_SETTING = "The scene takes place {setting}.".format
+_LIGHTING = "The scene is lit by {lighting}.".format
+_LIGHTING_DETAILS = "The light produces {details}.".format
+_ATMOSPHERE = "The atmosphere is defined by {atmosphere}.".format
+_COMPOSITION = "The composition shows {composition}.".format
+_TEXT_ELEMENT = 'The words "{content}" appear {placement}, set in {font}{extras}.'.format
+
+_PREPOSITIONS = (
+    "in ", "at ", "on ", "inside ", "outside ", "under ", "near ", "beside ",
+    "by ", "along ", "across ", "above ", "below ", "behind ", "among ", "within ",
+)
+_ARTICLES = ("a ", "an ", "the ")
+# Actions opening with one of these read as "<name> is <action>"; anything
+# else ("Bring", "King's", imperatives, noun phrases) is kept as written
+_ACTION_GERUNDS = frozenset((
+    "standing", "sitting", "walking", "running", "leaning", "kneeling", "lying", "crouching",
+    "holding", "carrying", "looking", "gazing", "reading", "writing", "smiling", "laughing",
+    "talking", "drinking", "eating", "cooking", "dancing", "waiting", "crossing", "posing",
+    "playing", "working", "riding", "resting", "stretching", "painting", "singing", "jumping",
+    "typing", "climbing", "pouring", "adjusting", "checking", "waving", "pointing", "hugging",
+))
+_OUTER_QUOTES = re.compile(r'^[\s"“”„«»]+|[\s"“”„«»]+$')
+_INNER_QUOTES = str.maketrans({'"': "'", "“": "'", "”": "'", "„": "'"})
+_WHITESPACE = re.compile(r"\s+")
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _clean(text: Optional[str]) -> str:
+    return _WHITESPACE.sub(" ", text or "").strip().rstrip(".;,")
+
+
+def _lower_first(text: str) -> str:
+    return text[:1].lower() + text[1:] if text[:1].isupper() and not text[1:2].isupper() else text
+
+
+def _capitalize(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+def _sentence(text: str) -> str:
+    text = _capitalize(_clean(text))
+    return text if not text or text[-1] in ".!?" else text + "."
+
+
+def _with_article(phrase: str) -> str:
+    lowered = phrase.lower()
+    if lowered.startswith(_ARTICLES) or lowered.startswith(_PREPOSITIONS):
+        return phrase
+    return ("an " if lowered[:1] in "aeiou" else "a ") + phrase
+
+
+def _location(phrase: str) -> str:
+    """"historic piazza in Bari" -> "in a historic piazza in Bari"; prepositions are kept."""
+    phrase = _lower_first(phrase)
+    if phrase.lower().startswith(_PREPOSITIONS):
+        return phrase
+    return "in " + _with_article(phrase)
+
+
+def _age_article(age: int) -> str:
+    # "an 8-year-old", "an 11-year-old", "an 18-year-old", "an 80-year-old"
+    return "an" if age in (8, 11, 18) or 80 <= age <= 89 else "a"
+
+
+def quote_text(content: str) -> str:
+    """Normalize ``TextElement.content`` for placement inside straight double quotes."""
+    content = _OUTER_QUOTES.sub("", _WHITESPACE.sub(" ", content))
+    return content.translate(_INNER_QUOTES)
+
+
+def _enum_phrase(table: Dict, value, fallback_article: bool = False) -> str:
+    phrase = table.get(value)
+    if phrase is None:
+        phrase = str(getattr(value, "value", value))
+        return _with_article(phrase) if fallback_article else phrase
+    return phrase
+
+
+# ============================================================================
+# Module renderers
+# ============================================================================
+
+def render_character(character: CharacterProfile) -> List[str]:
+    identity = character.identity
+    first = identity.name.split()[0]
+    physical = character.physical_descriptors
+    sentences = [
+        _IDENTITY(
+            name=identity.name,
+            article=_age_article(identity.age),
+            age=identity.age,
+            background=_clean(identity.background),
+        ),
+        _PHYSICAL(
+            first=first,
+            skin=_enum_phrase(SKIN_TONE_PHRASES, physical.skin_tone, fallback_article=True),
+            hair=_enum_phrase(HAIR_PHRASES, physical.hair),
+            face=_enum_phrase(FACE_PHRASES, physical.facial_structure, fallback_article=True),
+            eyes=_enum_phrase(EYE_PHRASES, physical.eyes),
+        ),
+    ]
+    if physical.additional_features:
+        sentences.append(_FEATURES(first=first, features=_lower_first(_clean(physical.additional_features))))
+    sentences.append(_CLOTHING(first=first, clothing=_lower_first(_clean(character.clothing))))
+    if character.special_notes:
+        sentences.append(_NOTES(notes=_lower_first(_clean(character.special_notes))))
+    return sentences
+
+
+def render_action(action: ActionModule, first_name: str) -> List[str]:
+    text = _clean(action.action)
+    if action.pose_details:
+        # Pose details read as a trailing clause ("..., other hand gesturing")
+        text += ", " + _lower_first(_clean(action.pose_details))
+    if text.split(" ", 1)[0].lower().rstrip(",;:") in _ACTION_GERUNDS:
+        return [_ACTION_GERUND(first=first_name, action=_lower_first(text))]
+    return [_sentence(text)]
+
+
+def render_scene(scene: SceneModule) -> List[str]:
+    sentences = [
+        _SETTING(setting=_location(_clean(scene.setting))),
+        _LIGHTING(lighting=_enum_phrase(LIGHTING_PHRASES, scene.lighting)),
+    ]
+    if scene.lighting_details:
+        sentences.append(_LIGHTING_DETAILS(details=_lower_first(_clean(scene.lighting_details))))
+    sentences.append(_ATMOSPHERE(atmosphere=_lower_first(_clean(scene.atmosphere))))
+    sentences.append(_COMPOSITION(composition=_with_article(_lower_first(_clean(scene.composition)))))
+    return sentences
+
+
+def render_text_element(element: TextElement) -> str:
+    placement = _lower_first(_clean(element.placement))
+    if not placement.lower().startswith(_PREPOSITIONS):
+        placement = "at the " + placement if not placement.lower().startswith(_ARTICLES) else "at " + placement
+    extras = ""
+    if element.size:
+        extras += ", sized as " + _with_article(_lower_first(_clean(element.size)))
+    if element.surface_material:
+        extras += ", made of " + _lower_first(_clean(element.surface_material))
+    return _TEXT_ELEMENT(
+        content=quote_text(element.content),
+        placement=placement,
+        font=_lower_first(_clean(element.font_style)),
+        extras=extras,
+    )
+
+
+def render_text_elements(module: Optional[TextElementsModule]) -> List[str]:
+    if module is None or not module.elements:
+        return []
+    return [render_text_element(element) for element in module.elements if element.content.strip()]
+
+
+def assemble_prompt_text(prompt_json: ZImageTurboPrompt) -> str:
+    """Prompt prose for ``prompt_json``: one paragraph per module, fixed order."""
+    first = prompt_json.character.identity.name.split()[0]
+    paragraphs = [
+        render_character(prompt_json.character) + render_action(prompt_json.action, first),
+        render_scene(prompt_json.scene),
+        render_text_elements(prompt_json.text_elements),
+    ]
+    if prompt_json.scene.technical_specs:
+        paragraphs.append([_sentence(prompt_json.scene.technical_specs)])
+    return "\n\n".join(" ".join(sentences) for sentences in paragraphs if sentences)
+
+
+def assembly_output(prompt_json: ZImageTurboPrompt, rewrite: RewriteResult) -> PromptAssemblyOutput:
+    """Final output for a rewritten prompt text (shared by the local and the Gemini path)."""
+    forbidden_found = list(dict.fromkeys(m.word for m in rewrite.unresolved))
+    if forbidden_found:
+        print(f"⚠️  WARNUNG: Forbidden Words gefunden: {forbidden_found}")
+        print(f"   Final Prompt:\n{rewrite.text}")
+    return PromptAssemblyOutput(
+        json_structure=prompt_json,
+        full_prompt_text=rewrite.text,
+        forbidden_words_check=not forbidden_found,
+        estimated_word_count=len(rewrite.text.split()),
+        rewritten_words=list(dict.fromkeys(m.word for m in rewrite.replaced)),
+    )
+
+
+def assemble_prompt(prompt_json: ZImageTurboPrompt, rewriter: ForbiddenWordRewriter) -> PromptAssemblyOutput:
+    """
+    The local prompt path: template assembly plus the forbidden-word rewrite
+    (user-supplied fields may still contain them). ``rewriter`` is the app's
+    shared one, so its table and counters apply.
+    """
+    rewrite = rewriter.rewrite(assemble_prompt_text(prompt_json), prompt_json.character.identity.name)
+    if rewrite.replaced and rewrite.resolved:
+        rewriter.record_avoided()
+    return assembly_output(prompt_json, rewrite)
+
+
+if __name__ == "__main__":
+    # Benchmark: local assembly of the fixture prompt
+    import json
+    import timeit
+    from pathlib import Path
+
+    fixtures = Path(__file__).parent / "tests" / "fixtures" / "zimage_turbo_fixtures.json"
+    prompt = ZImageTurboPrompt(**json.loads(fixtures.read_text(encoding="utf-8"))["valid_prompt"])
+    print(assemble_prompt_text(prompt))
+    rewriter = ForbiddenWordRewriter()
+    runs = 10000
+    for label, fn in (("text", lambda: assemble_prompt_text(prompt)), ("with rewrite", lambda: assemble_prompt(prompt, rewriter))):
+        seconds = min(timeit.repeat(fn, number=runs, repeat=5)) / runs
+        print(f"{label:>12}: {seconds * 1e6:6.1f} µs")
@@ -0,0 +1,353 @@
+"""
+Content-addressed response cache for Gemini calls
+
+Keys are a SHA-256 over (task, system prompt, model name, generation config,
+normalized input, result schema). Editing a system prompt, a generation
+config or the result model therefore invalidates old entries automatically -
+no manual flush needed.
+
+Tiers:
+- MemoryLRUCache: in-process LRU with TTL
+- SQLiteCache: optional on-disk tier that survives restarts
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Type
+
+from pydantic import BaseModel
+
+from backend.env import env_float, env_int
+
+
+def normalize_input(user_input: str) -> str:
+    """Collapse whitespace so trivially different inputs share one entry."""
+    return " ".join(user_input.split())
+
+
+@functools.lru_cache(maxsize=None)
+def schema_fingerprint(model_cls: Type[BaseModel]) -> str:
+    """Hash of a Pydantic model's JSON schema; changes whenever the schema does."""
+    schema = json.dumps(model_cls.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(
+    task: str,
+    system_prompt: str,
+    model_name: str,
+    generation_config: Dict[str, Any],
+    user_input: str,
+    schema: str = "",
+) -> str:
+    """
+    Build a content-addressed cache key for one Gemini request.
+
+    ``schema`` is the fingerprint of the result model, so schema changes
+    invalidate old entries through the key as well.
+    """
+    payload = json.dumps(
+        {
+            "task": task,
+            "system_prompt": system_prompt,
+            "model": model_name,
+            "generation_config": generation_config,
+            "input": normalize_input(user_input),
+            "schema": schema,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(ABC):
+    """
+    Interface for a single cache tier storing serialized responses.
+
+    ``on_evict`` (if set) is called with every key the tier drops on its own
+    (LRU eviction, TTL expiry) - not for explicit ``delete``/``clear``.
+    """
+
+    on_evict: Optional[Callable[[str], None]] = None
+
+    def _evicted(self, keys: List[str]) -> None:
+        # Called outside the tier's lock: listeners may take locks of their own
+        if self.on_evict is not None:
+            for key in keys:
+                self.on_evict(key)
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored value or None."""
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store a value under ``key``."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key`` if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all entries."""
+
+
+class MemoryLRUCache(CacheBackend):
+    """Thread-safe in-process LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 86400.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is None or expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+            self.expirations += 1
+        self._evicted([key])
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        evicted = []
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.evictions += 1
+        self._evicted(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Number of live entries; expired ones are purged first."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (_, expires_at) in self._entries.items() if expires_at is not None and expires_at < now]
+            for k in expired:
+                del self._entries[k]
+            self.expirations += len(expired)
+            live = len(self._entries)
+        self._evicted(expired)
+        return live
+
+
+class SQLiteCache(CacheBackend):
+    """On-disk tier backed by a single SQLite table."""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 86400.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if not self.ttl_seconds or created_at + self.ttl_seconds >= time.time():
+                return value
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._conn.commit()
+        self._evicted([key])
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Two-tier cache: memory first, then the optional disk tier.
+    Disk hits are promoted into memory.
+
+    The ``*_async`` methods touch memory in-loop and run the disk tier in a
+    worker thread, so SQLite I/O never blocks the event loop.
+
+    Removal listeners (:meth:`add_removal_listener`) hear about every key
+    that is gone from the cache: deleted, expired, or evicted from memory
+    while there is no disk tier to fall back to.
+    """
+
+    def __init__(self, memory: Optional[MemoryLRUCache] = None, disk: Optional[CacheBackend] = None):
+        self.memory = memory if memory is not None else MemoryLRUCache()
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.discarded = 0
+        self._removal_listeners: Set[Callable[[str], None]] = set()
+        self.memory.on_evict = self._memory_evicted
+        if self.disk is not None:
+            self.disk.on_evict = self._removed
+
+    def add_removal_listener(self, listener: Callable[[str], None]) -> None:
+        """Call ``listener(key)`` whenever ``key`` leaves the cache (idempotent)."""
+        self._removal_listeners.add(listener)
+
+    def _removed(self, key: str) -> None:
+        for listener in list(self._removal_listeners):
+            listener(key)
+
+    def _memory_evicted(self, key: str) -> None:
+        # With a disk tier the entry is still there and gets promoted back on demand
+        if self.disk is None:
+            self._removed(key)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def get_async(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def set_async(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+        self._removed(key)
+
+    async def delete_async(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.delete, key)
+        self._removed(key)
+
+    def _count_discard(self) -> None:
+        # The preceding get() counted a hit that turned out unusable
+        self.hits -= 1
+        self.misses += 1
+        self.discarded += 1
+
+    def discard(self, key: str) -> None:
+        """Drop an entry the caller could not use and count it as a miss."""
+        self.delete(key)
+        self._count_discard()
+
+    async def discard_async(self, key: str) -> None:
+        await self.delete_async(key)
+        self._count_discard()
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "discarded": self.discarded,
+            "evictions": self.memory.evictions,
+            "expirations": self.memory.expirations,
+            "memory_entries": len(self.memory),
+            "disk_enabled": self.disk is not None,
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """
+        Build a cache from environment variables:
+        PROMPT_CACHE_ENABLED (default "1"), PROMPT_CACHE_MAX_ENTRIES,
+        PROMPT_CACHE_TTL_SECONDS, PROMPT_CACHE_PATH (enables the SQLite tier).
+        """
+        if os.getenv("PROMPT_CACHE_ENABLED", "1").lower() in {"0", "false", "no"}:
+            return None
+        ttl = env_float("PROMPT_CACHE_TTL_SECONDS", 86400.0)
+        memory = MemoryLRUCache(
+            max_entries=env_int("PROMPT_CACHE_MAX_ENTRIES", 1024),
+            ttl_seconds=ttl,
+        )
+        path = os.getenv("PROMPT_CACHE_PATH")
+        disk = SQLiteCache(path, ttl_seconds=ttl) if path else None
+        return cls(memory=memory, disk=disk)
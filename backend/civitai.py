@@ -0,0 +1,162 @@
+"""
+Civitai API access on top of the shared HTTP client
+
+Images are streamed straight into memory with a hard byte cap: the
+Content-Length and Content-Type headers are checked before the body is
+read, and the transfer is aborted as soon as the cap is exceeded. The
+buffer goes directly into the vision pipeline - no temp file.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from backend.civitai_meta import build_base_prompt, meta_to_tech_specs
+from backend.concurrency import RateLimiter
+from backend.env import env_int
+from backend.errors import DownloadRejectedError
+from backend.http_client import civitai_api_base
+from backend.image_preprocess import sniff_image_format
+
+DEFAULT_MAX_IMAGE_BYTES = 50 * 1024 * 1024
+
+
+def max_image_bytes() -> int:
+    """CIVITAI_MAX_IMAGE_BYTES (default 50 MiB)."""
+    return env_int("CIVITAI_MAX_IMAGE_BYTES", DEFAULT_MAX_IMAGE_BYTES)
+
+
+# auto:  ZImageTurboPrompt from the prompt text (LLM), vision model as fallback
+# image: always the vision model
+# base:  BasePrompt; LLM splits subject/environment, technical comes from meta
+# fast:  BasePrompt from meta alone, no LLM call
+EXTRACT_MODES = ("auto", "image", "base", "fast")
+
+# Listing filters passed through to GET /images
+LISTING_FILTERS = ("username", "modelId", "modelVersionId", "postId", "collectionId", "nsfw", "sort", "period")
+
+
+async def _throttle(limiter: Optional[RateLimiter], url: str) -> None:
+    if limiter is not None:
+        await limiter.acquire(urlsplit(url).netloc)
+
+
+async def fetch_image_metadata(
+    client: httpx.AsyncClient, image_id: str, limiter: Optional[RateLimiter] = None
+) -> Dict[str, Any]:
+    """GET /images/{id} from the Civitai API."""
+    url = f"{civitai_api_base()}/images/{image_id}"
+    await _throttle(limiter, url)
+    resp = await client.get(url)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def list_images(
+    client: httpx.AsyncClient,
+    query: Dict[str, Any],
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    limiter: Optional[RateLimiter] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of GET /images (user, model, post or collection gallery).
+    Returns ``(items, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    params = {key: query[key] for key in LISTING_FILTERS if query.get(key) is not None}
+    params["limit"] = limit
+    if cursor:
+        params["cursor"] = cursor
+    url = f"{civitai_api_base()}/images"
+    await _throttle(limiter, url)
+    resp = await client.get(url, params=params)
+    resp.raise_for_status()
+    payload = resp.json()
+    next_cursor = (payload.get("metadata") or {}).get("nextCursor")
+    return payload.get("items") or [], str(next_cursor) if next_cursor is not None else None
+
+
+async def download_image(
+    client: httpx.AsyncClient,
+    url: str,
+    max_bytes: int = DEFAULT_MAX_IMAGE_BYTES,
+    limiter: Optional[RateLimiter] = None,
+) -> Tuple[bytes, str]:
+    """
+    Stream an image into memory; returns ``(data, mime_type)``.
+
+    Raises:
+        DownloadRejectedError: 413 if larger than ``max_bytes``,
+            415 if the response is not an image
+        httpx.HTTPStatusError: on non-2xx responses
+    """
+    await _throttle(limiter, url)
+    async with client.stream("GET", url) as resp:
+        resp.raise_for_status()
+
+        content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+        # CDNs sometimes serve images as octet-stream; the magic bytes decide then
+        if content_type and not content_type.startswith("image/") and content_type != "application/octet-stream":
+            raise DownloadRejectedError(f"Kein Bild: Content-Type {content_type}", status_code=415)
+
+        declared = resp.headers.get("content-length")
+        if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+            raise DownloadRejectedError(
+                f"Bild zu groß: {int(declared)} Bytes (Limit {max_bytes})", status_code=413
+            )
+
+        buffer = bytearray()
+        async for chunk in resp.aiter_bytes():
+            buffer += chunk
+            if len(buffer) > max_bytes:
+                raise DownloadRejectedError(f"Bild zu groß: mehr als {max_bytes} Bytes", status_code=413)
+
+    data = bytes(buffer)
+    sniffed = sniff_image_format(data)
+    if sniffed is None and not content_type.startswith("image/"):
+        raise DownloadRejectedError("Kein Bild: unbekanntes Dateiformat", status_code=415)
+    return data, sniffed or content_type
+
+
+async def extract_item(
+    client: httpx.AsyncClient,
+    generator,
+    data: Dict[str, Any],
+    mode: str = "auto",
+    limiter: Optional[RateLimiter] = None,
+) -> Dict[str, Any]:
+    """
+    Turn one Civitai image record into a prompt structure (see EXTRACT_MODES).
+
+    ``auto`` uses the embedded prompt text unless there is none; ``image``
+    and prompt-less records go through the vision model. Every result
+    carries ``technical``, mapped deterministically from ``meta``.
+    """
+    if mode not in EXTRACT_MODES:
+        raise ValueError(f"Unbekannter Modus: {mode} (erlaubt: {', '.join(EXTRACT_MODES)})")
+
+    meta = data.get("meta") or {}
+    prompt_text = meta.get("prompt") or meta.get("Prompt")
+    image_url = data.get("url") or data.get("originalUrl") or data.get("imageUrl")
+    width, height = data.get("width"), data.get("height")
+
+    if mode in ("base", "fast"):
+        # base: nur der bereinigte Freitext geht ans LLM; Seed, Sampler & Co. kommen aus meta
+        base_prompt = await build_base_prompt(generator, meta, mode, width, height)
+        return {"prompt_text": prompt_text, "base_prompt": base_prompt.model_dump(), "meta": meta}
+
+    technical = meta_to_tech_specs(meta, width, height).model_dump()
+
+    if mode != "image" and prompt_text:
+        extracted = await generator.text_to_json_async(prompt_text)
+        return {"prompt_text": prompt_text, "json_structure": extracted.model_dump(), "technical": technical, "meta": meta}
+
+    if image_url:
+        # Gestreamt direkt in den Speicher, mit Byte-Limit
+        image_data, mime_type = await download_image(client, image_url, max_image_bytes(), limiter)
+        extracted = await generator.image_bytes_to_json_async(image_data, mime_type)
+        return {"image_url": image_url, "json_structure": extracted.model_dump(), "technical": technical, "meta": meta}
+
+    raise ValueError("Kein prompt_text oder image_url in Civitai-Antwort")
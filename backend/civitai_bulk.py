@@ -0,0 +1,275 @@
+"""
+Bulk Civitai import jobs
+
+A job takes either an explicit list of image IDs or a listing query
+(user, model, post or collection gallery), pages through it with bounded
+concurrency and a per-host rate limit, and skips IDs that any earlier job
+already imported in the same mode (a ``fast`` import does not satisfy a
+later ``auto`` or ``image`` request for the same ID).
+
+Progress and per-item results are persisted as one JSON file per job (plus
+an append-only ledger of imported IDs), so an interrupted job resumes where
+it stopped: listing jobs continue from their saved cursor, ID jobs from the
+IDs not yet in the ledger.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+from backend.civitai import extract_item, fetch_image_metadata, list_images
+from backend.concurrency import RateLimiter, bounded_gather
+from backend.env import env_float, env_int
+
+
+class ImportJobStore:
+    """
+    JSON files under ``directory``: ``<job_id>.json`` and ``imported_ids.txt``.
+
+    The ledger holds one ``<mode>\t<image_id>`` line per import; lines
+    without a mode (older ledgers) count as ``auto``.
+    """
+
+    LEDGER = "imported_ids.txt"
+    LEGACY_MODE = "auto"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._imported: Set[Tuple[str, str]] = set()
+        ledger = os.path.join(directory, self.LEDGER)
+        if os.path.exists(ledger):
+            with open(ledger, "r", encoding="utf-8") as f:
+                for line in f:
+                    mode, _, image_id = line.strip().rpartition("\t")
+                    if image_id:
+                        self._imported.add((mode or self.LEGACY_MODE, image_id))
+
+    def _job_path(self, job_id: str) -> str:
+        if not job_id.replace("-", "").isalnum():
+            raise ValueError(f"Ungültige job_id: {job_id}")
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self._job_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write(self, job_id: str, serialized: str) -> None:
+        """Atomic replace so a crash never leaves a half-written job file."""
+        path = self._job_path(job_id)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(serialized)
+        os.replace(tmp_path, path)
+
+    def is_imported(self, image_id: str, mode: str) -> bool:
+        return (mode, image_id) in self._imported
+
+    def mark_imported(self, image_ids: Iterable[str], mode: str) -> None:
+        with self._lock:
+            new_ids = list(dict.fromkeys(i for i in image_ids if (mode, i) not in self._imported))
+            if not new_ids:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, self.LEDGER), "a", encoding="utf-8") as f:
+                f.write("".join(f"{mode}\t{i}\n" for i in new_ids))
+            self._imported.update((mode, i) for i in new_ids)
+
+
+def new_job(
+    image_ids: Optional[List[str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    mode: str = "auto",
+    max_items: int = 100,
+) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "job_id": str(uuid.uuid4()),
+        "status": "pending",
+        "mode": mode,
+        "image_ids": [str(i) for i in image_ids] if image_ids else None,
+        "query": query,
+        "max_items": max_items,
+        "cursor": None,
+        "exhausted": False,
+        "seen": 0,
+        "skipped": [],
+        "results": {},
+        "errors": {},
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def job_summary(job: Dict[str, Any], include_results: bool = False) -> Dict[str, Any]:
+    summary = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "mode": job["mode"],
+        "query": job["query"],
+        "total": len(job["image_ids"]) if job["image_ids"] is not None else None,
+        "imported": len(job["results"]),
+        "skipped": len(job["skipped"]),
+        "failed": len(job["errors"]),
+        "errors": job["errors"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if include_results:
+        summary["results"] = job["results"]
+    return summary
+
+
+class BulkImporter:
+    """
+    Runs import jobs as background tasks on the event loop.
+
+    Only running jobs are kept in memory; finished jobs are read back from
+    the store.
+
+    Every request (metadata, listing page, image download) passes the
+    per-host rate limiter; at most ``concurrency`` items are in flight.
+    """
+
+    def __init__(self, store: ImportJobStore, concurrency: int = 4, rate_per_host: float = 5.0, page_size: int = 100):
+        self.store = store
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.limiter = RateLimiter(rate_per_host)
+        self._jobs: Dict[str, Dict[str, Any]] = {}  # running jobs only
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id) or self.store.load(job_id)
+
+    def is_running(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    async def start(self, job: Dict[str, Any], client: httpx.AsyncClient, generator) -> Dict[str, Any]:
+        """Start (or resume) ``job``; returns immediately."""
+        job_id = job["job_id"]
+        if self.is_running(job_id):
+            return job
+        job["status"] = "running"
+        job["error"] = None
+        self._jobs[job_id] = job
+        await self._save(job)
+        task = asyncio.create_task(self._run(job, client, generator))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda t, job_id=job_id: self._finish(job_id, t))
+        return job
+
+    def _finish(self, job_id: str, task: "asyncio.Task[None]") -> None:
+        # The final state is on disk by now (saved at the end of _run)
+        if self._tasks.get(job_id) is task:
+            del self._tasks[job_id]
+            self._jobs.pop(job_id, None)
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs; their state is saved as ``interrupted``."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        job["updated_at"] = time.time()
+        # Serialize on the loop (job is mutated there), write in a thread
+        serialized = json.dumps(job, ensure_ascii=False)
+        await asyncio.to_thread(self.store.write, job["job_id"], serialized)
+
+    async def _run(self, job: Dict[str, Any], client: httpx.AsyncClient, generator) -> None:
+        try:
+            if job["image_ids"] is not None:
+                await self._run_ids(job, client, generator)
+            else:
+                await self._run_listing(job, client, generator)
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            # Shutdown mid-job: persist as resumable
+            job["status"] = "interrupted"
+            await asyncio.shield(self._save(job))
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        await self._save(job)
+
+    def _pending(self, job: Dict[str, Any], image_id: str) -> bool:
+        if image_id in job["results"]:
+            return False
+        if self.store.is_imported(image_id, job["mode"]):
+            if image_id not in job["skipped"]:
+                job["skipped"].append(image_id)
+            return False
+        return True
+
+    async def _import_one(self, job: Dict[str, Any], client: httpx.AsyncClient, generator, image_id: str, data=None) -> None:
+        try:
+            if data is None:
+                data = await fetch_image_metadata(client, image_id, self.limiter)
+            job["results"][image_id] = await extract_item(client, generator, data, job["mode"], self.limiter)
+            job["errors"].pop(image_id, None)
+            await asyncio.to_thread(self.store.mark_imported, [image_id], job["mode"])
+        except Exception as e:
+            job["errors"][image_id] = str(e)
+
+    async def _run_ids(self, job: Dict[str, Any], client: httpx.AsyncClient, generator) -> None:
+        # A repeated ID is imported once, not twice concurrently
+        pending = [i for i in dict.fromkeys(job["image_ids"]) if self._pending(job, i)]
+        # Checkpoint after every page-sized slice
+        for start in range(0, len(pending), self.page_size):
+            chunk = pending[start:start + self.page_size]
+            await bounded_gather(chunk, lambda i: self._import_one(job, client, generator, i), self.concurrency)
+            await self._save(job)
+
+    async def _run_listing(self, job: Dict[str, Any], client: httpx.AsyncClient, generator) -> None:
+        while not job["exhausted"] and job["seen"] < job["max_items"]:
+            limit = min(self.page_size, job["max_items"] - job["seen"])
+            items, next_cursor = await list_images(client, job["query"], job["cursor"], limit, self.limiter)
+            items = items[:limit]
+
+            batch = {}
+            for item in items:
+                image_id = str(item.get("id"))
+                if image_id not in batch and self._pending(job, image_id):
+                    batch[image_id] = item
+            await bounded_gather(
+                list(batch.items()), lambda pair: self._import_one(job, client, generator, pair[0], pair[1]), self.concurrency
+            )
+
+            # The cursor only advances once the whole page is done
+            job["seen"] += len(items)
+            job["cursor"] = next_cursor
+            job["exhausted"] = next_cursor is None or not items
+            await self._save(job)
+
+    @classmethod
+    def from_env(cls) -> "BulkImporter":
+        """
+        CIVITAI_IMPORT_DIR (default ".civitai_imports"), CIVITAI_IMPORT_CONCURRENCY
+        (default 4), CIVITAI_RATE_PER_HOST (requests/s per host, default 5).
+        """
+        return cls(
+            ImportJobStore(os.getenv("CIVITAI_IMPORT_DIR", ".civitai_imports")),
+            concurrency=env_int("CIVITAI_IMPORT_CONCURRENCY", 4),
+            rate_per_host=env_float("CIVITAI_RATE_PER_HOST", 5.0),
+        )
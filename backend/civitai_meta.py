@@ -0,0 +1,245 @@
+"""
+Deterministic mapping of Civitai generation metadata
+
+Civitai image records carry the generation parameters as structured
+``meta`` (prompt, negativePrompt, sampler, cfgScale, seed, steps, Size).
+Those map onto ``TechSpecs`` one to one, so no LLM call is needed for them:
+
+- ``meta_to_tech_specs``   meta -> TechSpecs (sampler names normalized to
+                           the k-diffusion ids the adapters use)
+- ``apply_meta_technical`` overlay the meta values onto an LLM-built prompt
+- ``meta_to_base_prompt``  complete BasePrompt without any LLM call ("fast"
+                           import mode); subject/environment are split from
+                           the comma-separated prompt tags by a heuristic
+- ``build_base_prompt``    "fast" or "base" (LLM only for the subject/
+                           environment split) for any meta-shaped dict,
+                           e.g. PNG metadata from ``backend.png_metadata``
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.models import BasePrompt, Environment, Subject, TechSpecs
+from backend.rewrite import rewrite_forbidden_words
+
+# A1111/Civitai display names (normalized, see _sampler_key) -> sampler id.
+# ComfyUI ids normalize to the same keys, so both spellings are accepted.
+SAMPLER_IDS: Dict[str, str] = {
+    "euler": "euler",
+    "eulera": "euler_a",
+    "eulerancestral": "euler_a",
+    "heun": "heun",
+    "lms": "lms",
+    "ddim": "ddim",
+    "plms": "plms",
+    "dpm2": "dpm_2",
+    "dpm2a": "dpm_2_a",
+    "dpm2ancestral": "dpm_2_a",
+    "dpmpp2m": "dpmpp_2m",
+    "dpmpp2msde": "dpmpp_2m_sde",
+    "dpmpp2sa": "dpmpp_2s_a",
+    "dpmpp2sancestral": "dpmpp_2s_a",
+    "dpmpp3msde": "dpmpp_3m_sde",
+    "dpmppsde": "dpmpp_sde",
+    "dpmfast": "dpm_fast",
+    "dpmadaptive": "dpm_adaptive",
+    "unipc": "uni_pc",
+    "lcm": "lcm",
+    "restart": "restart",
+}
+
+# Scheduler suffixes A1111 appends to the sampler name ("DPM++ 2M Karras");
+# TechSpecs has no scheduler field, so they are dropped
+_SCHEDULER_SUFFIX = re.compile(
+    r"[\s_]+(karras|exponential|polyexponential|sgm[\s_]?uniform|simple|normal|beta)\s*$",
+    re.IGNORECASE,
+)
+_SIZE = re.compile(r"^\s*(\d+)\s*[x×]\s*(\d+)\s*$", re.IGNORECASE)
+
+# A1111 prompt syntax that is not part of the description
+_NETWORK_TAG = re.compile(r"<[^<>]*>")              # <lora:name:0.8>, <hypernet:...>
+_WEIGHT = re.compile(r":\s*-?\d+(?:\.\d+)?\s*(?=[)\]])")  # (word:1.2)
+_BRACKETS = re.compile(r"[()\[\]{}]")
+_TAG_SPLIT = re.compile(r"\s*(?:,|\n|\bBREAK\b)\s*")
+
+# Tags describing where, not who
+_ENVIRONMENT_PREFIXES = ("in ", "at ", "on ", "inside ", "outside ", "under ", "near ", "by the ", "against ")
+_ENVIRONMENT_WORDS = ("background", "indoors", "outdoors", "scenery", "landscape", "interior", "street", "city")
+
+
+def _first(meta: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = meta.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    # Seeds exceed float precision, so integers never go through float()
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and re.fullmatch(r"\s*-?\d+\s*", value):
+        return int(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if math.isfinite(number) and number == int(number) else None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _sampler_key(name: str) -> str:
+    name = _SCHEDULER_SUFFIX.sub("", name.strip()).lower().replace("++", "pp")
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+def normalize_sampler(name: Any) -> Optional[str]:
+    """
+    Sampler id for a Civitai/A1111 or ComfyUI sampler name
+    ("DPM++ 2M Karras" -> "dpmpp_2m"). Unknown names are returned unchanged.
+    """
+    if not isinstance(name, str) or not name.strip():
+        return None
+    return SAMPLER_IDS.get(_sampler_key(name), name.strip())
+
+
+def parse_size(value: Any) -> Optional[Tuple[int, int]]:
+    """``"1024x1536"`` -> ``(1024, 1536)``; None if not a WxH string."""
+    if not isinstance(value, str):
+        return None
+    match = _SIZE.match(value)
+    if not match:
+        return None
+    width, height = int(match.group(1)), int(match.group(2))
+    return (width, height) if width and height else None
+
+
+def aspect_ratio(width: int, height: int) -> Optional[str]:
+    """Reduced ratio ("832x1216" -> "13:19"); None for odd sizes like 1023x1537."""
+    divisor = math.gcd(width, height)
+    ratio_w, ratio_h = width // divisor, height // divisor
+    if ratio_w > 32 or ratio_h > 32:
+        return None
+    return f"{ratio_w}:{ratio_h}"
+
+
+def meta_to_tech_specs(
+    meta: Dict[str, Any], width: Optional[int] = None, height: Optional[int] = None
+) -> TechSpecs:
+    """
+    TechSpecs from a Civitai ``meta`` dict. ``width``/``height`` (the image
+    record's own dimensions) are the fallback when ``Size`` is missing.
+    Unparseable values are left unset rather than guessed.
+    """
+    size = parse_size(_first(meta, "Size", "size"))
+    if size is None and _to_int(width) and _to_int(height):
+        size = (_to_int(width), _to_int(height))
+
+    negative_prompt = _first(meta, "negativePrompt", "negative_prompt", "Negative prompt")
+    return TechSpecs(
+        seed=_to_int(_first(meta, "seed", "Seed")),
+        steps=_to_int(_first(meta, "steps", "Steps")),
+        cfg_scale=_to_float(_first(meta, "cfgScale", "cfg_scale", "CFG scale")),
+        sampler=normalize_sampler(_first(meta, "sampler", "Sampler", "sampler_name")),
+        resolution=f"{size[0]}x{size[1]}" if size else None,
+        aspect_ratio=aspect_ratio(*size) if size else None,
+        negative_prompt=negative_prompt.strip() if isinstance(negative_prompt, str) and negative_prompt.strip() else None,
+    )
+
+
+def apply_meta_technical(
+    base_prompt: BasePrompt, meta: Dict[str, Any], width: Optional[int] = None, height: Optional[int] = None
+) -> BasePrompt:
+    """Copy of ``base_prompt`` whose technical fields are overridden by ``meta`` where it has a value."""
+    technical = base_prompt.technical.model_dump() if base_prompt.technical else {}
+    technical.update(meta_to_tech_specs(meta, width, height).model_dump(exclude_none=True))
+    return base_prompt.model_copy(update={"technical": TechSpecs(**technical)})
+
+
+def clean_prompt_text(prompt: str) -> str:
+    """Strip A1111 syntax (LoRA tags, ``(word:1.2)`` weights, brackets, BREAK)."""
+    text = _NETWORK_TAG.sub("", prompt)
+    text = _WEIGHT.sub("", text)
+    text = _BRACKETS.sub("", text)
+    return ", ".join(prompt_tags(text))
+
+
+def prompt_tags(text: str) -> List[str]:
+    return [" ".join(tag.split()) for tag in _TAG_SPLIT.split(text) if tag.strip()]
+
+
+def _is_environment(tag: str) -> bool:
+    lowered = tag.lower()
+    return lowered.startswith(_ENVIRONMENT_PREFIXES) or any(
+        re.search(rf"\b{word}\b", lowered) for word in _ENVIRONMENT_WORDS
+    )
+
+
+def meta_to_base_prompt(
+    meta: Dict[str, Any], width: Optional[int] = None, height: Optional[int] = None
+) -> BasePrompt:
+    """
+    BasePrompt built from ``meta`` alone. Pure quality markers
+    ("masterpiece", "best quality", "8k") are dropped, location-like tags
+    go to the environment, the first remaining tag becomes the subject.
+    Without any such tag (a pure scene prompt) the first environment tag
+    becomes the subject.
+
+    Raises:
+        ValueError: if ``meta`` has no prompt, or nothing but quality markers
+    """
+    prompt = _first(meta, "prompt", "Prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("Kein Prompt in Civitai-Metadaten")
+
+    subject_tags: List[str] = []
+    environment_tags: List[str] = []
+    for tag in prompt_tags(clean_prompt_text(prompt)):
+        if not rewrite_forbidden_words(tag).text.strip(" ,.;:"):
+            continue
+        (environment_tags if _is_environment(tag) else subject_tags).append(tag)
+
+    if not subject_tags:
+        if not environment_tags:
+            raise ValueError("Kein Motiv im Civitai-Prompt (nur Quality-Tags)")
+        subject_tags.append(environment_tags.pop(0))
+
+    return BasePrompt(
+        subject=Subject(
+            description=subject_tags[0],
+            attributes=subject_tags[1:] or None,
+        ),
+        environment=Environment(location=", ".join(environment_tags)),
+        technical=meta_to_tech_specs(meta, width, height),
+    )
+
+
+async def build_base_prompt(
+    generator, meta: Dict[str, Any], mode: str = "fast", width: Optional[int] = None, height: Optional[int] = None
+) -> BasePrompt:
+    """
+    BasePrompt from generation metadata.
+
+    ``fast``: :func:`meta_to_base_prompt`, no LLM call. ``base``: only the
+    cleaned prompt text goes to ``generator.text_to_base_prompt_async``
+    (subject/environment split), technical values come from ``meta``.
+    """
+    if mode == "fast":
+        return meta_to_base_prompt(meta, width, height)
+
+    prompt = _first(meta, "prompt", "Prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("Kein Prompt in den Metadaten")
+    base_prompt = await generator.text_to_base_prompt_async(clean_prompt_text(prompt))
+    return apply_meta_technical(base_prompt, meta, width, height)
@@ -0,0 +1,129 @@
+"""
+Async concurrency helpers shared by the generator and the API endpoints
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar, Union
+
+from backend.env import env_int
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def bounded_gather(
+    items: Iterable[T],
+    fn: Callable[[T], Awaitable[R]],
+    limit: int,
+) -> List[Union[R, Exception]]:
+    """
+    Run ``fn`` over ``items`` with at most ``limit`` calls in flight.
+
+    Results come back in input order; a failing item yields its exception
+    instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: T) -> Union[R, Exception]:
+        async with semaphore:
+            try:
+                return await fn(item)
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+_worker_pool: Optional[ThreadPoolExecutor] = None
+_worker_pool_lock = threading.Lock()
+
+
+def _get_worker_pool() -> ThreadPoolExecutor:
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            workers = env_int("CPU_WORKERS", 0, minimum=0) or min(8, os.cpu_count() or 1)
+            _worker_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="promptos-cpu")
+        return _worker_pool
+
+
+async def run_in_worker(fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    """
+    Run CPU-bound work (hashing, image decoding/resizing) off the event loop.
+
+    Uses a dedicated pool so heavy uploads cannot starve the default executor
+    that ``asyncio.to_thread`` (cache disk tier, file reads) relies on.
+    hashlib and Pillow release the GIL for large buffers, so threads scale.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_worker_pool(), functools.partial(fn, *args, **kwargs))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key issues the
+    upstream call, every caller arriving while it is in flight awaits the same
+    result (or the same exception).
+
+    The upstream call runs as its own task, so a disconnecting caller does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self.issued = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+            self.issued += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+class RateLimiter:
+    """
+    Minimum spacing between calls per key (e.g. per host).
+
+    Callers reserve the next free slot and sleep until it; no lock is needed
+    because reservations happen synchronously on the event loop.
+    """
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.waited = 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    async def acquire(self, key: str) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(key, now))
+        self._next_slot[key] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            self.waited += delay
+            await asyncio.sleep(delay)
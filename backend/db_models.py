@@ -8,6 +8,7 @@ Tabellen:
 4. prompts - Einzelne, assemblierte Prompts (Character + Scene + Action)
 5. text_elements - Text-Elemente für Bilder (separiert für Flexibilität)
 6. global_assets - Story-weite Parameter (Style Overrides, etc.)
+7. prompt_library - Importierte BasePrompts (PNG/JPEG-Metadaten, backend/ingest.py)
 """
 
 # ============================================================================
@@ -102,6 +103,22 @@ CREATE TABLE IF NOT EXISTS environments (
 CREATE INDEX idx_environments_title ON environments(title);
 
 
+-- Prompt Library (importierte BasePrompts aus Bild-Metadaten)
+CREATE TABLE IF NOT EXISTS prompt_library (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    content_hash VARCHAR(64) NOT NULL UNIQUE,  -- sha256 der Quelldatei
+    source_path TEXT NOT NULL,
+    generator VARCHAR(50),  -- 'a1111', 'comfyui'
+    base_prompt_json JSONB NOT NULL,
+    raw_meta_json JSONB,
+
+    created_at TIMESTAMP DEFAULT NOW(),
+    created_by UUID
+);
+
+CREATE INDEX idx_prompt_library_generator ON prompt_library(generator);
+
+
 -- Text Elements (separat für Wiederverwendung)
 CREATE TABLE IF NOT EXISTS text_elements (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -285,6 +302,21 @@ class EnvironmentPreset(Base):
     created_by = Column(String(255))
 
 
+class LibraryPrompt(Base):
+    """Prompt Library Tabelle (Import aus Bild-Metadaten)"""
+    __tablename__ = "prompt_library"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), nullable=False, unique=True)
+    source_path = Column(Text, nullable=False)
+    generator = Column(String(50))
+    base_prompt_json = Column(JSON, nullable=False)
+    raw_meta_json = Column(JSON)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    created_by = Column(String(255))
+
+
 class TextElement(Base):
     """Text Element Tabelle"""
     __tablename__ = "text_elements"
@@ -0,0 +1,37 @@
+"""
+Numeric settings from environment variables
+
+A malformed or out-of-range value (``PROMPT_CACHE_TTL_SECONDS=1d``) must not
+take down startup - e.g. by failing the generator construction in main.py,
+which would disable every Gemini endpoint. It is reported as a startup
+warning and the default is used instead.
+"""
+
+import os
+from typing import Callable, TypeVar, Union
+
+N = TypeVar("N", int, float)
+
+
+def _env_number(name: str, default: N, minimum: Union[int, float], parse: Callable[[str], N]) -> N:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = parse(raw.strip())
+        if value < minimum:
+            raise ValueError(f"must be >= {minimum}")
+        return value
+    except ValueError as e:
+        print(f"Startup Warning: {name}={raw!r} ungültig ({e}), nutze {default}")
+        return default
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Integer setting (default: must be >= 1); falls back to ``default`` with a warning."""
+    return _env_number(name, default, minimum, int)
+
+
+def env_float(name: str, default: float, minimum: float = 0.0) -> float:
+    """Float setting (default: must be >= 0); falls back to ``default`` with a warning."""
+    return _env_number(name, default, minimum, float)
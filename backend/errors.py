@@ -8,6 +8,26 @@ from pydantic import BaseModel, Field
 import uuid
 
 
+class SchemaValidationError(ValueError):
+    """Provider reply parsed as JSON but did not match the target schema"""
+
+    def __init__(self, message: str, errors: Optional[List[dict]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class EmptyInputError(ValueError):
+    """Request item carried no usable input"""
+
+
+class DownloadRejectedError(ValueError):
+    """Remote file was refused before completion (too large or wrong content type)"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
 class ErrorCode(str, Enum):
     """Standard error codes for API responses"""
     VALIDATION_ERROR = "VALIDATION_ERROR"
@@ -36,3 +56,11 @@ class SuccessResponse(BaseModel):
     data: Any = Field(..., description="Response data")
     defaults_applied: List[str] = Field(default_factory=list, description="List of field paths where defaults were applied")
     correlation_id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="Unique ID for tracking")
+
+
+class BatchItemResult(BaseModel):
+    """Per-item envelope for batch endpoints: either data or an error"""
+    index: int = Field(..., description="Position of the item in the request")
+    success: bool = Field(..., description="Whether this item succeeded")
+    data: Any = Field(default=None, description="Item result on success")
+    error: Optional[ErrorEnvelope] = Field(default=None, description="Error envelope on failure")
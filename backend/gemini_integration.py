@@ -7,10 +7,14 @@ Endpoints:
 - POST /json-to-prompt → JSON → Flüssiger 600-1000 Wort Prompt
 """
 
+import asyncio
+import hashlib
 import json
+import mimetypes
 import os
+import time
 from dotenv import load_dotenv
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
 import google.generativeai as genai
 
 load_dotenv()
@@ -23,23 +27,77 @@ from backend.models import (
     ActionModule,
     TextElementsModule,
     PromptAssemblyOutput,
-    validate_no_forbidden_words,
-    extract_forbidden_words
+    forbidden_word_stream,
 )
 from backend.system_prompts import get_system_prompt
+from backend.cache import ResponseCache, make_cache_key, schema_fingerprint
+from pydantic import ValidationError
+from backend.errors import SchemaValidationError
+from backend.concurrency import SingleFlight, run_in_worker
+from backend.rewrite import ForbiddenWordRewriter, RewriteResult
+from backend.image_preprocess import ImagePreprocessor, sniff_image_format
+from backend.image_cache import PerceptualImageIndex, dhash
+from backend.json_extract import extract_json
+from backend.gemini_schema import response_schema
+from backend.assembler import PROMPT_MODES, assemble_prompt, assembly_output
+from backend.latency import LatencyHistogram
+from backend.repair import REPAIR_CONFIG, RepairAttempt, SchemaRepairer, estimate_tokens
 
 
 class GeminiPromptGenerator:
     """
     Wrapper um die Gemini API für alle Prompt-Engineering-Aufgaben.
+
+    Jede Aufgabe existiert synchron (CLI, Skripte) und als ``*_async``-Variante
+    für die FastAPI-Endpunkte, damit ein langsamer Gemini-Call den Event-Loop
+    nicht blockiert.
     """
-    
-    def __init__(self, api_key: Optional[str] = None):
+
+    MODEL_NAME = "gemini-2.5-flash"
+    VISION_MODEL_NAME = "gemini-2.5-pro"
+
+    TEXT_TO_JSON_CONFIG = {
+        "temperature": 0.7,
+        "max_output_tokens": 2000,
+    }
+    TEXT_TO_BASE_CONFIG = {
+        "temperature": 0.6,
+        "max_output_tokens": 1200,
+    }
+    VISION_CONFIG = {
+        "temperature": 0.5,  # Etwas niedriger für Präzision
+        "max_output_tokens": 2500,
+    }
+    JSON_TO_TEXT_CONFIG = {
+        "temperature": 0.8,
+        "max_output_tokens": 3000,
+    }
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        rewriter: Optional[ForbiddenWordRewriter] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        image_index: Optional[PerceptualImageIndex] = None,
+        structured_output: Optional[bool] = None,
+        repairer: Optional[SchemaRepairer] = None,
+    ):
         """
         Initialisiert Gemini mit API-Key.
         
         Args:
             api_key: Google Gemini API-Key. Falls None, nutzt Umgebungsvariable GEMINI_API_KEY.
+            cache: Optionaler Response-Cache für text_to_json / text_to_base_prompt.
+            rewriter: Lokale Forbidden-Word-Umschreibung (Default: Standard-Tabelle).
+            preprocessor: Bild-Vorverarbeitung vor dem Vision-Call (Default: 1536px, JPEG q85).
+            image_index: Optionaler Perceptual-Hash-Index; Near-Duplicates eines
+                bekannten Bildes nutzen dessen gecachtes Ergebnis (benötigt ``cache``).
+            structured_output: JSON-Aufgaben mit ``response_mime_type="application/json"``
+                und dem Pydantic-Schema als ``response_schema`` anfragen.
+                Falls None, entscheidet GEMINI_STRUCTURED_OUTPUT (Default: an).
+            repairer: Reparatur-Stufe für Antworten, die das Schema verletzen
+                (Enum-Snapping + kurzer Folge-Call; Default: beides an).
         """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
@@ -48,13 +106,195 @@ class GeminiPromptGenerator:
             )
         
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
-        self.model_vision = genai.GenerativeModel("gemini-2.5-pro")  # für Bilder
-    
+        self.model = genai.GenerativeModel(self.MODEL_NAME)
+        self.model_vision = genai.GenerativeModel(self.VISION_MODEL_NAME)  # für Bilder
+        self.cache = cache
+        self.singleflight = SingleFlight()
+        self.rewriter = rewriter if rewriter is not None else ForbiddenWordRewriter()
+        self.preprocessor = preprocessor if preprocessor is not None else ImagePreprocessor()
+        self.image_index = image_index
+        if structured_output is None:
+            structured_output = os.getenv("GEMINI_STRUCTURED_OUTPUT", "1").lower() not in {"0", "false", "no"}
+        self.structured_output = structured_output
+        self.repairer = repairer if repairer is not None else SchemaRepairer()
+        # Streaming: Zeit bis zum ersten Event (JSON) und bis zum ersten Prompt-Text
+        self.stream_ttfb = LatencyHistogram()
+        self.stream_first_text = LatencyHistogram()
+        self.stream_early_regenerations = 0
+
+    def metrics(self) -> dict:
+        """Laufzeit-Kennzahlen für Monitoring (/api/metrics)."""
+        return {
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "singleflight": self.singleflight.stats(),
+            "rewrite": self.rewriter.stats(),
+            "image_preprocess": self.preprocessor.stats(),
+            "image_dedup": self.image_index.stats() if self.image_index is not None else None,
+            "schema_repair": self.repairer.stats(),
+            "streaming": {
+                "ttfb": self.stream_ttfb.stats(),
+                "first_text": self.stream_first_text.stats(),
+                "early_regenerations": self.stream_early_regenerations,
+            },
+        }
+
+    # ========================================================================
+    # 0. GEMINI-AUFRUFE (sync + async)
+    # ========================================================================
+
+    def _generate(self, model, contents, generation_config: dict) -> str:
+        """Synchroner Gemini-Call, gibt den getrimmten Antworttext zurück."""
+        response = model.generate_content(contents, generation_config=generation_config)
+        return response.text.strip()
+
+    async def _generate_async(self, model, contents, generation_config: dict) -> str:
+        """Nicht-blockierender Gemini-Call über ``generate_content_async``."""
+        response = await model.generate_content_async(contents, generation_config=generation_config)
+        return response.text.strip()
+
+    # ========================================================================
+    # 0b. RESPONSE-CACHE + SINGLE-FLIGHT
+    # ========================================================================
+
+    def _request_key(
+        self, task: str, model_name: str, generation_config: dict, user_input: str, model_cls
+    ) -> str:
+        """
+        Inhaltsadressierter Key inkl. System-Prompt und Schema des Ergebnis-Modells –
+        eine Prompt- oder Schema-Änderung invalidiert automatisch.
+        Dient als Cache- und Single-Flight-Key.
+        """
+        return make_cache_key(
+            task, get_system_prompt(task), model_name, generation_config, user_input,
+            schema=schema_fingerprint(model_cls),
+        )
+
+    def _cache_lookup(self, key: str, model_cls):
+        if self.cache is None:
+            return None
+        value = self.cache.get(key)
+        if value is None:
+            return None
+        try:
+            return model_cls.model_validate_json(value)
+        except ValidationError:
+            # Veralteter/defekter Eintrag: wie ein Miss behandeln
+            self.cache.discard(key)
+            return None
+
+    async def _cache_lookup_async(self, key: str, model_cls):
+        """Wie :meth:`_cache_lookup`, der Disk-Tier läuft im Thread-Pool."""
+        if self.cache is None:
+            return None
+        value = await self.cache.get_async(key)
+        if value is None:
+            return None
+        try:
+            return model_cls.model_validate_json(value)
+        except ValidationError:
+            await self.cache.discard_async(key)
+            return None
+
+    def _cache_store(self, key: str, result) -> None:
+        if self.cache is not None:
+            self.cache.set(key, result.model_dump_json())
+
+    async def _cache_store_async(self, key: str, result) -> None:
+        if self.cache is not None:
+            await self.cache.set_async(key, result.model_dump_json())
+
+    def _json_config(self, generation_config: dict, model_cls) -> dict:
+        """
+        Generation-Config für JSON-Aufgaben: im Structured-Output-Modus mit
+        Schema, sodass die Antwort direkt parst. Der Cache-Key bleibt bewusst
+        beim Basis-Config – das validierte Ergebnis ist in beiden Modi gleich.
+        """
+        if not self.structured_output:
+            return generation_config
+        return {
+            **generation_config,
+            "response_mime_type": "application/json",
+            "response_schema": response_schema(model_cls),
+        }
+
+    # ========================================================================
+    # 0c. SCHEMA-REPARATUR (Enum-Snapping, dann gezielter Folge-Call)
+    # ========================================================================
+
+    @staticmethod
+    def _regeneration_tokens(request, response_text: str) -> int:
+        """Geschätzte Kosten einer kompletten Neugenerierung (nur Text-Anteile)."""
+        parts = [request] if isinstance(request, str) else [p for p in request if isinstance(p, str)]
+        return sum(estimate_tokens(p) for p in parts) + estimate_tokens(response_text)
+
+    def _snap_reply(self, model_cls, request, response_text: str):
+        """
+        Parst und validiert die Antwort; Enum-Fehler werden lokal korrigiert.
+        Gibt ``(ergebnis, None)`` oder ``(None, attempt)`` für den Folge-Call zurück.
+        """
+        data = extract_json(response_text)
+        try:
+            return model_cls(**data), None
+        except ValidationError as e:
+            attempt = self.repairer.snap(model_cls, data, e)
+        if attempt.result is not None:
+            self.repairer.record_snapped(self._regeneration_tokens(request, response_text))
+            return attempt.result, None
+        if not self.repairer.llm_followup:
+            self.repairer.record_failed()
+            raise attempt.error
+        return None, attempt
+
+    def _repair_config(self) -> dict:
+        if not self.structured_output:
+            return REPAIR_CONFIG
+        return {**REPAIR_CONFIG, "response_mime_type": "application/json"}
+
+    def _finish_repair(self, attempt: RepairAttempt, followup: str, reply: Optional[str], regeneration: int):
+        """Wendet den Patch an; scheitert er, bleibt der ursprüngliche Schema-Fehler."""
+        if reply is not None:
+            try:
+                result = attempt.apply_followup(reply)
+            except ValidationError:
+                pass
+            else:
+                self.repairer.record_followup(regeneration, followup, reply)
+                return result
+        self.repairer.record_failed(followup, reply or "")
+        raise attempt.error
+
+    def _parse_with_repair(self, model_cls, request, response_text: str):
+        """Validierung gegen ``model_cls``; ungültige Felder werden repariert statt neu generiert."""
+        result, attempt = self._snap_reply(model_cls, request, response_text)
+        if attempt is None:
+            return result
+        followup = attempt.followup_request()
+        try:
+            reply = self._generate(self.model, followup, self._repair_config())
+        except Exception:
+            reply = None
+        return self._finish_repair(attempt, followup, reply, self._regeneration_tokens(request, response_text))
+
+    async def _parse_with_repair_async(self, model_cls, request, response_text: str):
+        """Async-Variante von :meth:`_parse_with_repair`."""
+        result, attempt = self._snap_reply(model_cls, request, response_text)
+        if attempt is None:
+            return result
+        followup = attempt.followup_request()
+        try:
+            reply = await self._generate_async(self.model, followup, self._repair_config())
+        except Exception:
+            reply = None
+        return self._finish_repair(attempt, followup, reply, self._regeneration_tokens(request, response_text))
+
     # ========================================================================
     # 1. TEXT → JSON (Nutzer-Input zu strukturiertem Prompt)
     # ========================================================================
-    
+
+    def _text_to_json_request(self, user_input: str) -> str:
+        system_prompt = get_system_prompt("text_to_json")
+        return f"{system_prompt}\n\nUSER INPUT:\n{user_input}"
+
     def text_to_json(self, user_input: str) -> ZImageTurboPrompt:
         """
         Konvertiert einen Text-Input (Idee, Konzept, grobes Beschreibung) in ein
@@ -69,84 +309,160 @@ class GeminiPromptGenerator:
         Raises:
             ValueError: Falls Gemini ein invalides JSON zurückgibt oder Validierung fehlschlägt
         """
-        system_prompt = get_system_prompt("text_to_json")
-        
-        # Baue den Request
-        prompt = f"{system_prompt}\n\nUSER INPUT:\n{user_input}"
-        
+        key = self._request_key("text_to_json", self.MODEL_NAME, self.TEXT_TO_JSON_CONFIG, user_input, ZImageTurboPrompt)
+        cached = self._cache_lookup(key, ZImageTurboPrompt)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 2000,
-                }
+            request = self._text_to_json_request(user_input)
+            response_text = self._generate(
+                self.model, request, self._json_config(self.TEXT_TO_JSON_CONFIG, ZImageTurboPrompt),
             )
-            
-            response_text = response.text.strip()
-            
-            # Extrahiere JSON aus der Antwort (falls eingebettet in Markdown)
-            if "```json" in response_text:
-                json_str = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_str = response_text.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response_text
-            
-            # Parse JSON
-            data = json.loads(json_str)
-            
-            # Validiere gegen Pydantic-Schema
-            prompt_obj = ZImageTurboPrompt(**data)
-            
-            return prompt_obj
-        
+            # Parse JSON + Validierung gegen Pydantic-Schema (mit Reparatur)
+            prompt_obj = self._parse_with_repair(ZImageTurboPrompt, request, response_text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Gemini hat ungültiges JSON zurückgegeben: {e}")
+        except ValidationError as e:
+            raise SchemaValidationError(f"Gemini-Antwort verletzt das Schema: {e}", e.errors()) from e
+        except Exception as e:
+            raise ValueError(f"Fehler bei Text→JSON Konvertierung: {e}")
+
+        self._cache_store(key, prompt_obj)
+        return prompt_obj
+
+    async def text_to_json_async(self, user_input: str, skip_cache_lookup: bool = False) -> ZImageTurboPrompt:
+        """
+        Async-Variante von :meth:`text_to_json`. Gleichzeitige identische
+        Anfragen teilen sich einen Gemini-Call (Single-Flight).
+
+        ``skip_cache_lookup``: der Aufrufer hat :meth:`cached_text_to_json_async`
+        schon gefragt – kein zweiter Lookup (und kein zweiter Miss in den Stats).
+        """
+        key = self._request_key("text_to_json", self.MODEL_NAME, self.TEXT_TO_JSON_CONFIG, user_input, ZImageTurboPrompt)
+        if not skip_cache_lookup:
+            cached = await self._cache_lookup_async(key, ZImageTurboPrompt)
+            if cached is not None:
+                return cached
+        return await self.singleflight.do(key, lambda: self._text_to_json_upstream(user_input, key))
+
+    async def cached_text_to_json_async(self, user_input: str) -> Optional[ZImageTurboPrompt]:
+        """Nur der Cache-Lookup von :meth:`text_to_json_async` (kein Gemini-Call)."""
+        key = self._request_key("text_to_json", self.MODEL_NAME, self.TEXT_TO_JSON_CONFIG, user_input, ZImageTurboPrompt)
+        return await self._cache_lookup_async(key, ZImageTurboPrompt)
+
+    async def _text_to_json_upstream(self, user_input: str, key: str) -> ZImageTurboPrompt:
+        try:
+            request = self._text_to_json_request(user_input)
+            response_text = await self._generate_async(
+                self.model, request, self._json_config(self.TEXT_TO_JSON_CONFIG, ZImageTurboPrompt),
+            )
+            prompt_obj = await self._parse_with_repair_async(ZImageTurboPrompt, request, response_text)
         except json.JSONDecodeError as e:
             raise ValueError(f"Gemini hat ungültiges JSON zurückgegeben: {e}")
+        except ValidationError as e:
+            raise SchemaValidationError(f"Gemini-Antwort verletzt das Schema: {e}", e.errors()) from e
         except Exception as e:
             raise ValueError(f"Fehler bei Text→JSON Konvertierung: {e}")
 
+        await self._cache_store_async(key, prompt_obj)
+        return prompt_obj
+
     # ========================================================================
     # 1b. TEXT → BASE PROMPT (Universal-Schema)
     # ========================================================================
 
+    def _text_to_base_request(self, user_input: str) -> str:
+        system_prompt = get_system_prompt("text_to_base")
+        return f"{system_prompt}\n\nUSER INPUT:\n{user_input}"
+
     def text_to_base_prompt(self, user_input: str) -> BasePrompt:
         """
         Konvertiert Text-Input in ein universelles BasePrompt-Schema.
         """
-        system_prompt = get_system_prompt("text_to_base")
-        prompt = f"{system_prompt}\n\nUSER INPUT:\n{user_input}"
+        key = self._request_key("text_to_base", self.MODEL_NAME, self.TEXT_TO_BASE_CONFIG, user_input, BasePrompt)
+        cached = self._cache_lookup(key, BasePrompt)
+        if cached is not None:
+            return cached
 
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.6,
-                    "max_output_tokens": 1200,
-                }
+            request = self._text_to_base_request(user_input)
+            response_text = self._generate(
+                self.model, request, self._json_config(self.TEXT_TO_BASE_CONFIG, BasePrompt),
             )
+            base_prompt = self._parse_with_repair(BasePrompt, request, response_text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Gemini hat ungültiges JSON zurückgegeben: {e}")
+        except ValidationError as e:
+            raise SchemaValidationError(f"Gemini-Antwort verletzt das Schema: {e}", e.errors()) from e
+        except Exception as e:
+            raise ValueError(f"Fehler bei Text→BasePrompt Konvertierung: {e}")
 
-            response_text = response.text.strip()
-            if "```json" in response_text:
-                json_str = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_str = response_text.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response_text
+        self._cache_store(key, base_prompt)
+        return base_prompt
 
-            data = json.loads(json_str)
-            base_prompt = BasePrompt(**data)
-            return base_prompt
+    async def text_to_base_prompt_async(self, user_input: str) -> BasePrompt:
+        """Async-Variante von :meth:`text_to_base_prompt` (mit Single-Flight)."""
+        key = self._request_key("text_to_base", self.MODEL_NAME, self.TEXT_TO_BASE_CONFIG, user_input, BasePrompt)
+        cached = await self._cache_lookup_async(key, BasePrompt)
+        if cached is not None:
+            return cached
+        return await self.singleflight.do(key, lambda: self._text_to_base_upstream(user_input, key))
 
+    async def _text_to_base_upstream(self, user_input: str, key: str) -> BasePrompt:
+        try:
+            request = self._text_to_base_request(user_input)
+            response_text = await self._generate_async(
+                self.model, request, self._json_config(self.TEXT_TO_BASE_CONFIG, BasePrompt),
+            )
+            base_prompt = await self._parse_with_repair_async(BasePrompt, request, response_text)
         except json.JSONDecodeError as e:
             raise ValueError(f"Gemini hat ungültiges JSON zurückgegeben: {e}")
+        except ValidationError as e:
+            raise SchemaValidationError(f"Gemini-Antwort verletzt das Schema: {e}", e.errors()) from e
         except Exception as e:
             raise ValueError(f"Fehler bei Text→BasePrompt Konvertierung: {e}")
+
+        await self._cache_store_async(key, base_prompt)
+        return base_prompt
     
     # ========================================================================
     # 2. BILD → JSON (Vision-Analyse)
     # ========================================================================
-    
+
+    def _vision_request(self, image_data: bytes, mime_type: str = "image/jpeg") -> list:
+        system_prompt = get_system_prompt("vision")
+        return [
+            system_prompt,
+            {"mime_type": mime_type, "data": image_data},
+            "\n\nExtrahiere nun die visuelle DNA dieses Bildes."
+        ]
+
+    @staticmethod
+    def _guess_mime_type(image_path: str) -> str:
+        mime_type, _ = mimetypes.guess_type(image_path)
+        return mime_type if mime_type and mime_type.startswith("image/") else "image/jpeg"
+
+    @property
+    def _image_dedup_enabled(self) -> bool:
+        # Der Index verweist nur auf Cache-Keys, ohne Cache ist er nutzlos
+        return self.image_index is not None and self.cache is not None
+
+    def _vision_key(self, image_hash: str, image_data: bytes, mime_type: str) -> str:
+        # Format per Magic Bytes statt des vom Client deklarierten Typs
+        # (image/jpg vs. image/jpeg darf kein Cache-Miss sein)
+        image_format = sniff_image_format(image_data) or mime_type.lower()
+        return self._request_key(
+            "vision", self.VISION_MODEL_NAME, self.VISION_CONFIG,
+            f"{self.preprocessor.fingerprint()}:{image_format}:{image_hash}",
+            ZImageTurboPrompt,
+        )
+
+    def _index_image(self, perceptual: int, key: str) -> None:
+        # Verdrängte/abgelaufene Cache-Einträge verlassen auch den Index
+        self.cache.add_removal_listener(self.image_index.discard)
+        self.image_index.add(perceptual, key)
+
     def image_to_json(self, image_path: str) -> ZImageTurboPrompt:
         """
         Analysiert ein hochgeladenes Bild und extrahiert die visuelle DNA
@@ -165,51 +481,144 @@ class GeminiPromptGenerator:
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Bilddatei nicht gefunden: {image_path}")
         
-        system_prompt = get_system_prompt("vision")
-        
         # Lade Bild
         with open(image_path, "rb") as f:
             image_data = f.read()
-        
+
+        return self.image_bytes_to_json(image_data, self._guess_mime_type(image_path))
+
+    def image_bytes_to_json(self, image_data: bytes, mime_type: str = "image/jpeg") -> ZImageTurboPrompt:
+        """
+        Wie :meth:`image_to_json`, aber direkt aus Bytes im Speicher
+        (z.B. Upload), ohne Umweg über eine temporäre Datei.
+        """
+        key = self._vision_key(hashlib.sha256(image_data).hexdigest(), image_data, mime_type)
+        cached = self._cache_lookup(key, ZImageTurboPrompt)
+        if cached is not None:
+            return cached
+
+        perceptual = dhash(image_data) if self._image_dedup_enabled else None
+        if perceptual is not None:
+            near_key = self.image_index.lookup(perceptual)
+            if near_key is not None:
+                cached = self._cache_lookup(near_key, ZImageTurboPrompt)
+                if cached is not None:
+                    self.image_index.record_hit()
+                    return cached
+                self.image_index.discard(near_key)
+
+        # Format per Magic Bytes, verkleinern, Metadaten entfernen
+        prepared = self.preprocessor.process(image_data, mime_type)
         try:
             # Sende Bild + System-Prompt an Vision-Modell
-            response = self.model_vision.generate_content(
-                [
-                    system_prompt,
-                    {"mime_type": "image/jpeg", "data": image_data},  # oder PNG
-                    "\n\nExtrahiere nun die visuelle DNA dieses Bildes."
-                ],
-                generation_config={
-                    "temperature": 0.5,  # Etwas niedriger für Präzision
-                    "max_output_tokens": 2500,
-                }
+            request = self._vision_request(prepared.data, prepared.mime_type)
+            response_text = self._generate(
+                self.model_vision, request, self._json_config(self.VISION_CONFIG, ZImageTurboPrompt),
             )
-            
-            response_text = response.text.strip()
-            
-            # Parse JSON
-            if "```json" in response_text:
-                json_str = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_str = response_text.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response_text
-            
-            data = json.loads(json_str)
-            
-            # Validiere gegen Schema
-            prompt_obj = ZImageTurboPrompt(**data)
-            
-            return prompt_obj
-        
+            result = self._parse_with_repair(ZImageTurboPrompt, request, response_text)
         except json.JSONDecodeError as e:
             raise ValueError(f"Vision-Modell hat ungültiges JSON zurückgegeben: {e}")
+        except ValidationError as e:
+            raise SchemaValidationError(f"Vision-Modell-Antwort verletzt das Schema: {e}", e.errors()) from e
         except Exception as e:
             raise ValueError(f"Fehler bei Bild→JSON Analyse: {e}")
+
+        self._cache_store(key, result)
+        if perceptual is not None:
+            self._index_image(perceptual, key)
+        return result
+
+    async def image_to_json_async(self, image_path: str) -> ZImageTurboPrompt:
+        """
+        Async-Variante von :meth:`image_to_json`; die Datei wird im Thread-Pool
+        gelesen, identische Bilder teilen sich einen Vision-Call.
+        """
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Bilddatei nicht gefunden: {image_path}")
+
+        def _read() -> bytes:
+            with open(image_path, "rb") as f:
+                return f.read()
+
+        image_data = await asyncio.to_thread(_read)
+        return await self.image_bytes_to_json_async(image_data, self._guess_mime_type(image_path))
+
+    async def image_bytes_to_json_async(self, image_data: bytes, mime_type: str = "image/jpeg") -> ZImageTurboPrompt:
+        """
+        Async-Variante von :meth:`image_bytes_to_json`. Hashing und
+        Vorverarbeitung laufen im CPU-Worker-Pool, damit große Uploads den
+        Event-Loop nicht blockieren; identische Bilder werden nur einmal
+        verarbeitet.
+        """
+        image_hash = await run_in_worker(lambda: hashlib.sha256(image_data).hexdigest())
+        key = self._vision_key(image_hash, image_data, mime_type)
+        cached = await self._cache_lookup_async(key, ZImageTurboPrompt)
+        if cached is not None:
+            return cached
+
+        perceptual = await run_in_worker(dhash, image_data) if self._image_dedup_enabled else None
+        if perceptual is not None:
+            near_key = self.image_index.lookup(perceptual)
+            if near_key is not None:
+                cached = await self._cache_lookup_async(near_key, ZImageTurboPrompt)
+                if cached is not None:
+                    self.image_index.record_hit()
+                    return cached
+                self.image_index.discard(near_key)
+
+        return await self.singleflight.do(
+            key, lambda: self._image_to_json_upstream(image_data, mime_type, key, perceptual)
+        )
+
+    async def _image_to_json_upstream(
+        self, image_data: bytes, mime_type: str, key: str, perceptual: Optional[int]
+    ) -> ZImageTurboPrompt:
+        prepared = await run_in_worker(self.preprocessor.process, image_data, mime_type)
+        try:
+            request = self._vision_request(prepared.data, prepared.mime_type)
+            response_text = await self._generate_async(
+                self.model_vision, request, self._json_config(self.VISION_CONFIG, ZImageTurboPrompt),
+            )
+            result = await self._parse_with_repair_async(ZImageTurboPrompt, request, response_text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Vision-Modell hat ungültiges JSON zurückgegeben: {e}")
+        except ValidationError as e:
+            raise SchemaValidationError(f"Vision-Modell-Antwort verletzt das Schema: {e}", e.errors()) from e
+        except Exception as e:
+            raise ValueError(f"Fehler bei Bild→JSON Analyse: {e}")
+
+        await self._cache_store_async(key, result)
+        if perceptual is not None:
+            self._index_image(perceptual, key)
+        return result
     
     # ========================================================================
     # 3. JSON → PROMPT TEXT (Struktur in natürlichsprachigen Prompt)
     # ========================================================================
+
+    def _json_to_text_request(self, prompt_json: ZImageTurboPrompt) -> str:
+        system_prompt = get_system_prompt("json_to_text")
+        # Serialisiere JSON für Gemini
+        json_input = prompt_json.model_dump_json(indent=2)
+        return f"{system_prompt}\n\nSTRUKTURIERTES JSON:\n{json_input}"
+
+    def _regeneration_request(self, prompt_json: ZImageTurboPrompt, rewrite: RewriteResult) -> str:
+        words = ", ".join(dict.fromkeys(m.word for m in rewrite.unresolved))
+        return f"{self._json_to_text_request(prompt_json)}\n\nVERMEIDE UNBEDINGT diese Wörter: {words}"
+
+    def _rewrite_prompt_text(self, prompt_json: ZImageTurboPrompt, final_prompt: str) -> RewriteResult:
+        """
+        Entfernt/ersetzt Forbidden Words lokal. Zählt eine vermiedene
+        Regeneration, wenn danach keine Forbidden Words mehr übrig sind.
+        """
+        rewrite = self.rewriter.rewrite(final_prompt, prompt_json.character.identity.name)
+        if rewrite.replaced and rewrite.resolved:
+            self.rewriter.record_avoided()
+        return rewrite
+
+    def _assemble_output(self, prompt_json: ZImageTurboPrompt, rewrite: RewriteResult) -> PromptAssemblyOutput:
+        """Validiert den finalen Prompt auf Forbidden Words und zählt Wörter."""
+        return assembly_output(prompt_json, rewrite)
     
     def json_to_prompt_text(self, prompt_json: ZImageTurboPrompt) -> PromptAssemblyOutput:
         """
@@ -225,50 +634,153 @@ class GeminiPromptGenerator:
         Raises:
             ValueError: Falls Konvertierung fehlschlägt oder Forbidden Words gefunden
         """
-        system_prompt = get_system_prompt("json_to_text")
-        
-        # Serialisiere JSON für Gemini
-        json_input = prompt_json.model_dump_json(indent=2)
-        
-        prompt = f"{system_prompt}\n\nSTRUKTURIERTES JSON:\n{json_input}"
-        
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.8,
-                    "max_output_tokens": 3000,
-                }
+            final_prompt = self._generate(
+                self.model, self._json_to_text_request(prompt_json), self.JSON_TO_TEXT_CONFIG
             )
-            
-            final_prompt = response.text.strip()
-            
-            # Validiere auf Forbidden Words
-            has_forbidden = not validate_no_forbidden_words(final_prompt)
-            forbidden_found = extract_forbidden_words(final_prompt) if has_forbidden else []
-            
-            if has_forbidden:
-                print(f"⚠️  WARNUNG: Forbidden Words gefunden: {forbidden_found}")
-                print(f"   Final Prompt:\n{final_prompt}")
-            
-            # Zähle Wörter
-            word_count = len(final_prompt.split())
-            
-            return PromptAssemblyOutput(
-                json_structure=prompt_json,
-                full_prompt_text=final_prompt,
-                forbidden_words_check=not has_forbidden,
-                estimated_word_count=word_count
+            rewrite = self._rewrite_prompt_text(prompt_json, final_prompt)
+            if not rewrite.resolved:
+                # Lokal nicht reparierbar → genau ein erneuter Gemini-Call
+                self.rewriter.record_regeneration()
+                final_prompt = self._generate(
+                    self.model, self._regeneration_request(prompt_json, rewrite), self.JSON_TO_TEXT_CONFIG
+                )
+                rewrite = self.rewriter.rewrite(final_prompt, prompt_json.character.identity.name)
+            return self._assemble_output(prompt_json, rewrite)
+        except Exception as e:
+            raise ValueError(f"Fehler bei JSON→Prompt Konvertierung: {e}")
+
+    def json_to_prompt_text_local(self, prompt_json: ZImageTurboPrompt) -> PromptAssemblyOutput:
+        """
+        Lokaler Template-Assembler statt Gemini (Mikrosekunden, deterministisch).
+        Für Entwürfe und Vorschauen; Forbidden Words aus Nutzerfeldern werden
+        wie beim LLM-Pfad lokal umgeschrieben.
+        """
+        return assemble_prompt(prompt_json, self.rewriter)
+
+    def json_to_text_key(self, prompt_json: ZImageTurboPrompt) -> str:
+        """Inhaltsadresse eines JSON→Prompt-Calls (System-Prompt, Modell, Config, Schema, Input)."""
+        return self._request_key(
+            "json_to_text", self.MODEL_NAME, self.JSON_TO_TEXT_CONFIG, prompt_json.model_dump_json(),
+            PromptAssemblyOutput,
+        )
+
+    async def json_to_prompt_text_async(self, prompt_json: ZImageTurboPrompt) -> PromptAssemblyOutput:
+        """Async-Variante von :meth:`json_to_prompt_text` (mit Single-Flight)."""
+        key = self.json_to_text_key(prompt_json)
+        return await self.singleflight.do(key, lambda: self._json_to_prompt_text_upstream(prompt_json))
+
+    async def _json_to_prompt_text_upstream(self, prompt_json: ZImageTurboPrompt) -> PromptAssemblyOutput:
+        try:
+            final_prompt = await self._generate_async(
+                self.model, self._json_to_text_request(prompt_json), self.JSON_TO_TEXT_CONFIG
             )
-        
+            rewrite = self._rewrite_prompt_text(prompt_json, final_prompt)
+            if not rewrite.resolved:
+                self.rewriter.record_regeneration()
+                final_prompt = await self._generate_async(
+                    self.model, self._regeneration_request(prompt_json, rewrite), self.JSON_TO_TEXT_CONFIG
+                )
+                rewrite = self.rewriter.rewrite(final_prompt, prompt_json.character.identity.name)
+            return self._assemble_output(prompt_json, rewrite)
         except Exception as e:
             raise ValueError(f"Fehler bei JSON→Prompt Konvertierung: {e}")
     
+    # ========================================================================
+    # 3b. JSON → PROMPT TEXT (Streaming)
+    # ========================================================================
+
+    async def _stream_text(self, request: str) -> AsyncIterator[str]:
+        """Gestreamter Gemini-Call (``stream=True``), liefert die Text-Chunks."""
+        response = await self.model.generate_content_async(
+            request, generation_config=self.JSON_TO_TEXT_CONFIG, stream=True
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # Chunk ohne Text (z.B. nur finish_reason)
+            if text:
+                yield text
+
+    async def stream_prompt_text_async(
+        self, prompt_json: ZImageTurboPrompt, started: Optional[float] = None
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming-Variante von :meth:`json_to_prompt_text_async`.
+
+        Liefert ``(event, payload)``:
+        - ``chunk``: ``{"text"}`` – Rohtext, sobald Gemini ihn liefert
+        - ``forbidden``: ``{"word", "start", "end", "local_fix"}`` – Treffer des
+          inkrementellen Scans (Offsets im bisher gestreamten Text)
+        - ``restart``: ``{"words"}`` – ein lokal nicht reparierbares Wort wurde
+          gefunden; der Stream wird sofort abgebrochen und einmal neu
+          generiert, der Client verwirft den bisherigen Text
+        - ``done``: finaler (lokal umgeschriebener) Prompt inkl. Validierung
+
+        Kein Single-Flight: ein Stream lässt sich nicht teilen.
+        """
+        started = time.perf_counter() if started is None else started
+        name = prompt_json.character.identity.name
+        request = self._json_to_text_request(prompt_json)
+        first_text = None
+
+        for attempt in (1, 2):
+            scanner = forbidden_word_stream()
+            blocking = []
+            stream = self._stream_text(request)
+            try:
+                async for chunk in stream:
+                    if first_text is None:
+                        first_text = time.perf_counter() - started
+                        self.stream_first_text.record(first_text)
+                    yield "chunk", {"text": chunk}
+                    for match in scanner.feed(chunk):
+                        local_fix = self.rewriter.can_rewrite(match.word, name)
+                        yield "forbidden", {**match._asdict(), "local_fix": local_fix}
+                        if not local_fix:
+                            blocking.append(match)
+                    if blocking and attempt == 1:
+                        break
+            finally:
+                await stream.aclose()
+
+            if not (blocking and attempt == 1):
+                for match in scanner.finish():
+                    local_fix = self.rewriter.can_rewrite(match.word, name)
+                    yield "forbidden", {**match._asdict(), "local_fix": local_fix}
+                if attempt == 1:
+                    rewrite = self._rewrite_prompt_text(prompt_json, scanner.text)
+                else:
+                    rewrite = self.rewriter.rewrite(scanner.text, name)
+                if rewrite.resolved or attempt == 2:
+                    break
+                blocking = rewrite.unresolved
+            else:
+                self.stream_early_regenerations += 1
+
+            # Lokal nicht reparierbar → genau ein erneuter (gestreamter) Gemini-Call
+            self.rewriter.record_regeneration()
+            words = list(dict.fromkeys(m.word for m in blocking))
+            yield "restart", {"words": words}
+            request = self._regeneration_request(prompt_json, RewriteResult(scanner.text, [], blocking))
+
+        output = self._assemble_output(prompt_json, rewrite)
+        yield "done", {
+            "prompt_text": output.full_prompt_text,
+            "word_count": output.estimated_word_count,
+            "validation_passed": output.forbidden_words_check,
+            "rewritten_words": output.rewritten_words,
+            "regenerated": attempt == 2,
+            "first_text_ms": round(first_text * 1000, 1) if first_text is not None else None,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
     # ========================================================================
     # 4. CONVENIENCE: End-to-End Text → Finaler Prompt
     # ========================================================================
     
-    def generate_full_prompt(self, user_input: str) -> PromptAssemblyOutput:
+    def generate_full_prompt(self, user_input: str, mode: str = "polish") -> PromptAssemblyOutput:
         """
         Alles in einem: Text-Input → JSON → Flüssiger Prompt.
         
@@ -276,18 +788,51 @@ class GeminiPromptGenerator:
         
         Args:
             user_input: Nutzer-Eingabe (Idee, Beschreibung)
+            mode: "polish" (Gemini schreibt den Prompt) oder "local" (Template-Assembler,
+                nur Schritt 1 braucht Gemini)
         
         Returns:
             PromptAssemblyOutput: Finaler, optimierter Prompt
         """
+        self._check_prompt_mode(mode)
         # Schritt 1: Text → JSON
         json_schema = self.text_to_json(user_input)
         
         # Schritt 2: JSON → Prompt-Text
+        if mode == "local":
+            return self.json_to_prompt_text_local(json_schema)
         final_output = self.json_to_prompt_text(json_schema)
         
         return final_output
 
+    async def generate_full_prompt_async(self, user_input: str, mode: str = "polish") -> PromptAssemblyOutput:
+        """Async-Variante von :meth:`generate_full_prompt`."""
+        self._check_prompt_mode(mode)
+        json_schema = await self.text_to_json_async(user_input)
+        if mode == "local":
+            return self.json_to_prompt_text_local(json_schema)
+        return await self.json_to_prompt_text_async(json_schema)
+
+    @staticmethod
+    def _check_prompt_mode(mode: str) -> None:
+        if mode not in PROMPT_MODES:
+            raise ValueError(f"Unbekannter Modus '{mode}' (erlaubt: {', '.join(PROMPT_MODES)})")
+
+    async def stream_full_prompt_async(self, user_input: str) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming-Variante von :meth:`generate_full_prompt_async`: zuerst das
+        JSON (``json``-Event, sobald Stufe 1 fertig ist), dann die Events von
+        :meth:`stream_prompt_text_async`. Die Zeit bis zum ``json``-Event
+        geht als TTFB in die Metriken ein.
+        """
+        started = time.perf_counter()
+        json_schema = await self.text_to_json_async(user_input)
+        ttfb = time.perf_counter() - started
+        self.stream_ttfb.record(ttfb)
+        yield "json", {"json_structure": json_schema.model_dump(mode="json"), "ttfb_ms": round(ttfb * 1000, 1)}
+        async for event in self.stream_prompt_text_async(json_schema, started):
+            yield event
+
 
 # ============================================================================
 # CLI / TESTING
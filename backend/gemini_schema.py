@@ -0,0 +1,102 @@
+"""
+Pydantic model -> Gemini ``response_schema``
+
+Gemini's structured output accepts an OpenAPI subset (type, format,
+description, nullable, enum, items, properties, required, min/max_items).
+Pydantic's JSON Schema uses more than that, so it is rewritten here:
+
+- ``$ref``/``$defs`` are inlined
+- ``Optional[X]`` (``anyOf [X, null]``) becomes ``X`` + ``nullable``
+- other unions keep their first non-null member (the reply is still
+  validated against the full Pydantic model)
+- free-form dicts (``additionalProperties`` without ``properties``) are
+  dropped; Gemini rejects OBJECT schemas without properties
+- titles, defaults, examples and unsupported constraints are removed
+"""
+
+import functools
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+# Formats Gemini honours; everything else is dropped
+_FORMATS = {"string": {"date-time"}, "integer": {"int32", "int64"}, "number": {"float", "double"}}
+
+
+@functools.lru_cache(maxsize=None)
+def response_schema(model_cls: Type[BaseModel]) -> Dict[str, Any]:
+    """Gemini-compatible schema for ``model_cls`` (cached per class)."""
+    schema = model_cls.model_json_schema()
+    converted = _convert(schema, schema.get("$defs", {}))
+    if converted is None:
+        raise ValueError(f"{model_cls.__name__} lässt sich nicht als response_schema abbilden")
+    return converted
+
+
+def _convert(node: Dict[str, Any], defs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if "$ref" in node:
+        target = defs[node["$ref"].rsplit("/", 1)[-1]]
+        # Field-level description wins over the referenced model's docstring
+        return _convert({**target, **{k: v for k, v in node.items() if k != "$ref"}}, defs)
+
+    if "anyOf" in node or "oneOf" in node:
+        variants = node.get("anyOf") or node.get("oneOf")
+        non_null = [v for v in variants if v.get("type") != "null"]
+        if not non_null:
+            return None
+        extra = {k: v for k, v in node.items() if k not in ("anyOf", "oneOf", "default", "title")}
+        converted = None
+        for variant in non_null:
+            converted = _convert({**variant, **extra}, defs)
+            if converted is not None:
+                break
+        if converted is not None and len(non_null) < len(variants):
+            converted["nullable"] = True
+        return converted
+
+    if "allOf" in node and len(node["allOf"]) == 1:
+        merged = {**node["allOf"][0], **{k: v for k, v in node.items() if k != "allOf"}}
+        return _convert(merged, defs)
+
+    node_type = node.get("type")
+    if node_type is None and "enum" in node:
+        node_type = "string"
+    if node_type not in ("string", "integer", "number", "boolean", "array", "object"):
+        return None
+
+    result: Dict[str, Any] = {"type": node_type}
+    if node.get("description"):
+        result["description"] = node["description"]
+    if node.get("format") in _FORMATS.get(node_type, ()):
+        result["format"] = node["format"]
+
+    if "enum" in node:
+        if node_type != "string":
+            return None
+        result["format"] = "enum"
+        result["enum"] = [str(value) for value in node["enum"]]
+
+    if node_type == "array":
+        items = _convert(node.get("items") or {}, defs)
+        if items is None:
+            return None
+        result["items"] = items
+        if "minItems" in node:
+            result["min_items"] = node["minItems"]
+        if "maxItems" in node:
+            result["max_items"] = node["maxItems"]
+
+    if node_type == "object":
+        properties = {}
+        for name, prop in (node.get("properties") or {}).items():
+            converted = _convert(prop, defs)
+            if converted is not None:
+                properties[name] = converted
+        if not properties:
+            return None
+        result["properties"] = properties
+        required = [name for name in node.get("required", []) if name in properties]
+        if required:
+            result["required"] = required
+
+    return result
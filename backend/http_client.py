@@ -0,0 +1,46 @@
+"""
+Shared outbound HTTP client (Civitai API and image downloads)
+
+One long-lived ``httpx.AsyncClient`` per process, opened and closed by the
+app lifespan, so imports reuse pooled keep-alive (and, over TLS, HTTP/2)
+connections instead of paying TCP + TLS setup on every request.
+"""
+
+import importlib.util
+import os
+
+import httpx
+
+from backend.env import env_int
+
+DEFAULT_CIVITAI_API_BASE = "https://civitai.com/api/v1"
+
+# Per-phase timeouts: fail fast on connect/pool waits, allow slow bodies
+HTTP_TIMEOUT = httpx.Timeout(connect=5.0, read=20.0, write=10.0, pool=5.0)
+
+HTTP_LIMITS = httpx.Limits(
+    max_connections=env_int("HTTP_MAX_CONNECTIONS", 20),
+    max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE", 10, minimum=0),
+    keepalive_expiry=30.0,
+)
+
+# HTTP/2 needs the optional ``h2`` package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def civitai_api_base() -> str:
+    """CIVITAI_API_BASE, e.g. a local stand-in server in tests."""
+    return os.getenv("CIVITAI_API_BASE", DEFAULT_CIVITAI_API_BASE).rstrip("/")
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the app-scoped client; callers own closing it (``aclose``)."""
+    if not HTTP2_AVAILABLE:
+        print("Startup Warning: Paket 'h2' fehlt, ausgehende Requests nutzen HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=HTTP_TIMEOUT,
+        limits=HTTP_LIMITS,
+        follow_redirects=True,
+        headers={"User-Agent": "promptos/1.0"},
+    )
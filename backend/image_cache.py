@@ -0,0 +1,206 @@
+"""
+Near-duplicate lookup for image-to-JSON results
+
+The vision result itself lives in the ResponseCache under its exact key
+(sha256 of the upload). This module adds a perceptual layer on top: a 64-bit
+dHash per image, stored in a multi-index hash table, maps resized or
+recompressed copies of a known image to the cache key of the original.
+
+Multi-index hashing: the hash is split into ``chunks`` disjoint chunks
+(22/21/21 bit by default). By the pigeonhole principle, two hashes within
+Hamming distance ``r`` agree to within ``r // chunks`` bits in at least one
+chunk, so a lookup only probes the buckets near each query chunk instead of
+scanning every stored hash. Chunks of about log2(N) bits keep buckets at
+roughly one entry for N = 1M.
+"""
+
+import io
+import itertools
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from backend.env import env_int
+
+
+def dhash(data: bytes, hash_size: int = 8) -> Optional[int]:
+    """
+    Difference hash of an encoded image (``hash_size ** 2`` bits), or None
+    if Pillow cannot decode it. Stable under resizing and recompression.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            # Decoding at 1/8 scale is plenty for a 9x8 thumbnail
+            image.draft("L", (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image)
+        pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX).tobytes()
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class MultiIndexHash:
+    """
+    Hamming-space index over fixed-width integer hashes.
+
+    Not thread-safe on its own; :class:`PerceptualImageIndex` wraps it with
+    a lock.
+    """
+
+    def __init__(self, bits: int = 64, chunks: int = 3):
+        if not 1 <= chunks <= bits:
+            raise ValueError("chunks must be between 1 and bits")
+        self.bits = bits
+        self.chunks = chunks
+        base, extra = divmod(bits, chunks)
+        self._widths = [base + (1 if i < extra else 0) for i in range(chunks)]
+        self._shifts = [sum(self._widths[:i]) for i in range(chunks)]
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in range(chunks)]
+        self._hashes: Dict[str, int] = {}
+        self._flip_masks: Dict[Tuple[int, int], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _split(self, value: int) -> List[int]:
+        return [(value >> shift) & ((1 << width) - 1) for shift, width in zip(self._shifts, self._widths)]
+
+    def _masks(self, width: int, radius: int) -> List[int]:
+        """All ``width``-bit XOR masks with at most ``radius`` set bits."""
+        masks = self._flip_masks.get((width, radius))
+        if masks is None:
+            masks = [
+                sum(1 << bit for bit in flipped)
+                for r in range(radius + 1)
+                for flipped in itertools.combinations(range(width), r)
+            ]
+            self._flip_masks[(width, radius)] = masks
+        return masks
+
+    def add(self, value: int, key: str) -> None:
+        if key in self._hashes:
+            self.remove(key)
+        self._hashes[key] = value
+        for table, chunk in zip(self._tables, self._split(value)):
+            table.setdefault(chunk, []).append(key)
+
+    def remove(self, key: str) -> None:
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for table, chunk in zip(self._tables, self._split(value)):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del table[chunk]
+
+    def nearest(self, value: int, max_distance: int) -> Optional[Tuple[str, int]]:
+        """Closest stored ``(key, distance)`` within ``max_distance``, or None."""
+        radius = max_distance // self.chunks
+        best: Optional[Tuple[str, int]] = None
+        seen = set()
+        for table, chunk, width in zip(self._tables, self._split(value), self._widths):
+            for mask in self._masks(width, radius):
+                bucket = table.get(chunk ^ mask)
+                if not bucket:
+                    continue
+                for key in bucket:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    distance = (self._hashes[key] ^ value).bit_count()
+                    if distance <= max_distance and (best is None or distance < best[1]):
+                        if distance == 0:
+                            return key, 0
+                        best = (key, distance)
+        return best
+
+
+class PerceptualImageIndex:
+    """
+    Maps perceptual hashes to cache keys of stored vision results.
+
+    ``max_distance`` is the Hamming threshold (out of 64 bits) under which
+    two images count as the same picture.
+    """
+
+    def __init__(self, max_distance: int = 6, chunks: int = 3):
+        self.max_distance = max_distance
+        self.lookups = 0
+        self.near_hits = 0
+        self._index = MultiIndexHash(bits=64, chunks=chunks)
+        self._lock = threading.Lock()
+
+    def lookup(self, value: int) -> Optional[str]:
+        with self._lock:
+            self.lookups += 1
+            match = self._index.nearest(value, self.max_distance)
+        return match[0] if match else None
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.near_hits += 1
+
+    def add(self, value: int, key: str) -> None:
+        with self._lock:
+            self._index.add(value, key)
+
+    def discard(self, key: str) -> None:
+        """Forget a key whose cache entry is gone (evicted/expired)."""
+        with self._lock:
+            self._index.remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "lookups": self.lookups,
+                "near_hits": self.near_hits,
+                "max_distance": self.max_distance,
+            }
+
+    @classmethod
+    def from_env(cls) -> Optional["PerceptualImageIndex"]:
+        """
+        IMAGE_DEDUP_ENABLED (default "1") and IMAGE_DEDUP_MAX_DISTANCE
+        (Hamming threshold, default 6).
+        """
+        if os.getenv("IMAGE_DEDUP_ENABLED", "1").lower() in {"0", "false", "no"}:
+            return None
+        return cls(max_distance=env_int("IMAGE_DEDUP_MAX_DISTANCE", 6, minimum=0))
+
+
+if __name__ == "__main__":
+    # Benchmark: lookups against 1M random stored hashes
+    import random
+    import time
+
+    rng = random.Random(7)
+    index = MultiIndexHash()
+    stored = [rng.getrandbits(64) for _ in range(1_000_000)]
+    started = time.perf_counter()
+    for i, value in enumerate(stored):
+        index.add(value, str(i))
+    print(f"built 1M entries in {time.perf_counter() - started:.1f} s")
+
+    for max_distance in (4, 6, 8):
+        queries = []
+        for value in rng.sample(stored, 500):
+            for bit in rng.sample(range(64), max_distance):
+                value ^= 1 << bit
+            queries.append(value)
+        queries += [rng.getrandbits(64) for _ in range(500)]
+        started = time.perf_counter()
+        found = sum(index.nearest(q, max_distance) is not None for q in queries)
+        per_lookup = (time.perf_counter() - started) / len(queries)
+        print(f"r={max_distance}: {per_lookup * 1e6:.0f} µs/lookup, {found}/{len(queries)} matched")
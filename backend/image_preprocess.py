@@ -0,0 +1,187 @@
+"""
+Image preprocessing before the vision call
+
+Camera originals (20-40 MB) are far larger than the vision model needs.
+Before an upload is sent to Gemini it is:
+
+1. sniffed: the real format comes from the magic bytes, not the filename
+   or the client's Content-Type
+2. decoded: JPEGs use DCT draft mode, so large originals decode at reduced
+   size
+3. resized: longest edge capped at ``max_edge``
+4. re-encoded: metadata-free JPEG (EXIF/GPS, ICC, XMP are dropped; EXIF
+   orientation is applied first)
+
+Images Pillow cannot decode (e.g. HEIC without a plugin) are passed through
+unchanged with the sniffed MIME type.
+"""
+
+import io
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from backend.env import env_int
+
+# (offset, signature, mime_type); ISO-BMFF brands are handled separately
+_SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"BM", "image/bmp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+)
+_FTYP_BRANDS = {
+    b"heic": "image/heic", b"heix": "image/heic", b"heim": "image/heic", b"heis": "image/heic",
+    b"mif1": "image/heif", b"msf1": "image/heif",
+    b"avif": "image/avif", b"avis": "image/avif",
+}
+
+STAGES = ("sniff", "decode", "resize", "encode")
+
+
+def sniff_image_format(data: bytes) -> Optional[str]:
+    """Return the MIME type implied by the magic bytes, or None if unknown."""
+    head = bytes(data[:16])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return _FTYP_BRANDS.get(head[8:12])
+    for offset, signature, mime_type in _SIGNATURES:
+        if head.startswith(signature, offset):
+            return mime_type
+    return None
+
+
+class PreprocessResult(NamedTuple):
+    data: bytes
+    mime_type: str
+    input_bytes: int
+    output_bytes: int
+    original_size: Optional[Tuple[int, int]]
+    output_size: Optional[Tuple[int, int]]
+    timings: Dict[str, float]   # seconds per stage
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.input_bytes - self.output_bytes
+
+
+class ImagePreprocessor:
+    """
+    Thread-safe preprocessing stage with counters for /api/metrics.
+
+    ``process`` is CPU-bound; async callers should run it via
+    ``backend.concurrency.run_in_worker``.
+    """
+
+    def __init__(self, max_edge: int = 1536, quality: int = 85, enabled: bool = True):
+        self.max_edge = max_edge
+        self.quality = quality
+        self.enabled = enabled
+        self.images = 0
+        self.reencoded = 0
+        self.passthrough = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def fingerprint(self) -> str:
+        """Settings that change the output; part of the vision cache key."""
+        if not self.enabled:
+            return "raw"
+        return f"jpeg:q{self.quality}:edge{self.max_edge}"
+
+    def process(self, data: bytes, declared_mime_type: str = "image/jpeg") -> PreprocessResult:
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        mime_type = sniff_image_format(data) or declared_mime_type
+        timings["sniff"] = time.perf_counter() - started
+
+        if not self.enabled:
+            return self._record(PreprocessResult(data, mime_type, len(data), len(data), None, None, timings), False)
+
+        try:
+            started = time.perf_counter()
+            image = Image.open(io.BytesIO(data))
+            original_size = image.size
+            if image.format == "JPEG":
+                # Decode directly at 1/2, 1/4 or 1/8 scale where possible
+                image.draft("RGB", (self.max_edge, self.max_edge))
+            image = ImageOps.exif_transpose(image)
+            image = self._to_rgb(image)
+            timings["decode"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            if max(image.size) > self.max_edge:
+                image.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            timings["resize"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            buffer = io.BytesIO()
+            # No exif/icc_profile arguments -> metadata is not written
+            image.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+            encoded = buffer.getvalue()
+            timings["encode"] = time.perf_counter() - started
+        except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError):
+            return self._record(PreprocessResult(data, mime_type, len(data), len(data), None, None, timings), False)
+
+        result = PreprocessResult(
+            encoded, "image/jpeg", len(data), len(encoded), original_size, image.size, timings
+        )
+        return self._record(result, True)
+
+    @staticmethod
+    def _to_rgb(image: "Image.Image") -> "Image.Image":
+        if image.mode == "RGB":
+            return image
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # Flatten transparency onto white; JPEG has no alpha channel
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            return background
+        return image.convert("RGB")
+
+    def _record(self, result: PreprocessResult, reencoded: bool) -> PreprocessResult:
+        with self._lock:
+            self.images += 1
+            if reencoded:
+                self.reencoded += 1
+            else:
+                self.passthrough += 1
+            self.bytes_in += result.input_bytes
+            self.bytes_out += result.output_bytes
+            for stage, seconds in result.timings.items():
+                self.stage_seconds[stage] += seconds
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "images": self.images,
+                "reencoded": self.reencoded,
+                "passthrough": self.passthrough,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "stage_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stage_seconds.items()},
+            }
+
+    @classmethod
+    def from_env(cls) -> "ImagePreprocessor":
+        """
+        Build from environment variables: IMAGE_PREPROCESS_ENABLED (default "1"),
+        IMAGE_MAX_EDGE (default 1536), IMAGE_JPEG_QUALITY (default 85).
+        """
+        return cls(
+            max_edge=env_int("IMAGE_MAX_EDGE", 1536),
+            quality=env_int("IMAGE_JPEG_QUALITY", 85),
+            enabled=os.getenv("IMAGE_PREPROCESS_ENABLED", "1").lower() not in {"0", "false", "no"},
+        )
@@ -0,0 +1,354 @@
+"""
+Bulk ingest of local image collections (CLI)
+
+    python -m backend.ingest renders/ --output library.ndjson
+    python -m backend.ingest renders.zip --database postgresql://.../zimage_turbo
+
+Walks a directory (``os.scandir``, iteratively), a zip or a tar archive,
+reads the generation metadata of every PNG/JPEG/WebP in a process pool
+(PNG: text chunks only, JPEG/WebP: EXIF headers only) and maps it to a
+BasePrompt without any LLM call (``civitai_meta.meta_to_base_prompt``).
+Results go to NDJSON or straight into the ``prompt_library`` table.
+
+Resumable: a manifest (JSONL) records every processed file by source key,
+size/mtime stamp and sha256. Unchanged files are skipped without being
+read; renamed or copied files are recognized by their hash. Output is
+committed before the manifest is appended, so a crash can at worst
+repeat a batch, never lose one.
+"""
+
+import argparse
+import concurrent.futures
+import functools
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tarfile
+import zipfile
+from typing import IO, Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from backend.civitai_meta import meta_to_base_prompt
+from backend.png_metadata import extract_image_metadata
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+DEFAULT_MANIFEST = ".ingest_manifest.jsonl"
+BATCH_SIZE = 200
+
+
+# ============================================================================
+# Worker side (runs in the process pool)
+# ============================================================================
+
+def analyze_bytes(data) -> Dict[str, Any]:
+    """Hash + metadata + BasePrompt of one image buffer (bytes, memoryview or mmap)."""
+    record: Dict[str, Any] = {"hash": hashlib.sha256(data).hexdigest()}
+    try:
+        metadata = extract_image_metadata(data)
+        if metadata is None:
+            return {**record, "success": False, "error": "Keine Generierungs-Metadaten"}
+        base_prompt = meta_to_base_prompt(metadata.meta, metadata.width, metadata.height)
+    except ValueError as e:
+        return {**record, "success": False, "error": str(e)}
+    return {
+        **record,
+        "success": True,
+        "generator": metadata.generator,
+        "base_prompt": base_prompt.model_dump(),
+        "meta": metadata.meta,
+    }
+
+
+def analyze_file(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return analyze_bytes(b"")
+        # mmap: hashing and chunk walking without copying the file into Python
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return analyze_bytes(mapped)
+
+
+@functools.lru_cache(maxsize=4)
+def _open_zip(archive: str) -> zipfile.ZipFile:
+    # One handle per worker process; re-reading the central directory per
+    # member would make large archives quadratic
+    return zipfile.ZipFile(archive)
+
+
+def analyze_zip_member(archive: str, name: str) -> Dict[str, Any]:
+    return analyze_bytes(_open_zip(archive).read(name))
+
+
+# ============================================================================
+# Sources
+# ============================================================================
+
+class IngestSource(NamedTuple):
+    key: str                                     # path, or "<archive>::<member>"
+    stamp: str                                   # cheap change marker (size + mtime/crc)
+    make_task: Callable[[], Callable[[], Dict[str, Any]]]  # -> picklable zero-arg task
+
+
+def _is_image(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _scan_directory(root: str) -> Iterator[IngestSource]:
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif _is_image(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        yield IngestSource(
+                            entry.path,
+                            f"{stat.st_size}:{stat.st_mtime_ns}",
+                            lambda path=entry.path: functools.partial(analyze_file, path),
+                        )
+        except PermissionError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+
+
+def _scan_zip(archive: str) -> Iterator[IngestSource]:
+    with zipfile.ZipFile(archive) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir() and _is_image(info.filename)]
+    for info in members:
+        yield IngestSource(
+            f"{archive}::{info.filename}",
+            f"{info.file_size}:{info.CRC:08x}",
+            lambda name=info.filename: functools.partial(analyze_zip_member, archive, name),
+        )
+
+
+def _scan_tar(archive: str) -> Iterator[IngestSource]:
+    # Tar has no random access (compressed tars even less): the member is
+    # read here, in order, and only the bytes go to the worker
+    with tarfile.open(archive, "r:*") as tf:
+        for member in tf:
+            if not member.isfile() or not _is_image(member.name):
+                continue
+
+            def make_task(member=member):
+                return functools.partial(analyze_bytes, tf.extractfile(member).read())
+
+            yield IngestSource(f"{archive}::{member.name}", f"{member.size}:{member.mtime}", make_task)
+
+
+def iter_sources(path: str) -> Iterator[IngestSource]:
+    """Image sources below a directory, in a zip or in a (compressed) tar."""
+    if os.path.isdir(path):
+        return _scan_directory(path)
+    if zipfile.is_zipfile(path):
+        return _scan_zip(path)
+    if tarfile.is_tarfile(path):
+        return _scan_tar(path)
+    raise ValueError(f"Weder Verzeichnis noch zip/tar: {path}")
+
+
+# ============================================================================
+# Manifest and sinks
+# ============================================================================
+
+class IngestManifest:
+    """Append-only JSONL of processed sources: ``{"key", "stamp", "hash"}``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stamps: Dict[str, str] = {}
+        self._hashes: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self._stamps[entry["key"]] = entry["stamp"]
+                    self._hashes.add(entry["hash"])
+
+    def is_unchanged(self, source: IngestSource) -> bool:
+        return self._stamps.get(source.key) == source.stamp
+
+    def has_hash(self, content_hash: str) -> bool:
+        return content_hash in self._hashes
+
+    def record(self, entries: List[Tuple[IngestSource, str]]) -> None:
+        if not entries:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for source, content_hash in entries:
+                f.write(json.dumps({"key": source.key, "stamp": source.stamp, "hash": content_hash}) + "\n")
+                self._stamps[source.key] = source.stamp
+                self._hashes.add(content_hash)
+
+
+class NdjsonSink:
+    """One JSON line per processed file (failures included, ``success: false``)."""
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.stream not in (sys.stdout, sys.stderr):
+            self.stream.close()
+
+
+class DatabaseSink:
+    """Inserts successful records into ``prompt_library``, one transaction per batch."""
+
+    def __init__(self, connection_string: str):
+        from sqlalchemy import create_engine
+
+        self.engine = create_engine(connection_string)
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        from backend.db_models import LibraryPrompt
+
+        rows = [
+            {
+                "content_hash": record["hash"],
+                "source_path": record["path"],
+                "generator": record["generator"],
+                "base_prompt_json": record["base_prompt"],
+                "raw_meta_json": record["meta"],
+            }
+            for record in records
+            if record["success"]
+        ]
+        if not rows:
+            return
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy import insert
+        statement = insert(LibraryPrompt)
+        if hasattr(statement, "on_conflict_do_nothing"):
+            # Same image already in the library (e.g. from an earlier manifest)
+            statement = statement.on_conflict_do_nothing(index_elements=["content_hash"])
+        with self.engine.begin() as connection:
+            connection.execute(statement, rows)
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+# ============================================================================
+# Driver
+# ============================================================================
+
+def run_ingest(
+    path: str,
+    sink,
+    manifest: IngestManifest,
+    workers: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Dict[str, int]:
+    """
+    Ingest everything below ``path`` into ``sink``; returns counts
+    (imported, no_metadata, duplicates, unchanged, errors).
+
+    At most ``4 * workers`` files are in flight, so memory stays bounded
+    for archives of any size.
+    """
+    counts = {"imported": 0, "no_metadata": 0, "duplicates": 0, "unchanged": 0, "errors": 0}
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    window = 4 * (workers or os.cpu_count() or 1)
+
+    batch: List[Dict[str, Any]] = []
+    processed: List[Tuple[IngestSource, str]] = []
+    batch_hashes: Set[str] = set()
+
+    def flush() -> None:
+        sink.write(batch)
+        manifest.record(processed)
+        batch.clear()
+        processed.clear()
+        batch_hashes.clear()
+
+    def collect(future: concurrent.futures.Future, source: IngestSource) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            # I/O or decode failure: not recorded, retried on the next run
+            counts["errors"] += 1
+            batch.append({"path": source.key, "success": False, "error": str(e)})
+            return
+        if manifest.has_hash(result["hash"]) or result["hash"] in batch_hashes:
+            counts["duplicates"] += 1
+        else:
+            counts["imported" if result["success"] else "no_metadata"] += 1
+            batch.append({"path": source.key, **result})
+            batch_hashes.add(result["hash"])
+        processed.append((source, result["hash"]))
+        if len(batch) >= batch_size or len(processed) >= batch_size:
+            flush()
+
+    pending: Dict[concurrent.futures.Future, IngestSource] = {}
+    try:
+        for source in iter_sources(path):
+            if manifest.is_unchanged(source):
+                counts["unchanged"] += 1
+                continue
+            pending[executor.submit(source.make_task())] = source
+            if len(pending) >= window:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    collect(future, pending.pop(future))
+        for future in concurrent.futures.as_completed(list(pending)):
+            collect(future, pending.pop(future))
+        flush()
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.ingest",
+        description="Bild-Metadaten (A1111/ComfyUI) aus Ordner/zip/tar als BasePrompts importieren",
+    )
+    parser.add_argument("path", help="Verzeichnis, .zip oder .tar(.gz)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--output", "-o", default="-", help="NDJSON-Ausgabe (Standard: stdout, wird angehängt)")
+    target.add_argument("--database", help="SQLAlchemy-URL; schreibt in die Tabelle prompt_library")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help=f"Resume-Manifest (Standard: {DEFAULT_MANIFEST})")
+    parser.add_argument("--workers", type=int, default=None, help="Prozesse (Standard: CPU-Anzahl)")
+    args = parser.parse_args(argv)
+
+    if args.database:
+        sink = DatabaseSink(args.database)
+    elif args.output == "-":
+        sink = NdjsonSink(sys.stdout)
+    else:
+        sink = NdjsonSink(open(args.output, "a", encoding="utf-8"))
+
+    try:
+        counts = run_ingest(args.path, sink, IngestManifest(args.manifest), args.workers)
+    except ValueError as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 2
+    finally:
+        sink.close()
+
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()), file=sys.stderr)
+    return 1 if counts["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Tolerant JSON extraction from LLM replies
+
+Structured-output replies are plain JSON and take the fast path (one
+``json.loads``). Everything else - Markdown fences, prose before or after
+the object, trailing commas - is handled in a single regex pass over the
+text: only string literals, brackets and trailing commas are tokens, so the
+Python-level loop runs over a few hundred tokens instead of every character.
+"""
+
+import itertools
+import json
+import re
+from typing import Any, List
+
+# String literal | bracket | comma that only whitespace separates from a closing bracket
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]|,(?=\s*[}\]])', re.DOTALL)
+_OPEN = re.compile(r"[{\[]")
+_CLOSE = {"{": "}", "[": "]"}
+
+# Opening brackets tried before giving up (brackets in prose, "[see below]")
+MAX_START_CANDIDATES = 8
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse the first JSON object/array in ``text``.
+
+    Raises:
+        json.JSONDecodeError: if there is no (repairable) JSON value
+    """
+    text = text.strip().lstrip("\ufeff")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        error = e
+
+    for start in itertools.islice(_OPEN.finditer(text), MAX_START_CANDIDATES):
+        try:
+            return _parse_from(text, start.start())
+        except json.JSONDecodeError as e:
+            error = e
+    raise error
+
+
+def _parse_from(text: str, start: int) -> Any:
+    stack: List[str] = []
+    dropped: List[int] = []
+    end = -1
+    for match in _TOKEN.finditer(text, start):
+        token = match.group()
+        if token in _CLOSE:
+            stack.append(_CLOSE[token])
+        elif token in ("}", "]"):
+            if not stack or stack.pop() != token:
+                raise json.JSONDecodeError(f"Unerwartetes '{token}'", text, match.start())
+            if not stack:
+                end = match.end()
+                break
+        elif token == ",":
+            dropped.append(match.start())
+
+    if end < 0:
+        raise json.JSONDecodeError("Unvollständiges JSON in der Antwort", text, len(text))
+
+    # Trailing commas are cut out while joining the slices
+    parts = []
+    position = start
+    for comma in dropped:
+        parts.append(text[position:comma])
+        position = comma + 1
+    parts.append(text[position:end])
+    return json.loads("".join(parts))
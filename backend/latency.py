@@ -0,0 +1,63 @@
+"""
+Fixed-bucket latency histograms for /api/metrics
+
+Constant memory per histogram regardless of traffic; percentiles are read
+from the bucket bounds, which is precise enough for dashboards (the bounds
+grow by ~1.5x per bucket).
+"""
+
+import bisect
+import threading
+from typing import Dict, Optional, Sequence
+
+# Upper bucket bounds in milliseconds; everything above lands in the overflow bucket
+DEFAULT_BOUNDS_MS = (
+    5, 10, 25, 50, 75, 100, 150, 250, 400, 600, 1000, 1500,
+    2500, 4000, 6000, 10000, 15000, 25000, 40000, 60000,
+)
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of durations (recorded in seconds, reported in ms)."""
+
+    def __init__(self, bounds_ms: Sequence[float] = DEFAULT_BOUNDS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self._counts = [0] * (len(self.bounds_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        index = bisect.bisect_left(self.bounds_ms, ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum_ms += ms
+            self._max_ms = max(self._max_ms, ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction (max for the overflow bucket)."""
+        with self._lock:
+            if not self._count:
+                return None
+            rank = fraction * self._count
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank and count:
+                    return float(self.bounds_ms[index]) if index < len(self.bounds_ms) else round(self._max_ms, 1)
+            return round(self._max_ms, 1)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            count, total, peak = self._count, self._sum_ms, self._max_ms
+        return {
+            "count": count,
+            "mean_ms": round(total / count, 1) if count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(peak, 1) if count else None,
+        }
@@ -1,14 +1,19 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import json
+import mimetypes
 import os
 import sys
 import uvicorn
 import re
 import uuid
+from contextlib import asynccontextmanager
+import httpx
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Tuple
 
 # Ensure the backend directory is in the python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -18,12 +23,67 @@ load_dotenv()
 
 # Import internal modules
 from backend.gemini_integration import GeminiPromptGenerator
-from backend.models import ZImageTurboPrompt, PromptAssemblyOutput, BasePrompt
-from backend.adapters import get_adapter
-from backend.errors import ErrorCode, ErrorEnvelope, SuccessResponse, ErrorDetail
+from backend.cache import ResponseCache
+from backend.rewrite import ForbiddenWordRewriter
+from backend.image_preprocess import ImagePreprocessor
+from backend.image_cache import PerceptualImageIndex
+from backend.repair import SchemaRepairer
+from backend.models import ZImageTurboPrompt, PromptAssemblyOutput, BasePrompt, Story
+from backend.adapters import get_adapter, adapt_many, list_adapters
+from backend.errors import (
+    ErrorCode, ErrorEnvelope, SuccessResponse, ErrorDetail, BatchItemResult,
+    EmptyInputError, SchemaValidationError, DownloadRejectedError,
+)
+from backend.concurrency import bounded_gather
+from backend.env import env_int
+from backend.pipeline import PipelineItem, PromptPipeline
+from backend.assembler import PROMPT_MODES, assemble_prompt
+from backend.story import StoryEngine, StoryPromptStore, StoryRender
+from backend.http_client import create_http_client
+from backend.civitai import EXTRACT_MODES, fetch_image_metadata, extract_item
+from backend.civitai_bulk import BulkImporter, new_job, job_summary
+from backend.civitai_meta import build_base_prompt
+from backend.png_metadata import extract_png_metadata
+from backend.streaming import iter_ndjson_lines, ndjson_line, sse_event, SSE_HEADERS, RequestStreamingResponse
 from backend.validation import validate_base_prompt, apply_defaults, create_error_response
 
-app = FastAPI(title="Z-Image-Turbo Prompt Platform")
+# Geteilter HTTP-Client für Civitai (Keep-Alive/HTTP2-Pool), lebt im Lifespan
+http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """App-weiter Client; wird lazy erzeugt, falls der Lifespan nicht lief."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+
+# Bulk-Import-Jobs (Zustand als JSON unter CIVITAI_IMPORT_DIR)
+bulk_importer = BulkImporter.from_env()
+prompt_pipeline = PromptPipeline.from_env()
+# Gerenderte Szenen nach Fingerprint; Story-Änderungen rendern nur betroffene Szenen neu
+story_engine = StoryEngine.from_env(prompt_pipeline)
+# Persistenz gerenderter Story-Szenen (nur mit DATABASE_URL)
+story_store = StoryPromptStore.from_env()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = create_http_client()
+    try:
+        yield
+    finally:
+        # Laufende Jobs als "interrupted" sichern, bevor der Client schließt
+        await bulk_importer.shutdown()
+        await http_client.aclose()
+        http_client = None
+        if story_store is not None:
+            story_store.close()
+
+
+app = FastAPI(title="Z-Image-Turbo Prompt Platform", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -37,16 +97,59 @@ app.add_middleware(
 # Initialize Gemini Generator
 # We initialize it here so it's ready when the app starts.
 # If API KEY is missing, it will raise an error on startup, which is good.
+# Ein Rewriter für Generator und lokalen Assembler (gleiche Tabelle, gleiche Zähler)
+prompt_rewriter = ForbiddenWordRewriter.from_env()
+
 try:
-    generator = GeminiPromptGenerator()
+    generator = GeminiPromptGenerator(
+        cache=ResponseCache.from_env(),
+        rewriter=prompt_rewriter,
+        preprocessor=ImagePreprocessor.from_env(),
+        image_index=PerceptualImageIndex.from_env(),
+        repairer=SchemaRepairer.from_env(),
+    )
 except ValueError as e:
     print(f"Startup Warning: {e}")
     generator = None
 
 
+# Batch-Limits (per Umgebungsvariable konfigurierbar)
+BATCH_CONCURRENCY = env_int("BATCH_CONCURRENCY", 8)
+BATCH_MAX_ITEMS = env_int("BATCH_MAX_ITEMS", 1000)
+
+
 class TextPayload(BaseModel):
     text: str
 
+
+class BatchTextPayload(BaseModel):
+    texts: List[str]
+    concurrency: Optional[int] = None
+
+
+class PromptBatchItem(BaseModel):
+    text: Optional[str] = None
+    json_structure: Optional[ZImageTurboPrompt] = None  # gesetzt → Text→JSON entfällt
+
+
+class PromptBatchPayload(BaseModel):
+    items: List[PromptBatchItem]
+    concurrency: Optional[int] = None
+    mode: str = "polish"  # polish | local (siehe PROMPT_MODES)
+
+
+class AdaptManyPayload(BaseModel):
+    base_prompt: dict
+    targets: Optional[List[str]] = None
+
+
+class CivitaiBulkPayload(BaseModel):
+    image_ids: Optional[List[str]] = None
+    query: Optional[Dict[str, Any]] = None  # username, modelId, postId, collectionId, ...
+    mode: str = "auto"  # auto | image | base | fast (siehe EXTRACT_MODES)
+    max_items: int = Field(default=100, ge=1, le=10000)
+    job_id: Optional[str] = None  # gesetzt → unterbrochenen Job fortsetzen
+
 @app.get("/")
 async def root():
     """Root endpoint to welcome users and provide docs link."""
@@ -56,24 +159,226 @@ async def root():
     }
 
 @app.post("/api/text-to-prompt")
-async def text_to_prompt(payload: TextPayload):
-    """Text-Input → Finaler Prompt"""
+async def text_to_prompt(payload: TextPayload, mode: str = "polish"):
+    """
+    Text-Input → Finaler Prompt
+
+    mode=polish: Gemini schreibt den 600-1000 Wort Prompt;
+    mode=local: Template-Assembler (nur Text → JSON braucht Gemini).
+    """
     if not generator:
         raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
     
     try:
-        output = generator.generate_full_prompt(payload.text)
-        return {
-            "success": True,
-            "prompt_text": output.full_prompt_text,
-            "word_count": output.estimated_word_count,
-            "validation_passed": output.forbidden_words_check,
-            "json_structure": output.json_structure.model_dump()
-        }
+        output = await generator.generate_full_prompt_async(payload.text, mode)
+        return {"success": True, **_prompt_output(output)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/api/json-to-prompt")
+async def json_to_prompt(payload: ZImageTurboPrompt, mode: str = "local"):
+    """
+    Strukturiertes JSON → Prompt-Text.
+
+    mode=local (Default): Template-Assembler, ohne Gemini (auch ohne API-Key);
+    mode=polish: Gemini schreibt den Prompt.
+    """
+    if mode not in PROMPT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unbekannter Modus '{mode}' (erlaubt: {', '.join(PROMPT_MODES)})")
+    if mode == "local":
+        output = assemble_prompt(payload, generator.rewriter if generator else prompt_rewriter)
+        return {"success": True, "mode": mode, **_prompt_output(output)}
+
+    if not generator:
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+    try:
+        output = await generator.json_to_prompt_text_async(payload)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "mode": mode, **_prompt_output(output)}
+
+
+def _prompt_output(output: PromptAssemblyOutput) -> dict:
+    return {
+        "prompt_text": output.full_prompt_text,
+        "word_count": output.estimated_word_count,
+        "validation_passed": output.forbidden_words_check,
+        "json_structure": output.json_structure.model_dump(),
+    }
+
+
+def _batch_item(index: int, outcome, field: str, serialize) -> BatchItemResult:
+    if isinstance(outcome, Exception):
+        is_validation = isinstance(outcome, (EmptyInputError, SchemaValidationError))
+        error = create_error_response(
+            error_code=ErrorCode.VALIDATION_ERROR if is_validation else ErrorCode.PROVIDER_ERROR,
+            message=str(outcome),
+            details=[ErrorDetail(field_path=f"{field}.{index}", message=str(outcome))],
+        )
+        return BatchItemResult(index=index, success=False, error=error)
+    return BatchItemResult(index=index, success=True, data=serialize(outcome))
+
+
+def _batch_response(outcomes: list, field: str, serialize) -> dict:
+    """Per-Item-Envelopes für Batch-Endpunkte (Reihenfolge wie im Request)."""
+    results = [_batch_item(index, outcome, field, serialize) for index, outcome in enumerate(outcomes)]
+
+    succeeded = sum(1 for r in results if r.success)
+    return {
+        "success": True,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": [r.model_dump() for r in results],
+    }
+
+
+@app.post("/api/text-to-prompt/batch")
+async def text_to_prompt_batch(payload: PromptBatchPayload):
+    """
+    Liste von Text-Inputs (oder fertigen JSON-Strukturen) → finale Prompts.
+
+    Pipelined: Stufe 2 (JSON → Prompt) eines Items läuft, während Stufe 1
+    (Text → JSON) der nächsten Items noch unterwegs ist; beide Stufen haben
+    eigene Limits (PIPELINE_STAGE1/2_CONCURRENCY).
+    """
+    if not generator:
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+    if len(payload.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maximal {BATCH_MAX_ITEMS} Items pro Batch")
+    if payload.mode not in PROMPT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unbekannter Modus '{payload.mode}' (erlaubt: {', '.join(PROMPT_MODES)})")
+
+    items = [PipelineItem(item.text, item.json_structure) for item in payload.items]
+    outcomes = await prompt_pipeline.run(generator, items, payload.concurrency, payload.mode)
+    return _batch_response(outcomes, "items", _prompt_output)
+
+
+def _check_story(payload: Story, mode: str) -> None:
+    if not generator:
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+    if len(payload.prompts) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maximal {BATCH_MAX_ITEMS} Szenen pro Story")
+    if mode not in PROMPT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unbekannter Modus '{mode}' (erlaubt: {', '.join(PROMPT_MODES)})")
+
+
+def _story_scene(scene) -> dict:
+    """Envelope einer Szene; ``index`` ist die Position in ``prompts``."""
+    outcome = scene.error if scene.error is not None else scene.output
+    return {
+        **_batch_item(scene.index, outcome, "prompts", _prompt_output).model_dump(),
+        "sequence_number": scene.sequence_number,
+        "reused": scene.reused,
+        "depends_on": scene.depends_on,
+    }
+
+
+async def _persist_story(scenes: list) -> int:
+    """Schreibt die Szenen in einem Bulk-Update nach ``prompts`` (0 ohne DATABASE_URL)."""
+    if story_store is None:
+        return 0
+    try:
+        return await asyncio.to_thread(story_store.save, scenes)
+    except Exception as e:
+        print(f"⚠️  WARNUNG: Story konnte nicht gespeichert werden: {e}")
+        return 0
+
+
+@app.post("/api/story/render")
+async def render_story(payload: Story, mode: str = "polish", concurrency: Optional[int] = None):
+    """
+    Story → Prompt-Text pro Szene, sortiert nach ``sequence_number``.
+
+    Szenen werden parallel gerendert (Budget über alle Stories:
+    STORY_CONCURRENCY). GlobalAssets werden in jede Szene eingerechnet;
+    Szenen, deren effektiver Input sich seit dem letzten Rendern nicht
+    geändert hat, werden nicht neu generiert (``reused``/``skipped``).
+    Mit DATABASE_URL landen die Ergebnisse in einem Bulk-Update in ``prompts``.
+    """
+    _check_story(payload, mode)
+
+    result = await story_engine.render(generator, payload, mode, concurrency)
+    results = [_story_scene(scene) for scene in result.scenes]
+    return {
+        "success": True,
+        "story_id": payload.id,
+        "mode": mode,
+        "total": len(results),
+        "succeeded": len(results) - result.failed,
+        "failed": result.failed,
+        "regenerated": result.regenerated,
+        "skipped": result.skipped,
+        "persisted": await _persist_story(result.scenes),
+        "results": results,
+    }
+
+
+@app.post("/api/story/render/stream")
+async def render_story_stream(
+    payload: Story, mode: str = "polish", concurrency: Optional[int] = None, ordered: bool = False
+):
+    """
+    Wie /api/story/render, aber als Server-Sent Events.
+
+    Events: ``scene`` (sobald eine Szene fertig ist; mit ``ordered=true`` erst,
+    wenn alle vorherigen Szenen draußen sind), ``done`` (Zähler, nach dem
+    Bulk-Update) oder ``error``.
+    """
+    _check_story(payload, mode)
+
+    async def events():
+        scenes = []
+        try:
+            async for scene in story_engine.render_stream(generator, payload, mode, concurrency, ordered):
+                scenes.append(scene)
+                yield sse_event("scene", _story_scene(scene))
+        except Exception as e:
+            error = create_error_response(error_code=ErrorCode.PROVIDER_ERROR, message=str(e))
+            yield sse_event("error", error.model_dump(mode="json"))
+            return
+        result = StoryRender(scenes)
+        yield sse_event("done", {
+            "story_id": payload.id,
+            "total": len(scenes),
+            "failed": result.failed,
+            "regenerated": result.regenerated,
+            "skipped": result.skipped,
+            "persisted": await _persist_story(scenes),
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/api/text-to-prompt/stream")
+async def text_to_prompt_stream(payload: TextPayload):
+    """
+    Text-Input → Finaler Prompt als Server-Sent Events.
+
+    Events: ``json`` (Struktur, sobald Stufe 1 fertig ist), ``chunk``
+    (Prompt-Text), ``forbidden`` (inkrementeller Forbidden-Word-Scan),
+    ``restart`` (Neugenerierung, bisherigen Text verwerfen), ``done``
+    (finaler Prompt wie bei /api/text-to-prompt) oder ``error``.
+    """
+    if not generator:
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+
+    async def events():
+        try:
+            async for event, data in generator.stream_full_prompt_async(payload.text):
+                yield sse_event(event, data)
+        except Exception as e:
+            is_validation = isinstance(e, SchemaValidationError)
+            error = create_error_response(
+                error_code=ErrorCode.VALIDATION_ERROR if is_validation else ErrorCode.PROVIDER_ERROR,
+                message=str(e),
+            )
+            yield sse_event("error", error.model_dump(mode="json"))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.post("/api/text-to-base")
 async def text_to_base(payload: TextPayload):
     """Text-Input → Universal BasePrompt"""
@@ -81,7 +386,7 @@ async def text_to_base(payload: TextPayload):
         raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
 
     try:
-        output = generator.text_to_base_prompt(payload.text)
+        output = await generator.text_to_base_prompt_async(payload.text)
         return {
             "success": True,
             "base_prompt": output.model_dump(),
@@ -89,6 +394,34 @@ async def text_to_base(payload: TextPayload):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/text-to-base/batch")
+async def text_to_base_batch(payload: BatchTextPayload):
+    """Liste von Text-Inputs → BasePrompts (parallel, Reihenfolge bleibt erhalten)"""
+    if not generator:
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+    if len(payload.texts) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maximal {BATCH_MAX_ITEMS} Texte pro Batch")
+
+    # Clients may lower the limit, never raise it above the server setting
+    limit = min(payload.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+
+    async def convert(text: str):
+        if not text.strip():
+            raise EmptyInputError("Text must not be empty")
+        return await generator.text_to_base_prompt_async(text)
+
+    outcomes = await bounded_gather(payload.texts, convert, limit)
+    return _batch_response(outcomes, "texts", lambda outcome: outcome.model_dump())
+
+
+def _upload_mime_type(file: UploadFile) -> str:
+    """Content-Type des Uploads, sonst aus der Dateiendung geraten."""
+    if file.content_type and file.content_type.startswith("image/"):
+        return file.content_type
+    guessed, _ = mimetypes.guess_type(file.filename or "")
+    return guessed if guessed and guessed.startswith("image/") else "image/jpeg"
+
+
 @app.post("/api/image-to-json")
 async def image_to_json(file: UploadFile = File(...)):
     """Bild-Upload → Metadaten-JSON"""
@@ -96,48 +429,47 @@ async def image_to_json(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Gemini Generator not initialized")
 
     try:
-        # Speichere Bild temporär
-        import tempfile
-        # Create temp file with correct extension
-        suffix = os.path.splitext(file.filename)[1] if file.filename else ".jpg"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp_path = tmp.name
-        
-        try:
-            result = generator.image_to_json(tmp_path)
-            # Clean up temp file
-            os.unlink(tmp_path)
-            return result.model_dump()
-        except Exception as e:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            raise e
-            
+        # Bytes bleiben im Speicher; kein Temp-File, kein erneutes Lesen von Disk
+        contents = await file.read()
+        if not contents:
+            raise ValueError("Leere Bilddatei")
+        result = await generator.image_bytes_to_json_async(contents, _upload_mime_type(file))
+        return result.model_dump()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _prepare_base_prompt(
+    base_prompt_data: dict, correlation_id: str
+) -> Tuple[Optional[BasePrompt], List[str], Optional[ErrorEnvelope]]:
+    """Apply defaults and validate; returns (base_prompt, defaults_applied, error)."""
+    # Apply defaults first
+    data_with_defaults, defaults_applied = apply_defaults(base_prompt_data)
+
+    # Validate the data
+    is_valid, error_details, base_prompt = validate_base_prompt(data_with_defaults)
+
+    if not is_valid:
+        error_response = ErrorEnvelope(
+            error_code=ErrorCode.VALIDATION_ERROR,
+            message="Validation failed for BasePrompt",
+            details=error_details,
+            correlation_id=correlation_id,
+        )
+        return None, defaults_applied, error_response
+
+    return base_prompt, defaults_applied, None
+
+
 @app.post("/api/adapt/{model}")
 async def adapt_prompt(model: str, base_prompt_data: dict):
     """Universal BasePrompt → modell-spezifisches Format with validation and defaulting"""
     correlation_id = str(uuid.uuid4())
     
     try:
-        # Apply defaults first
-        data_with_defaults, defaults_applied = apply_defaults(base_prompt_data)
-        
-        # Validate the data
-        is_valid, error_details, base_prompt = validate_base_prompt(data_with_defaults)
+        base_prompt, defaults_applied, error_response = _prepare_base_prompt(base_prompt_data, correlation_id)
         
-        if not is_valid:
-            error_response = create_error_response(
-                error_code=ErrorCode.VALIDATION_ERROR,
-                message="Validation failed for BasePrompt",
-                details=error_details
-            )
-            error_response.correlation_id = correlation_id
+        if error_response is not None:
             return JSONResponse(
                 status_code=400,
                 content=error_response.model_dump()
@@ -181,16 +513,154 @@ async def adapt_prompt(model: str, base_prompt_data: dict):
         )
 
 
+@app.get("/api/adapters")
+async def adapters():
+    """Verfügbare Zielmodelle mit Aliasen und Fähigkeiten"""
+    return {"adapters": list_adapters()}
+
+
+@app.post("/api/adapt-many")
+async def adapt_prompt_many(payload: AdaptManyPayload):
+    """
+    Universal BasePrompt → alle gewünschten Zielformate in einem Durchlauf.
+
+    Defaults and validation run once; ``data`` maps each model_name to its
+    payload and per-target warnings. Without ``targets`` all registered
+    adapters are used.
+    """
+    correlation_id = str(uuid.uuid4())
+
+    try:
+        base_prompt, defaults_applied, error_response = _prepare_base_prompt(payload.base_prompt, correlation_id)
+
+        if error_response is not None:
+            return JSONResponse(
+                status_code=400,
+                content=error_response.model_dump()
+            )
+
+        return SuccessResponse(
+            success=True,
+            data=adapt_many(base_prompt, payload.targets),
+            defaults_applied=defaults_applied,
+            correlation_id=correlation_id
+        ).model_dump()
+
+    except ValueError as e:
+        error_response = create_error_response(
+            error_code=ErrorCode.PROVIDER_ERROR,
+            message=str(e),
+            details=None
+        )
+        error_response.correlation_id = correlation_id
+        return JSONResponse(
+            status_code=400,
+            content=error_response.model_dump()
+        )
+    except Exception as e:
+        error_response = create_error_response(
+            error_code=ErrorCode.INTERNAL_ERROR,
+            message=f"Internal server error: {str(e)}",
+            details=None
+        )
+        error_response.correlation_id = correlation_id
+        return JSONResponse(
+            status_code=500,
+            content=error_response.model_dump()
+        )
+
+
+@app.post("/api/adapt/{model}/bulk")
+async def adapt_prompt_bulk(model: str, request: Request):
+    """
+    NDJSON BasePrompts → NDJSON adaptierte Payloads (gestreamt, gleiche Reihenfolge).
+
+    Each output line carries the input ``line`` number, ``defaults_applied``
+    and either ``data`` or an ``error`` envelope. Input is consumed line by
+    line, so memory stays constant regardless of body size.
+    """
+    correlation_id = str(uuid.uuid4())
+
+    try:
+        adapter = get_adapter(model)
+    except ValueError as e:
+        error_response = create_error_response(
+            error_code=ErrorCode.PROVIDER_ERROR,
+            message=str(e),
+            details=None
+        )
+        error_response.correlation_id = correlation_id
+        return JSONResponse(status_code=400, content=error_response.model_dump())
+
+    def line_error(line_number: int, error_code: ErrorCode, message: str, details=None) -> dict:
+        error_response = ErrorEnvelope(
+            error_code=error_code,
+            message=message,
+            details=details,
+            correlation_id=f"{correlation_id}#{line_number}",
+        )
+        return {
+            "line": line_number,
+            "success": False,
+            "defaults_applied": [],
+            "error": error_response.model_dump(mode="json"),
+        }
+
+    async def results():
+        async for line_number, line in iter_ndjson_lines(request.stream()):
+            if line is None:
+                yield ndjson_line(line_error(line_number, ErrorCode.VALIDATION_ERROR, "Line exceeds maximum size"))
+                continue
+            try:
+                base_prompt_data = json.loads(line)
+            except ValueError as e:
+                yield ndjson_line(line_error(line_number, ErrorCode.VALIDATION_ERROR, f"Invalid JSON: {e}"))
+                continue
+            if not isinstance(base_prompt_data, dict):
+                yield ndjson_line(line_error(line_number, ErrorCode.VALIDATION_ERROR, "Line must be a JSON object"))
+                continue
+
+            line_cid = f"{correlation_id}#{line_number}"
+            try:
+                base_prompt, defaults_applied, error_response = _prepare_base_prompt(base_prompt_data, line_cid)
+                if error_response is not None:
+                    result = {
+                        "line": line_number,
+                        "success": False,
+                        "defaults_applied": defaults_applied,
+                        "error": error_response.model_dump(mode="json"),
+                    }
+                else:
+                    result = {
+                        "line": line_number,
+                        "success": True,
+                        "data": adapter.adapt(base_prompt),
+                        "defaults_applied": defaults_applied,
+                    }
+            except ValueError as e:
+                # Adapter error, same mapping as adapt_prompt
+                result = line_error(line_number, ErrorCode.PROVIDER_ERROR, str(e))
+            except Exception as e:
+                result = line_error(line_number, ErrorCode.INTERNAL_ERROR, f"Internal server error: {str(e)}")
+            yield ndjson_line(result)
+
+    return RequestStreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        headers={"X-Correlation-ID": correlation_id},
+    )
+
+
 @app.post("/api/import/civitai")
 async def import_civitai(payload: dict):
-    """Civitai URL → Metadaten → JSON-Extraktion"""
-    if not generator:
-        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
-
+    """Civitai URL → Metadaten → JSON-Extraktion (mode=fast: nur Metadaten, ohne LLM)"""
     civitai_url = payload.get("url")
     image_id = payload.get("image_id")
     mode = (payload.get("mode") or "auto").lower()
 
+    if not generator and mode != "fast":
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+
     if not civitai_url and not image_id:
         raise HTTPException(status_code=400, detail="url oder image_id erforderlich")
 
@@ -202,62 +672,104 @@ async def import_civitai(payload: dict):
             raise HTTPException(status_code=400, detail="Konnte image_id aus URL nicht extrahieren")
 
     try:
-        import httpx
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            api_url = f"https://civitai.com/api/v1/images/{image_id}"
-            resp = await client.get(api_url)
-            resp.raise_for_status()
-            data = resp.json()
-
-        meta = data.get("meta") or {}
-        prompt_text = meta.get("prompt") or meta.get("Prompt")
-        image_url = data.get("url") or data.get("originalUrl") or data.get("imageUrl")
-
-        if mode != "image" and prompt_text:
-            extracted = generator.text_to_json(prompt_text)
-            return {
-                "source": "civitai",
-                "image_id": image_id,
-                "source_url": civitai_url,
-                "prompt_text": prompt_text,
-                "json_structure": extracted.model_dump(),
-                "meta": meta,
-            }
-
-        if image_url:
-            import tempfile
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                img_resp = await client.get(image_url)
-                img_resp.raise_for_status()
-                suffix = os.path.splitext(image_url)[1] or ".jpg"
-                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                    tmp.write(img_resp.content)
-                    tmp_path = tmp.name
-
-            try:
-                extracted = generator.image_to_json(tmp_path)
-                return {
-                    "source": "civitai",
-                    "image_id": image_id,
-                    "source_url": civitai_url,
-                    "image_url": image_url,
-                    "json_structure": extracted.model_dump(),
-                    "meta": meta,
-                }
-            finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-
-        raise HTTPException(status_code=400, detail="Kein prompt_text oder image_url in Civitai-Antwort")
+        client = get_http_client()
+        data = await fetch_image_metadata(client, image_id)
+        item = await extract_item(client, generator, data, mode)
+        return {"source": "civitai", "image_id": image_id, "source_url": civitai_url, **item}
 
     except HTTPException:
         raise
+    except DownloadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/import/civitai/bulk", status_code=202)
+async def import_civitai_bulk(payload: CivitaiBulkPayload):
+    """Bulk-Import (ID-Liste oder Listing-Query) als Hintergrund-Job; job_id → Resume"""
+    mode = payload.mode.lower()
+    if mode not in EXTRACT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unbekannter Modus: {payload.mode}")
+
+    if payload.job_id:
+        try:
+            job = bulk_importer.get(payload.job_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {payload.job_id} nicht gefunden")
+        if job["status"] == "completed":
+            return job_summary(job)
+    else:
+        if bool(payload.image_ids) == bool(payload.query):
+            raise HTTPException(status_code=400, detail="Genau eines von image_ids oder query erforderlich")
+        job = new_job(payload.image_ids, payload.query, mode, payload.max_items)
+
+    # Beim Resume gilt der gespeicherte Modus des Jobs
+    if not generator and job["mode"] != "fast":
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+
+    job = await bulk_importer.start(job, get_http_client(), generator)
+    return job_summary(job)
+
+
+@app.get("/api/import/civitai/bulk/{job_id}")
+async def import_civitai_bulk_status(job_id: str, include_results: bool = False):
+    """Fortschritt und (optional) Teilergebnisse eines Bulk-Imports"""
+    try:
+        job = bulk_importer.get(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} nicht gefunden")
+    return job_summary(job, include_results)
+
+
+@app.post("/api/import/comfy-png")
+async def import_png(file: UploadFile = File(...), mode: str = "fast"):
+    """
+    A1111/ComfyUI-PNG → BasePrompt aus den Text-Chunks (Pixeldaten werden nicht gelesen).
+    mode=fast: ohne LLM; mode=base: LLM nur für die Subjekt/Umgebung-Aufteilung.
+    """
+    mode = mode.lower()
+    if mode not in ("fast", "base"):
+        raise HTTPException(status_code=400, detail=f"Unbekannter Modus: {mode} (erlaubt: fast, base)")
+    if not generator and mode != "fast":
+        raise HTTPException(status_code=500, detail="Gemini Generator not initialized (missing API Key?)")
+
+    try:
+        metadata = await asyncio.to_thread(extract_png_metadata, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if metadata is None:
+        raise HTTPException(status_code=422, detail="Keine A1111- oder ComfyUI-Metadaten in der PNG")
+
+    try:
+        base_prompt = await build_base_prompt(generator, metadata.meta, mode, metadata.width, metadata.height)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    technical = base_prompt.technical.model_dump() if base_prompt.technical else {}
+    return {
+        "source": "png",
+        "generator": metadata.generator,
+        "prompt_text": metadata.meta.get("prompt"),
+        "base_prompt": base_prompt.model_dump(),
+        "missing_fields": [f"technical.{name}" for name, value in technical.items() if value is None],
+        "meta": metadata.meta,
+    }
+
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "gemini_ready": generator is not None}
 
+
+@app.get("/api/metrics")
+async def metrics():
+    """Laufzeit-Kennzahlen des Generators (Cache etc.)"""
+    if not generator:
+        return {"gemini_ready": False}
+    return {"gemini_ready": True, **generator.metrics(), "pipeline": prompt_pipeline.stats(), "story": story_engine.stats()}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
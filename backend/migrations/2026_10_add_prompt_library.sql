@@ -0,0 +1,13 @@
+-- Add prompt library table (bulk ingest of image metadata)
+CREATE TABLE IF NOT EXISTS prompt_library (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    content_hash VARCHAR(64) NOT NULL UNIQUE,
+    source_path TEXT NOT NULL,
+    generator VARCHAR(50),
+    base_prompt_json JSONB NOT NULL,
+    raw_meta_json JSONB,
+    created_at TIMESTAMP DEFAULT NOW(),
+    created_by UUID
+);
+
+CREATE INDEX IF NOT EXISTS idx_prompt_library_generator ON prompt_library(generator);
@@ -11,6 +11,8 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Union
 from enum import Enum
 
+from backend.wordscan import StreamScanner, WordMatch, WordMatcher
+
 
 # ============================================================================
 # 1. ANTI-BIAS PHYSIK-DESKRIPTOR-ENUMS
@@ -352,6 +354,10 @@ class PromptAssemblyOutput(BaseModel):
         default=0,
         description="Geschätzte Wörterzahl des finalen Prompts"
     )
+    rewritten_words: List[str] = Field(
+        default_factory=list,
+        description="Forbidden Words, die lokal entfernt/ersetzt wurden (ohne Regeneration)"
+    )
 
 
 # ============================================================================
@@ -376,17 +382,34 @@ FORBIDDEN_WORDS = {
 }
 
 
+# Einmal beim Import kompiliert; ein Durchlauf pro Text mit Wortgrenzen
+_FORBIDDEN_MATCHER = WordMatcher(FORBIDDEN_WORDS)
+
+
+def find_forbidden_words(text: str) -> List[WordMatch]:
+    """
+    Finde alle Forbidden Words inkl. Position (ein Durchlauf, Wortgrenzen).
+    "man" trifft nicht innerhalb von "German" oder "performance".
+    """
+    return _FORBIDDEN_MATCHER.find_all(text)
+
+
+def forbidden_word_stream() -> StreamScanner:
+    """
+    Inkrementeller Forbidden-Word-Scan für gestreamte Texte: liefert je Chunk
+    die Treffer, die sich nicht mehr ändern können (Offsets im Gesamttext).
+    """
+    return _FORBIDDEN_MATCHER.stream()
+
+
 def validate_no_forbidden_words(text: str) -> bool:
     """
     Prüfe, ob ein Prompt Forbidden Words enthält.
     Gibt False zurück, wenn Forbidden Words gefunden werden.
     """
-    text_lower = text.lower()
-    found = [word for word in FORBIDDEN_WORDS if word in text_lower]
-    return len(found) == 0
+    return not _FORBIDDEN_MATCHER.contains_any(text)
 
 
 def extract_forbidden_words(text: str) -> List[str]:
-    """Extrahiere alle Forbidden Words aus einem Text"""
-    text_lower = text.lower()
-    return [word for word in FORBIDDEN_WORDS if word in text_lower]
+    """Extrahiere alle Forbidden Words aus einem Text (eindeutig, in Fundreihenfolge)"""
+    return list(dict.fromkeys(match.word for match in _FORBIDDEN_MATCHER.finditer(text)))
@@ -0,0 +1,189 @@
+"""
+Pipelined text -> JSON -> prompt text for batches
+
+``generate_full_prompt`` runs both Gemini calls strictly one after the
+other. For a batch the stages are overlapped instead: every item moves on
+to stage two (JSON -> 600-1000 word prompt) as soon as its stage one
+(text -> JSON) is done, while the next items' stage-one calls are already
+in flight. Each stage has its own concurrency limit (stage two is the long
+call), and a window bounds how far stage one may run ahead of stage two.
+
+Stage one is skipped for items that bring their own ``ZImageTurboPrompt``
+or whose text-to-JSON result is already in the response cache.
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from backend.errors import EmptyInputError
+from backend.env import env_int
+from backend.latency import LatencyHistogram
+from backend.models import PromptAssemblyOutput, ZImageTurboPrompt
+
+
+class PipelineItem(NamedTuple):
+    text: Optional[str] = None
+    prompt_json: Optional[ZImageTurboPrompt] = None  # given -> stage one is skipped
+
+
+class StageStats:
+    """Queue depth, in-flight count and wait/run latency of one stage."""
+
+    def __init__(self):
+        self.queued = 0
+        self.max_queued = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait = LatencyHistogram()
+        self.latency = LatencyHistogram()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, semaphore: asyncio.Semaphore) -> AsyncIterator[None]:
+        enqueued = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+        started = time.perf_counter()
+        self.wait.record(started - enqueued)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        except BaseException:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+            self.latency.record(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait": self.wait.stats(),
+            "latency": self.latency.stats(),
+        }
+
+
+class PromptPipeline:
+    """
+    Two-stage executor over a ``GeminiPromptGenerator``.
+
+    The limits are per :meth:`run`; the stats accumulate over all runs
+    for /api/metrics. The generator is passed per call so one pipeline
+    serves whatever generator the app currently has.
+    """
+
+    def __init__(self, stage1_concurrency: int = 8, stage2_concurrency: int = 4, lookahead: Optional[int] = None):
+        self.stage1_concurrency = max(1, stage1_concurrency)
+        self.stage2_concurrency = max(1, stage2_concurrency)
+        # Items that may wait between the stages (finished stage one, no stage-two slot yet)
+        self.lookahead = 2 * self.stage2_concurrency if lookahead is None else max(0, lookahead)
+        self.stage1 = StageStats()
+        self.stage2 = StageStats()
+        self.skipped_supplied = 0
+        self.skipped_cached = 0
+
+    @classmethod
+    def from_env(cls) -> "PromptPipeline":
+        """PIPELINE_STAGE1_CONCURRENCY (default 8), PIPELINE_STAGE2_CONCURRENCY (default 4)."""
+        return cls(
+            stage1_concurrency=env_int("PIPELINE_STAGE1_CONCURRENCY", 8),
+            stage2_concurrency=env_int("PIPELINE_STAGE2_CONCURRENCY", 4),
+        )
+
+    async def run(
+        self,
+        generator,
+        items: Sequence[PipelineItem],
+        limit: Optional[int] = None,
+        mode: str = "polish",
+    ) -> List[Union[PromptAssemblyOutput, Exception]]:
+        """
+        Full prompts for ``items``, in input order. A failing item yields its
+        exception instead of failing the batch. ``limit`` lowers both stage
+        limits (never raises them). ``mode="local"`` renders stage two with
+        the template assembler instead of Gemini.
+        """
+        results: List[Union[PromptAssemblyOutput, Exception]] = [None] * len(items)
+        async for index, outcome in self.stream(generator, items, limit, mode):
+            results[index] = outcome
+        return results
+
+    async def stream(
+        self,
+        generator,
+        items: Sequence[PipelineItem],
+        limit: Optional[int] = None,
+        mode: str = "polish",
+        budget: Optional[asyncio.Semaphore] = None,
+    ) -> AsyncIterator[Tuple[int, Union[PromptAssemblyOutput, Exception]]]:
+        """
+        Like :meth:`run`, but yields ``(index, outcome)`` as each item
+        finishes. ``budget`` is an additional semaphore shared with other
+        runs, held during stage two. Closing the iterator early cancels the
+        items still in flight.
+        """
+        stage1_limit = min(limit or self.stage1_concurrency, self.stage1_concurrency)
+        stage2_limit = min(limit or self.stage2_concurrency, self.stage2_concurrency)
+        stage1 = asyncio.Semaphore(stage1_limit)
+        stage2 = asyncio.Semaphore(stage2_limit)
+        # FIFO: later items only start stage one while earlier ones are inside the window
+        window = asyncio.Semaphore(stage1_limit + stage2_limit + self.lookahead)
+
+        async def process(item: PipelineItem) -> PromptAssemblyOutput:
+            async with window:
+                prompt_json = await self._stage_one(generator, item, stage1)
+                async with self.stage2.slot(stage2):
+                    async with budget if budget is not None else contextlib.nullcontext():
+                        if mode == "local":
+                            return generator.json_to_prompt_text_local(prompt_json)
+                        return await generator.json_to_prompt_text_async(prompt_json)
+
+        async def settle(index: int, item: PipelineItem) -> Tuple[int, Union[PromptAssemblyOutput, Exception]]:
+            try:
+                return index, await process(item)
+            except Exception as e:
+                return index, e
+
+        tasks = [asyncio.ensure_future(settle(index, item)) for index, item in enumerate(items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _stage_one(self, generator, item: PipelineItem, semaphore: asyncio.Semaphore) -> ZImageTurboPrompt:
+        if item.prompt_json is not None:
+            self.skipped_supplied += 1
+            return item.prompt_json
+        if not item.text or not item.text.strip():
+            raise EmptyInputError("Text must not be empty")
+        cached = await generator.cached_text_to_json_async(item.text)
+        if cached is not None:
+            self.skipped_cached += 1
+            return cached
+        async with self.stage1.slot(semaphore):
+            return await generator.text_to_json_async(item.text, skip_cache_lookup=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stage1": self.stage1.stats(),
+            "stage2": self.stage2.stats(),
+            "stage1_skipped": {"supplied": self.skipped_supplied, "cached": self.skipped_cached},
+        }
@@ -0,0 +1,400 @@
+"""
+Generation metadata from PNG text chunks (A1111 / ComfyUI)
+
+The chunk walker reads only the 8-byte chunk headers plus the bodies of
+text chunks (``tEXt``, ``zTXt``, ``iTXt``); everything else is skipped by
+offset arithmetic, and the walk stops at the first ``IDAT`` by default, so
+pixel data is never touched. It runs over anything that can read at an
+offset: a memoryview/mmap (zero-copy slices) or a seekable file object.
+
+Both writers are mapped onto the Civitai-style meta dict understood by
+``backend.civitai_meta`` (prompt, negativePrompt, sampler, cfgScale, seed,
+steps, Size):
+
+- A1111/Forge: ``parameters`` text ("<prompt>\\nNegative prompt: ...\\nSteps: 30, ...")
+- ComfyUI:     ``prompt`` (API graph) or, as fallback, ``workflow`` (UI graph)
+
+JPEG/WebP files from A1111 carry the same ``parameters`` text in the EXIF
+UserComment; ``extract_image_metadata`` dispatches on the file signature.
+"""
+
+import io
+import json
+import re
+import struct
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image, UnidentifiedImageError
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+
+# Compressed text is capped; real workflows are a few hundred KB
+MAX_TEXT_BYTES = 8 * 1024 * 1024
+
+ReadAt = Callable[[int, int], Union[bytes, memoryview]]
+
+
+class PngInfo(NamedTuple):
+    width: Optional[int]
+    height: Optional[int]
+    text: Dict[str, str]
+
+
+class PngMetadata(NamedTuple):
+    generator: str             # "a1111" | "comfyui"
+    meta: Dict[str, Any]       # Civitai-style keys, see module docstring
+    width: Optional[int]
+    height: Optional[int]
+
+
+def _buffer_reader(data) -> Tuple[ReadAt, int]:
+    view = memoryview(data).cast("B")
+    return (lambda offset, size: view[offset:offset + size]), len(view)
+
+
+def _file_reader(fileobj: BinaryIO) -> Tuple[ReadAt, int]:
+    fileobj.seek(0, 2)
+    total = fileobj.tell()
+
+    def read_at(offset: int, size: int) -> bytes:
+        fileobj.seek(offset)
+        return fileobj.read(size)
+
+    return read_at, total
+
+
+def _inflate(data: bytes) -> Optional[bytes]:
+    decompressor = zlib.decompressobj()
+    try:
+        out = decompressor.decompress(data, MAX_TEXT_BYTES)
+    except zlib.error:
+        return None
+    return None if decompressor.unconsumed_tail else out
+
+
+def _decode_text_chunk(chunk_type: bytes, body: bytes) -> Optional[Tuple[str, str]]:
+    keyword, sep, rest = body.partition(b"\0")
+    if not sep or not keyword:
+        return None
+    key = keyword.decode("latin-1")
+
+    if chunk_type == b"tEXt":
+        return key, rest.decode("latin-1")
+    if chunk_type == b"zTXt":
+        text = _inflate(rest[1:]) if rest[:1] == b"\0" else None
+        return (key, text.decode("latin-1")) if text is not None else None
+
+    # iTXt: compression flag, method, language\0, translated keyword\0, UTF-8 text
+    if len(rest) < 2:
+        return None
+    compressed = rest[0] == 1
+    parts = rest[2:].split(b"\0", 2)
+    if len(parts) != 3:
+        return None
+    text = _inflate(parts[2]) if compressed else parts[2]
+    return (key, text.decode("utf-8", errors="replace")) if text is not None else None
+
+
+def _walk(read_at: ReadAt, total: int, stop_at_idat: bool) -> PngInfo:
+    if total < 8 or bytes(read_at(0, 8)) != PNG_SIGNATURE:
+        raise ValueError("Keine PNG-Datei")
+
+    width = height = None
+    text: Dict[str, str] = {}
+    offset = 8
+    while offset + 8 <= total:
+        length, chunk_type = struct.unpack(">I4s", read_at(offset, 8))
+        body_start = offset + 8
+        next_offset = body_start + length + 4  # + CRC
+        if next_offset > total:
+            break  # truncated file: keep what was read so far
+
+        if chunk_type == b"IHDR" and length >= 8:
+            width, height = struct.unpack(">II", read_at(body_start, 8))
+        elif chunk_type in TEXT_CHUNKS:
+            body = bytes(read_at(body_start, length))
+            (crc,) = struct.unpack(">I", read_at(body_start + length, 4))
+            if zlib.crc32(body, zlib.crc32(chunk_type)) == crc:
+                decoded = _decode_text_chunk(chunk_type, body)
+                if decoded is not None:
+                    text.setdefault(*decoded)
+        elif chunk_type == b"IEND" or (chunk_type == b"IDAT" and stop_at_idat):
+            break
+        offset = next_offset
+
+    return PngInfo(width, height, text)
+
+
+def read_png_info(source: Union[bytes, bytearray, memoryview, BinaryIO], stop_at_idat: bool = True) -> PngInfo:
+    """
+    Dimensions and text chunks of a PNG.
+
+    ``source`` is a buffer (bytes, memoryview, mmap) or a seekable binary
+    file. With ``stop_at_idat`` (default) text chunks written after the
+    image data are not seen; A1111 and ComfyUI write theirs before it.
+
+    Raises:
+        ValueError: if ``source`` is not a PNG
+    """
+    try:
+        reader = _buffer_reader(source)  # bytes, memoryview, mmap
+    except TypeError:
+        reader = _file_reader(source)
+    return _walk(*reader, stop_at_idat)
+
+
+# ============================================================================
+# A1111 / Forge "parameters"
+# ============================================================================
+
+# Same grammar as A1111's infotext parser: "Key: value" or 'Key: "quoted, value"'
+_A1111_PARAM = re.compile(r'\s*(\w[\w \-/]+):\s*("(?:\\.|[^\\"])+"|[^,]*)(?:,|$)')
+
+_A1111_KEYS = {
+    "Steps": "steps",
+    "Sampler": "sampler",
+    "CFG scale": "cfgScale",
+    "Seed": "seed",
+    "Size": "Size",
+    "Clip skip": "clipSkip",
+    "Denoising strength": "denoise",
+}
+
+
+def parse_a1111_parameters(text: str) -> Dict[str, Any]:
+    """A1111 infotext -> Civitai-style meta dict; unknown keys are kept verbatim."""
+    *lines, last_line = text.strip().split("\n")
+    if len(_A1111_PARAM.findall(last_line)) < 3:
+        lines.append(last_line)
+        last_line = ""
+
+    prompt: List[str] = []
+    negative: List[str] = []
+    target = prompt
+    for line in lines:
+        line = line.strip()
+        if line.startswith("Negative prompt:"):
+            target = negative
+            line = line[len("Negative prompt:"):].strip()
+        target.append(line)
+
+    meta: Dict[str, Any] = {"prompt": "\n".join(prompt).strip()}
+    if negative:
+        meta["negativePrompt"] = "\n".join(negative).strip()
+    for key, value in _A1111_PARAM.findall(last_line):
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = value[1:-1]
+        meta[_A1111_KEYS.get(key, key)] = value
+    return meta
+
+
+# ============================================================================
+# ComfyUI graphs
+# ============================================================================
+
+_SAMPLER_NODES = ("KSampler", "KSamplerAdvanced", "SamplerCustom")
+_TEXT_INPUTS = ("text", "text_g", "text_l", "string", "value", "prompt")
+_MAX_LINK_DEPTH = 16
+
+
+def _resolve_text(graph: Dict[str, Any], link: Any, depth: int = 0) -> Optional[str]:
+    """Follow ``[node_id, slot]`` links of the API graph to the prompt text."""
+    if isinstance(link, str):
+        return link
+    if not isinstance(link, list) or not link or depth > _MAX_LINK_DEPTH:
+        return None
+    node = graph.get(str(link[0]))
+    if not isinstance(node, dict):
+        return None
+    inputs = node.get("inputs") or {}
+    for name in _TEXT_INPUTS:
+        if name in inputs:
+            text = _resolve_text(graph, inputs[name], depth + 1)
+            if text:
+                return text
+    # Pass-through nodes (conditioning combine, LoRA stacks, ...)
+    for name in ("conditioning", "conditioning_1", "positive", "negative", "clip"):
+        if name in inputs:
+            text = _resolve_text(graph, inputs[name], depth + 1)
+            if text:
+                return text
+    return None
+
+
+def _latent_size(graph: Dict[str, Any], link: Any, depth: int = 0) -> Optional[str]:
+    if not isinstance(link, list) or not link or depth > _MAX_LINK_DEPTH:
+        return None
+    node = graph.get(str(link[0])) or {}
+    inputs = node.get("inputs") or {}
+    width, height = inputs.get("width"), inputs.get("height")
+    if isinstance(width, int) and isinstance(height, int):
+        return f"{width}x{height}"
+    for name in ("samples", "latent_image", "latent"):
+        if name in inputs:
+            return _latent_size(graph, inputs[name], depth + 1)
+    return None
+
+
+def parse_comfyui_prompt(graph: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    ComfyUI API graph (``prompt`` chunk) -> meta dict, from the first
+    sampler node and the text-encode nodes its conditioning links lead to.
+    """
+    for node in graph.values():
+        if not isinstance(node, dict) or node.get("class_type") not in _SAMPLER_NODES:
+            continue
+        inputs = node.get("inputs") or {}
+        meta: Dict[str, Any] = {
+            "prompt": _resolve_text(graph, inputs.get("positive")),
+            "negativePrompt": _resolve_text(graph, inputs.get("negative")),
+            "seed": inputs.get("seed", inputs.get("noise_seed")),
+            "steps": inputs.get("steps"),
+            "cfgScale": inputs.get("cfg"),
+            "sampler": inputs.get("sampler_name"),
+            "scheduler": inputs.get("scheduler"),
+            "Size": _latent_size(graph, inputs.get("latent_image")),
+        }
+        return {key: value for key, value in meta.items() if not isinstance(value, list) and value is not None}
+    return None
+
+
+def _workflow_to_api_graph(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Minimal conversion of the UI graph (``workflow`` chunk) for the nodes
+    parse_comfyui_prompt reads: widget values by position, links as inputs.
+    """
+    widget_names = {
+        "KSampler": ("seed", None, "steps", "cfg", "sampler_name", "scheduler", "denoise"),
+        "KSamplerAdvanced": (None, "noise_seed", None, "steps", "cfg", "sampler_name", "scheduler"),
+        "CLIPTextEncode": ("text",),
+        "EmptyLatentImage": ("width", "height", "batch_size"),
+        "EmptySD3LatentImage": ("width", "height", "batch_size"),
+    }
+    links = {
+        link[0]: [str(link[1]), link[2]]
+        for link in workflow.get("links") or []
+        if isinstance(link, list) and len(link) >= 3
+    }
+    graph: Dict[str, Any] = {}
+    for node in workflow.get("nodes") or []:
+        if not isinstance(node, dict):
+            continue
+        inputs: Dict[str, Any] = {}
+        values = node.get("widgets_values")
+        if isinstance(values, list):
+            for name, value in zip(widget_names.get(node.get("type"), ()), values):
+                if name:
+                    inputs[name] = value
+        for slot in node.get("inputs") or []:
+            if isinstance(slot, dict) and slot.get("link") in links:
+                inputs[slot.get("name")] = links[slot["link"]]
+        graph[str(node.get("id"))] = {"class_type": node.get("type"), "inputs": inputs}
+    return graph
+
+
+def extract_png_metadata(source: Union[bytes, bytearray, memoryview, BinaryIO]) -> Optional[PngMetadata]:
+    """
+    Generation metadata of an A1111 or ComfyUI PNG, or None if it has none.
+
+    Raises:
+        ValueError: if ``source`` is not a PNG
+    """
+    info = read_png_info(source)
+
+    parameters = info.text.get("parameters")
+    if parameters and parameters.strip():
+        return PngMetadata("a1111", parse_a1111_parameters(parameters), info.width, info.height)
+
+    for key, convert in (("prompt", None), ("workflow", _workflow_to_api_graph)):
+        raw = info.text.get(key)
+        if not raw:
+            continue
+        try:
+            graph = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(graph, dict):
+            continue
+        meta = parse_comfyui_prompt(convert(graph) if convert else graph)
+        if meta and meta.get("prompt"):
+            return PngMetadata("comfyui", meta, info.width, info.height)
+    return None
+
+
+# ============================================================================
+# JPEG / WebP (EXIF UserComment)
+# ============================================================================
+
+_EXIF_IFD = 0x8769
+_USER_COMMENT = 0x9286
+
+
+def _decode_user_comment(value: Any) -> Optional[str]:
+    """EXIF UserComment: 8-byte charset prefix, then the text (A1111: UTF-16)."""
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, bytes) or len(value) < 8:
+        return None
+    prefix, body = value[:8], value[8:]
+    if prefix.startswith(b"UNICODE"):
+        # Byte order is not specified; a NUL in the first code unit tells
+        little_endian = len(body) >= 2 and body[0] != 0 and body[1] == 0
+        return body.decode("utf-16-le" if little_endian else "utf-16-be", errors="replace")
+    return body.decode("utf-8" if prefix.startswith(b"UTF8") else "latin-1", errors="replace")
+
+
+def extract_exif_metadata(data: Union[bytes, bytearray, memoryview]) -> Optional[PngMetadata]:
+    """
+    A1111 parameters from the EXIF UserComment of a JPEG/WebP. Pillow only
+    parses the headers here; pixel data is not decoded.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            comment = image.getexif().get_ifd(_EXIF_IFD).get(_USER_COMMENT)
+            width, height = image.size
+    except (UnidentifiedImageError, OSError, ValueError, SyntaxError):
+        return None
+    text = _decode_user_comment(comment)
+    if not text or not text.strip("\0 \n"):
+        return None
+    meta = parse_a1111_parameters(text.strip("\0"))
+    if not meta.get("prompt"):
+        return None
+    return PngMetadata("a1111", meta, width, height)
+
+
+def extract_image_metadata(data: Union[bytes, bytearray, memoryview]) -> Optional[PngMetadata]:
+    """PNG text chunks or JPEG/WebP EXIF, by file signature."""
+    if bytes(memoryview(data)[:8]) == PNG_SIGNATURE:
+        return extract_png_metadata(data)
+    return extract_exif_metadata(data)
+
+
+if __name__ == "__main__":
+    # Benchmark: metadata of a ~30 MB PNG (A1111 header + large IDAT)
+    import io
+    import time
+
+    def chunk(chunk_type: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + chunk_type + body + struct.pack(">I", zlib.crc32(chunk_type + body))
+
+    parameters = "Valentina Ruiz in Bari\nNegative prompt: blurry\nSteps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 42, Size: 4096x4096"
+    png = (
+        PNG_SIGNATURE
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", 4096, 4096, 8, 2, 0, 0, 0))
+        + chunk(b"tEXt", b"parameters\0" + parameters.encode("latin-1"))
+        + b"".join(chunk(b"IDAT", bytes(8192)) for _ in range(30 * 128))
+        + chunk(b"IEND", b"")
+    )
+    for label, source in (("memoryview", memoryview(png)), ("file", io.BytesIO(png))):
+        runs = 2000
+        started = time.perf_counter()
+        for _ in range(runs):
+            extract_png_metadata(source)
+        print(f"{label}: {len(png) / 1e6:.0f} MB PNG, {(time.perf_counter() - started) / runs * 1e6:.1f} µs/parse")
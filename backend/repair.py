@@ -0,0 +1,295 @@
+"""
+Targeted repair of LLM replies that fail schema validation
+
+A reply with one bad field ("olive skin" instead of a ``SkinTone`` value)
+used to fail the whole request. Repair runs in two stages:
+
+1. Deterministic: every ``enum`` error is snapped to the closest member
+   (``difflib`` ratio over the normalized values). No LLM call.
+2. Follow-up: if errors remain, the LLM gets a short request with only the
+   invalid fields, their current values and the validation messages, and
+   answers with a ``{"<path>": <value>}`` patch. The reply of the original
+   call is not regenerated.
+
+Token figures are estimates (~4 characters per token); they are meant for
+the repair rate on /api/metrics, not for billing.
+"""
+
+import copy
+import difflib
+import json
+import os
+import re
+import threading
+import typing
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+
+from backend.json_extract import extract_json
+
+# Minimum difflib ratio for an enum snap, and its lead over the runner-up
+SNAP_CUTOFF = 0.6
+SNAP_MARGIN = 0.05
+
+REPAIR_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 400,
+}
+
+Loc = Tuple[Union[str, int], ...]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+# ============================================================================
+# Schema navigation
+# ============================================================================
+
+def _unwrap(annotation: Any) -> Any:
+    """``Optional[X]``/``Union[X, ...]`` -> first non-None member."""
+    if typing.get_origin(annotation) is Union:
+        members = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return members[0] if members else None
+    return annotation
+
+
+def field_annotation(model_cls: Type[BaseModel], loc: Loc) -> Any:
+    """Annotation of the field at a Pydantic error ``loc`` (None if it cannot be resolved)."""
+    annotation: Any = model_cls
+    for part in loc:
+        annotation = _unwrap(annotation)
+        if isinstance(part, int):
+            args = typing.get_args(annotation)
+            if typing.get_origin(annotation) not in (list, tuple) or not args:
+                return None
+            annotation = args[0]
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            field = annotation.model_fields.get(part)
+            if field is None:
+                return None
+            annotation = field.annotation
+        else:
+            return None
+    return _unwrap(annotation)
+
+
+def _get(data: Any, loc: Loc) -> Any:
+    for part in loc:
+        try:
+            data = data[part]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+
+def _set(data: Any, loc: Loc, value: Any) -> bool:
+    for part in loc[:-1]:
+        if isinstance(data, dict) and not isinstance(data.get(part), (dict, list)):
+            data[part] = {}
+        try:
+            data = data[part]
+        except (KeyError, IndexError, TypeError):
+            return False
+    try:
+        data[loc[-1]] = value
+    except (IndexError, TypeError):
+        return False
+    return True
+
+
+def loc_path(loc: Loc) -> str:
+    """Dot notation as used in ``ErrorDetail.field_path``."""
+    return ".".join(str(part) for part in loc)
+
+
+def _path_loc(path: str) -> Loc:
+    return tuple(int(part) if part.isdigit() else part for part in path.split("."))
+
+
+# ============================================================================
+# Stage 1: enum snapping
+# ============================================================================
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[\W_]+", " ", text).strip().lower()
+
+
+def snap_enum_value(
+    value: Any, enum_cls: Type[Enum], cutoff: float = SNAP_CUTOFF, margin: float = SNAP_MARGIN
+) -> Optional[str]:
+    """
+    Closest value of ``enum_cls`` for ``value``, or None if nothing is close
+    enough or two members are about equally close. Member names
+    ("MEDIUM_OLIVE") only count as exact matches.
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    needle = _normalize(value)
+    for member in enum_cls:
+        if needle in (_normalize(str(member.value)), _normalize(member.name)):
+            return member.value
+
+    matcher = difflib.SequenceMatcher(b=needle, autojunk=False)
+    scores = []
+    for member in enum_cls:
+        matcher.set_seq1(_normalize(str(member.value)))
+        scores.append((matcher.ratio(), member.value))
+    scores.sort(key=lambda item: item[0], reverse=True)
+    best, value = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else 0.0
+    if best < cutoff or best - runner_up < margin:
+        return None
+    return value
+
+
+# ============================================================================
+# Repair stage
+# ============================================================================
+
+class RepairAttempt:
+    """
+    State of one repair: the working copy of the data and the remaining
+    validation errors. Created by :meth:`SchemaRepairer.snap`.
+    """
+
+    def __init__(self, model_cls: Type[BaseModel], data: dict, error: ValidationError):
+        self.model_cls = model_cls
+        self.data = data
+        self.error = error
+        self.result: Optional[BaseModel] = None
+
+    @property
+    def errors(self) -> List[dict]:
+        return self.error.errors()
+
+    def followup_request(self) -> str:
+        """Short follow-up prompt: invalid fields, current values, error messages."""
+        lines = []
+        for item in self.errors:
+            path = loc_path(item["loc"])
+            current = json.dumps(_get(self.data, item["loc"]), ensure_ascii=False)
+            line = f"- {path} = {current}: {item['msg']}"
+            annotation = field_annotation(self.model_cls, item["loc"])
+            if isinstance(annotation, type) and issubclass(annotation, Enum):
+                line += " (erlaubt: " + ", ".join(json.dumps(m.value) for m in annotation) + ")"
+            lines.append(line)
+        paths = ", ".join(json.dumps(loc_path(item["loc"])) for item in self.errors)
+        return (
+            f"Ein {self.model_cls.__name__}-JSON hat die Schema-Validierung nicht bestanden.\n"
+            "Ungültige Felder:\n" + "\n".join(lines) + "\n\n"
+            f"Antworte NUR mit einem JSON-Objekt, das genau diese Pfade auf gültige Werte setzt: {paths}.\n"
+            "Behalte die Bedeutung der aktuellen Werte bei."
+        )
+
+    def apply_followup(self, reply: str) -> BaseModel:
+        """
+        Apply the patch from the follow-up reply and validate.
+
+        Raises:
+            ValidationError: the original (remaining) error if the patch does not help
+        """
+        try:
+            patch = extract_json(reply)
+        except json.JSONDecodeError:
+            raise self.error
+        if not isinstance(patch, dict):
+            raise self.error
+
+        requested = {loc_path(item["loc"]) for item in self.errors}
+        data = copy.deepcopy(self.data)
+        for path, value in patch.items():
+            if path in requested:
+                _set(data, _path_loc(path), value)
+        try:
+            return self.model_cls(**data)
+        except ValidationError:
+            raise self.error
+
+
+class SchemaRepairer:
+    """
+    Repair stage with counters for /api/metrics.
+
+    ``repair_rate`` is the share of failed validations that were repaired
+    (locally or by follow-up); ``tokens_saved`` compares a full
+    regeneration (request + original reply) with the repair cost.
+    """
+
+    def __init__(self, llm_followup: bool = True, cutoff: float = SNAP_CUTOFF):
+        self.llm_followup = llm_followup
+        self.cutoff = cutoff
+        self.validation_failures = 0
+        self.snapped = 0
+        self.followup_repaired = 0
+        self.failed = 0
+        self.tokens_saved = 0
+        self.followup_tokens = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SchemaRepairer":
+        """SCHEMA_REPAIR_LLM=0 disables the follow-up call (snapping stays on)."""
+        return cls(llm_followup=os.getenv("SCHEMA_REPAIR_LLM", "1").lower() not in {"0", "false", "no"})
+
+    def snap(self, model_cls: Type[BaseModel], data: dict, error: ValidationError) -> RepairAttempt:
+        """
+        Snap all enum errors. ``attempt.result`` is the validated model if
+        that was enough, otherwise ``attempt.error`` holds what remains.
+        """
+        with self._lock:
+            self.validation_failures += 1
+        data = copy.deepcopy(data)
+        changed = False
+        for item in error.errors():
+            if item["type"] != "enum":
+                continue
+            annotation = field_annotation(model_cls, item["loc"])
+            if not (isinstance(annotation, type) and issubclass(annotation, Enum)):
+                continue
+            snapped = snap_enum_value(item["input"], annotation, self.cutoff)
+            if snapped is not None and _set(data, item["loc"], snapped):
+                changed = True
+
+        attempt = RepairAttempt(model_cls, data, error)
+        if changed:
+            try:
+                attempt.result = model_cls(**data)
+            except ValidationError as e:
+                attempt.error = e
+        return attempt
+
+    def record_snapped(self, regeneration_tokens: int) -> None:
+        with self._lock:
+            self.snapped += 1
+            self.tokens_saved += regeneration_tokens
+
+    def record_followup(self, regeneration_tokens: int, request: str, reply: str) -> None:
+        cost = estimate_tokens(request) + estimate_tokens(reply)
+        with self._lock:
+            self.followup_repaired += 1
+            self.followup_tokens += cost
+            self.tokens_saved += max(0, regeneration_tokens - cost)
+
+    def record_failed(self, request: str = "", reply: str = "") -> None:
+        cost = estimate_tokens(request) + estimate_tokens(reply)
+        with self._lock:
+            self.failed += 1
+            self.followup_tokens += cost
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            repaired = self.snapped + self.followup_repaired
+            return {
+                "validation_failures": self.validation_failures,
+                "snapped": self.snapped,
+                "followup_repaired": self.followup_repaired,
+                "failed": self.failed,
+                "repair_rate": round(repaired / self.validation_failures, 3) if self.validation_failures else None,
+                "tokens_saved": self.tokens_saved,
+                "followup_tokens": self.followup_tokens,
+            }
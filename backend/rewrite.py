@@ -0,0 +1,270 @@
+"""
+Deterministic local rewrite of forbidden words
+
+Uses the match spans from the forbidden-word scanner to drop or substitute
+offending terms from a replacement table, so a prompt with a stray
+"stunning" or "a woman" does not cost a full 600-1000 word regeneration.
+Only when the rewritten text still violates the rules is the LLM asked again.
+
+Replacement values:
+- ""        remove the term (plus surrounding whitespace/dangling commas)
+- "{name}"  substitute the character's name; a preceding article
+            ("the woman" -> "Valentina Ruiz") is absorbed. Only done when
+            the text names a single generic subject ("woman" throughout)
+            and its first mention opens a sentence; "The woman walks. The
+            man waits." or "She is a person of note" stay unresolved and
+            go to the regeneration path instead
+- any text  substitute literally
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from backend.models import FORBIDDEN_WORDS, find_forbidden_words
+from backend.wordscan import WordMatch
+
+NAME_PLACEHOLDER = "{name}"
+
+DEFAULT_REPLACEMENTS: Dict[str, str] = {
+    # Meta-Tags und Quality Markers tragen nichts zur Bildbeschreibung bei
+    "masterpiece": "",
+    "award-winning": "",
+    "hyperrealistic": "",
+    "8k": "",
+    "4k": "",
+    "hdr": "",
+    "ultra-detailed": "finely detailed",
+    "trending on artstation": "",
+    "best quality": "",
+    # Subjektive Adjektive
+    "beautiful": "",
+    "handsome": "",
+    "pretty": "",
+    "stunning": "",
+    "gorgeous": "",
+    "amazing": "",
+    "incredible": "",
+    # Stylisierung
+    "anime style": "",
+    "cartoon": "",
+    "illustration": "photograph",
+    "digital art": "photograph",
+    "cinematic lighting": "soft directional light",
+    # Generische Subjekte -> fiktive Identität
+    "man": NAME_PLACEHOLDER,
+    "woman": NAME_PLACEHOLDER,
+    "person": NAME_PLACEHOLDER,
+    "boy": NAME_PLACEHOLDER,
+    "girl": NAME_PLACEHOLDER,
+    "a man": NAME_PLACEHOLDER,
+    "a woman": NAME_PLACEHOLDER,
+}
+
+_ARTICLE_TAIL = re.compile(r"(?:^|(?<=\s))(?:a|an|the|this|that)\s+$", re.IGNORECASE)
+_SPACE_BEFORE_PUNCT = re.compile(r"[ \t]+([,.;:!?])")
+_DOUBLE_PUNCT = re.compile(r"([,;:])[ \t]*(?=[,.;:!?])")
+_EMPTY_SENTENCE = re.compile(r"([.!?])[ \t]+[.,;:!?]")
+_LEADING_PUNCT = re.compile(r"(^|\n)[ \t]*[,;:.!?][ \t]*")
+_TRAILING_COMMA = re.compile(r"[ \t]*,")
+_MULTI_SPACE = re.compile(r"[ \t]{2,}")
+
+
+class RewriteResult(NamedTuple):
+    text: str
+    replaced: List[WordMatch]     # matches the table resolved (spans refer to the input)
+    unresolved: List[WordMatch]   # matches still present in ``text``
+
+    @property
+    def resolved(self) -> bool:
+        return not self.unresolved
+
+
+def _capitalize_first(text: str) -> str:
+    for i, char in enumerate(text):
+        if char.isalpha():
+            return text[:i] + char.upper() + text[i + 1:]
+    return text
+
+
+def _starts_sentence(text: str, start: int) -> bool:
+    head = text[:start].rstrip()
+    return not head or head[-1] in ".!?\n"
+
+
+def _generic_subject(word: str) -> str:
+    """"a woman" -> "woman"."""
+    return word.split()[-1]
+
+
+def rewrite_forbidden_words(
+    text: str,
+    name: Optional[str] = None,
+    replacements: Optional[Dict[str, str]] = None,
+) -> RewriteResult:
+    """
+    Rewrite every forbidden word in ``text`` that has a table entry.
+
+    ``{name}`` entries need ``name`` and a single generic subject whose
+    first mention opens a sentence; otherwise those matches stay
+    unresolved. The output is rescanned, so ``unresolved`` is exact.
+    """
+    table = DEFAULT_REPLACEMENTS if replacements is None else replacements
+    matches = find_forbidden_words(text)
+    if not matches:
+        return RewriteResult(text, [], [])
+
+    # Several different generic subjects ("the woman ... the man") are
+    # several people - naming them all after the character would change the scene
+    subjects = {_generic_subject(m.word) for m in matches if NAME_PLACEHOLDER in table.get(m.word, "")}
+    name_allowed = bool(name) and len(subjects) == 1
+    first_name = name.split()[0] if name else None
+    name_used = False
+    replaced: List[WordMatch] = []
+    removed_any = False
+    capitalize_next = False
+    out = ""
+    position = 0
+
+    def emit(chunk: str) -> str:
+        nonlocal capitalize_next
+        if capitalize_next and any(c.isalpha() for c in chunk):
+            chunk = _capitalize_first(chunk)
+            capitalize_next = False
+        return chunk
+
+    for match in matches:
+        replacement = table.get(match.word)
+        if replacement is None or (NAME_PLACEHOLDER in replacement and not name_allowed):
+            continue
+
+        sentence_start = _starts_sentence(text, match.start)
+        pending_capital = capitalize_next
+        head = out + emit(text[position:match.start])
+
+        if NAME_PLACEHOLDER in replacement:
+            # Also catches the article before a removed adjective ("the stunning woman")
+            article = _ARTICLE_TAIL.search(head)
+            if article:
+                head = head[:article.start()]
+            if not name_used and not _starts_sentence(head, len(head)):
+                # First mention is no subject ("a person of note") - leave all to the LLM
+                name_allowed = False
+                capitalize_next = pending_capital
+                continue
+            out = head
+            replacement = replacement.replace(NAME_PLACEHOLDER, first_name if name_used else name)
+            name_used = True
+            capitalize_next = False
+        else:
+            out = head
+            if sentence_start:
+                replacement = _capitalize_first(replacement)
+
+        replaced.append(match)
+        position = match.end
+
+        if replacement:
+            out += emit(replacement)
+        else:
+            # A removed list item takes its trailing comma along ("pretty, calm")
+            comma = _TRAILING_COMMA.match(text, position)
+            if comma:
+                position = comma.end()
+            removed_any = True
+            capitalize_next = capitalize_next or sentence_start
+
+    rewritten = out + emit(text[position:])
+
+    if removed_any:
+        rewritten = _DOUBLE_PUNCT.sub("", rewritten)
+        rewritten = _EMPTY_SENTENCE.sub(r"\1", rewritten)
+        rewritten = _SPACE_BEFORE_PUNCT.sub(r"\1", rewritten)
+        rewritten = _LEADING_PUNCT.sub(r"\1", rewritten)
+        rewritten = _MULTI_SPACE.sub(" ", rewritten).strip()
+
+    return RewriteResult(rewritten, replaced, find_forbidden_words(rewritten))
+
+
+def load_replacement_table(path: str) -> Dict[str, str]:
+    """
+    Load a JSON object ``{"word": "replacement"}`` and merge it over the
+    defaults. Keys must be forbidden words; ``null`` removes a default entry.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Replacement table {path} must be a JSON object")
+
+    table = dict(DEFAULT_REPLACEMENTS)
+    for word, replacement in overrides.items():
+        word = word.lower()
+        if word not in FORBIDDEN_WORDS:
+            raise ValueError(f"'{word}' in {path} is not a forbidden word")
+        if replacement is None:
+            table.pop(word, None)
+        else:
+            table[word] = str(replacement)
+    return table
+
+
+class ForbiddenWordRewriter:
+    """
+    Rewrite stage with counters for /api/metrics.
+
+    ``regenerations_avoided`` counts prompts that contained forbidden words
+    and were fixed locally; ``regenerations`` counts the LLM re-invocations
+    that were still needed.
+    """
+
+    def __init__(self, replacements: Optional[Dict[str, str]] = None):
+        self.replacements = dict(DEFAULT_REPLACEMENTS if replacements is None else replacements)
+        self.rewritten = 0
+        self.regenerations_avoided = 0
+        self.regenerations = 0
+        self._lock = threading.Lock()
+
+    def can_rewrite(self, word: str, name: Optional[str] = None) -> bool:
+        """
+        Whether a match of ``word`` can be resolved locally (table entry, name
+        if needed). Name substitution also depends on the rest of the text,
+        so the final :meth:`rewrite` may still leave such a match unresolved.
+        """
+        replacement = self.replacements.get(word)
+        return replacement is not None and (NAME_PLACEHOLDER not in replacement or bool(name))
+
+    def rewrite(self, text: str, name: Optional[str] = None) -> RewriteResult:
+        result = rewrite_forbidden_words(text, name, self.replacements)
+        if result.replaced:
+            with self._lock:
+                self.rewritten += 1
+        return result
+
+    def record_avoided(self) -> None:
+        with self._lock:
+            self.regenerations_avoided += 1
+
+    def record_regeneration(self) -> None:
+        with self._lock:
+            self.regenerations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rewritten": self.rewritten,
+            "regenerations_avoided": self.regenerations_avoided,
+            "regenerations": self.regenerations,
+        }
+
+    @classmethod
+    def from_env(cls) -> "ForbiddenWordRewriter":
+        """PROMPT_REWRITE_TABLE: optional path to a JSON table merged over the defaults."""
+        path = os.getenv("PROMPT_REWRITE_TABLE")
+        if not path:
+            return cls()
+        try:
+            return cls(load_replacement_table(path))
+        except (OSError, ValueError) as e:
+            print(f"Startup Warning: PROMPT_REWRITE_TABLE ignoriert ({e}), nutze Standard-Tabelle")
+            return cls()
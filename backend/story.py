@@ -0,0 +1,335 @@
+"""
+Incremental story rendering
+
+A story's ``GlobalAssets`` (style preset, color grading, atmosphere
+override) are folded into every scene before it is rendered. The result -
+the scene's *effective input* - is fingerprinted, and rendered outputs are
+kept by fingerprint. Re-rendering a story after a change therefore only
+sends scenes whose effective input differs to the pipeline; all others
+reuse their stored output. Each scene records which global asset fields
+shaped its input, so a change to an asset a scene does not use (or an
+override that equals what the scene already says) costs nothing.
+
+Metadata (ids, ``sequence_number``, notes) is not part of the effective
+input: reordering scenes or renaming a story does not re-render anything.
+
+Scenes that do need rendering run concurrently through the pipeline under
+a budget shared by all story renders; results come back in
+``sequence_number`` order or stream out as each scene finishes.
+``StoryPromptStore`` writes a render back to the ``prompts`` table in one
+bulk UPDATE.
+"""
+
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend.cache import make_cache_key
+from backend.env import env_int
+from backend.models import GlobalAssets, PromptAssemblyOutput, Story, ZImageTurboPrompt
+from backend.pipeline import PipelineItem, PromptPipeline
+
+# The preset every scene is written for anyway; only other presets are folded in
+DEFAULT_STYLE_PRESET = GlobalAssets.model_fields["style_preset"].default
+
+# Fields that never reach the renderer
+METADATA_FIELDS = ("id", "story_id", "sequence_number", "notes")
+
+
+def apply_global_assets(
+    prompt: ZImageTurboPrompt, assets: Optional[GlobalAssets]
+) -> Tuple[ZImageTurboPrompt, Dict[str, str]]:
+    """
+    The scene as it is rendered, plus the global asset fields it depends on
+    (``{"global_assets.<field>": value}``).
+
+    The atmosphere override replaces ``scene.atmosphere``; a non-default
+    style preset and the color grading are appended to
+    ``scene.technical_specs``.
+    """
+    scene_update: Dict[str, Any] = {}
+    depends_on: Dict[str, str] = {}
+    if assets is not None:
+        if assets.overall_atmosphere_override:
+            scene_update["atmosphere"] = assets.overall_atmosphere_override
+            depends_on["global_assets.overall_atmosphere_override"] = assets.overall_atmosphere_override
+
+        extra = []
+        if assets.style_preset and assets.style_preset != DEFAULT_STYLE_PRESET:
+            extra.append(f"{assets.style_preset} style")
+            depends_on["global_assets.style_preset"] = assets.style_preset
+        if assets.color_grading:
+            grading = assets.color_grading
+            extra.append(grading if grading.lower().rstrip().endswith("grading") else f"{grading} color grading")
+            depends_on["global_assets.color_grading"] = assets.color_grading
+        if extra:
+            scene_update["technical_specs"] = ", ".join(filter(None, [prompt.scene.technical_specs, *extra]))
+
+    update: Dict[str, Any] = dict.fromkeys(METADATA_FIELDS)
+    if scene_update:
+        update["scene"] = prompt.scene.model_copy(update=scene_update)
+    return prompt.model_copy(update=update), depends_on
+
+
+def scene_fingerprint(generator, effective: ZImageTurboPrompt, mode: str) -> str:
+    """
+    Content address of one scene render. In polish mode this is the
+    generator's JSON -> text request key, so a changed system prompt, model
+    or generation config invalidates stored scenes like it does cache entries.
+    """
+    if mode == "polish":
+        return generator.json_to_text_key(effective)
+    return make_cache_key(f"story_scene_{mode}", "", "", {}, effective.model_dump_json())
+
+
+class SceneRender(NamedTuple):
+    index: int  # position in ``Story.prompts``
+    sequence_number: Optional[int]
+    fingerprint: str
+    depends_on: Dict[str, str]
+    reused: bool
+    output: Optional[PromptAssemblyOutput] = None
+    error: Optional[Exception] = None
+
+
+class StoryRender(NamedTuple):
+    scenes: List[SceneRender]  # in ``sequence_number`` order
+
+    @property
+    def regenerated(self) -> int:
+        return sum(1 for s in self.scenes if not s.reused and s.error is None)
+
+    @property
+    def skipped(self) -> int:
+        return sum(1 for s in self.scenes if s.reused)
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for s in self.scenes if s.error is not None)
+
+
+class _PlannedScene(NamedTuple):
+    index: int
+    prompt: ZImageTurboPrompt
+    effective: ZImageTurboPrompt
+    fingerprint: str
+    depends_on: Dict[str, str]
+
+
+def scene_order(story: Story) -> List[int]:
+    """Indices of ``story.prompts`` by ``sequence_number`` (unnumbered last, list order on ties)."""
+    prompts = story.prompts
+    return sorted(
+        range(len(prompts)),
+        key=lambda i: (prompts[i].sequence_number is None, prompts[i].sequence_number or 0, i),
+    )
+
+
+class StoryEngine:
+    """
+    Renders stories through a ``PromptPipeline`` and keeps the outputs by
+    scene fingerprint (bounded LRU, in-process).
+
+    ``concurrency`` is a budget shared by all renders of this engine: many
+    stories rendering at once still have at most that many scenes in
+    stage two together.
+    """
+
+    def __init__(self, pipeline: PromptPipeline, max_entries: int = 2048, concurrency: int = 16):
+        self.pipeline = pipeline
+        self.max_entries = max(1, max_entries)
+        self.concurrency = max(1, concurrency)
+        self.budget = asyncio.Semaphore(self.concurrency)
+        self._outputs: "OrderedDict[str, PromptAssemblyOutput]" = OrderedDict()
+        self.renders = 0
+        self.regenerated = 0
+        self.skipped = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, pipeline: PromptPipeline) -> "StoryEngine":
+        """STORY_CACHE_MAX_ENTRIES (default 2048), STORY_CONCURRENCY (default 16)."""
+        return cls(
+            pipeline,
+            max_entries=env_int("STORY_CACHE_MAX_ENTRIES", 2048),
+            concurrency=env_int("STORY_CONCURRENCY", 16),
+        )
+
+    def _lookup(self, fingerprint: str) -> Optional[PromptAssemblyOutput]:
+        output = self._outputs.get(fingerprint)
+        if output is not None:
+            self._outputs.move_to_end(fingerprint)
+        return output
+
+    def _store(self, fingerprint: str, output: PromptAssemblyOutput) -> None:
+        self._outputs[fingerprint] = output
+        self._outputs.move_to_end(fingerprint)
+        while len(self._outputs) > self.max_entries:
+            self._outputs.popitem(last=False)
+
+    def _scene(self, planned: _PlannedScene, outcome, reused: bool) -> SceneRender:
+        prompt = planned.prompt
+        base = (planned.index, prompt.sequence_number, planned.fingerprint, planned.depends_on, reused)
+        if isinstance(outcome, Exception):
+            self.failed += 1
+            return SceneRender(*base, error=outcome)
+        if reused:
+            self.skipped += 1
+        else:
+            self.regenerated += 1
+        # Stored outputs are shared between scenes - hand out copies with this scene's metadata
+        metadata = {field: getattr(prompt, field) for field in METADATA_FIELDS}
+        output = outcome.model_copy(update={"json_structure": outcome.json_structure.model_copy(update=metadata)})
+        return SceneRender(*base, output=output)
+
+    async def render_stream(
+        self,
+        generator,
+        story: Story,
+        mode: str = "polish",
+        limit: Optional[int] = None,
+        ordered: bool = False,
+    ) -> AsyncIterator[SceneRender]:
+        """
+        Yield every scene of ``story`` as soon as it is done: reused scenes
+        first, rendered ones as they finish. With ``ordered=True`` a scene is
+        held back until all scenes before it (by ``sequence_number``) are out.
+
+        Only scenes without a stored output for their current fingerprint go
+        to the pipeline; identical scenes are rendered once and the copies
+        count as reused. Failed scenes carry their exception and are not
+        stored.
+        """
+        self.renders += 1
+        planned = []
+        for index in scene_order(story):
+            prompt = story.prompts[index]
+            effective, depends_on = apply_global_assets(prompt, story.global_assets)
+            fingerprint = scene_fingerprint(generator, effective, mode)
+            planned.append(_PlannedScene(index, prompt, effective, fingerprint, depends_on))
+
+        ready: Dict[int, SceneRender] = {}  # position -> finished, not yet yielded
+        waiting: Dict[str, List[int]] = {}  # fingerprint -> positions
+        for position, scene in enumerate(planned):
+            stored = self._lookup(scene.fingerprint)
+            if stored is not None:
+                ready[position] = self._scene(scene, stored, reused=True)
+            else:
+                waiting.setdefault(scene.fingerprint, []).append(position)
+
+        next_position = 0
+
+        def release() -> List[SceneRender]:
+            nonlocal next_position
+            if not ordered:
+                out = list(ready.values())
+                ready.clear()
+                return out
+            out = []
+            while next_position in ready:
+                out.append(ready.pop(next_position))
+                next_position += 1
+            return out
+
+        for scene in release():
+            yield scene
+
+        fingerprints = list(waiting)
+        items = [PipelineItem(prompt_json=planned[waiting[f][0]].effective) for f in fingerprints]
+        rendered = self.pipeline.stream(generator, items, limit, mode, budget=self.budget)
+        try:
+            async for item_index, outcome in rendered:
+                fingerprint = fingerprints[item_index]
+                if not isinstance(outcome, Exception):
+                    self._store(fingerprint, outcome)
+                # Identical scenes share the one render: only the first counts as regenerated
+                failed = isinstance(outcome, Exception)
+                for copy, position in enumerate(waiting[fingerprint]):
+                    ready[position] = self._scene(planned[position], outcome, reused=copy > 0 and not failed)
+                for scene in release():
+                    yield scene
+        finally:
+            await rendered.aclose()
+
+    async def render(self, generator, story: Story, mode: str = "polish", limit: Optional[int] = None) -> StoryRender:
+        """All scenes of ``story``, in ``sequence_number`` order (see :meth:`render_stream`)."""
+        scenes = [scene async for scene in self.render_stream(generator, story, mode, limit, ordered=True)]
+        return StoryRender(scenes)
+
+    def stats(self) -> Dict[str, Any]:
+        scenes = self.regenerated + self.skipped + self.failed
+        return {
+            "renders": self.renders,
+            "scenes": scenes,
+            "regenerated": self.regenerated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "skip_rate": round(self.skipped / scenes, 3) if scenes else 0.0,
+            "entries": len(self._outputs),
+            "concurrency": self.concurrency,
+        }
+
+
+class StoryPromptStore:
+    """
+    Writes rendered scenes back to ``prompts`` (final_prompt_text,
+    word_count, validation_passed): one executemany UPDATE in one
+    transaction per story render.
+    """
+
+    def __init__(self, connection_string: str):
+        from sqlalchemy import create_engine
+
+        self.engine = create_engine(connection_string)
+
+    @classmethod
+    def from_env(cls) -> Optional["StoryPromptStore"]:
+        """DATABASE_URL (unset: story renders are not persisted)."""
+        url = os.getenv("DATABASE_URL")
+        return cls(url) if url else None
+
+    @staticmethod
+    def rows(scenes: Iterable[SceneRender]) -> List[Dict[str, Any]]:
+        """Update parameters for successful scenes whose prompt has a UUID ``id``."""
+        rows = []
+        for scene in scenes:
+            if scene.output is None or not scene.output.json_structure.id:
+                continue
+            try:
+                prompt_id = uuid.UUID(scene.output.json_structure.id)
+            except ValueError:
+                continue
+            rows.append({
+                "prompt_id": prompt_id,
+                "prompt_text": scene.output.full_prompt_text,
+                "prompt_words": scene.output.estimated_word_count,
+                "prompt_valid": scene.output.forbidden_words_check,
+            })
+        return rows
+
+    def save(self, scenes: Iterable[SceneRender]) -> int:
+        """Persist ``scenes``; returns the number of rows sent."""
+        from sqlalchemy import bindparam, update
+
+        from backend.db_models import Prompt
+
+        rows = self.rows(scenes)
+        if not rows:
+            return 0
+        statement = (
+            update(Prompt.__table__)
+            .where(Prompt.__table__.c.id == bindparam("prompt_id"))
+            .values(
+                final_prompt_text=bindparam("prompt_text"),
+                word_count=bindparam("prompt_words"),
+                validation_passed=bindparam("prompt_valid"),
+            )
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement, rows)
+        return len(rows)
+
+    def close(self) -> None:
+        self.engine.dispose()
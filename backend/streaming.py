@@ -0,0 +1,96 @@
+"""
+Helpers for streaming request/response bodies (NDJSON, server-sent events)
+"""
+
+import json
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+# Upper bound for a single NDJSON record; keeps memory constant per request
+MAX_NDJSON_LINE_BYTES = 1024 * 1024
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int = MAX_NDJSON_LINE_BYTES,
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into NDJSON lines without buffering the whole body.
+
+    Yields ``(line_number, line)`` for every non-blank line (1-based). A line
+    longer than ``max_line_bytes`` is yielded once as ``(line_number, None)``
+    and its remaining bytes are discarded.
+    """
+    buffer = bytearray()
+    line_number = 0
+    overflow = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline == -1:
+                if not overflow:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        overflow = True
+                break
+
+            line_number += 1
+            if overflow:
+                overflow = False
+                yield line_number, None
+            else:
+                buffer += chunk[start:newline]
+                if len(buffer) > max_line_bytes:
+                    yield line_number, None
+                elif buffer.strip():
+                    yield line_number, bytes(buffer)
+            buffer.clear()
+            start = newline + 1
+
+    if overflow:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+
+def ndjson_line(payload: Any) -> bytes:
+    """Serialize one record as an NDJSON line."""
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def sse_event(event: str, payload: Any) -> bytes:
+    """Serialize one server-sent event with a JSON ``data`` field."""
+    data = json.dumps(payload, ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+# Proxies (nginx) must not buffer the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator reads the request body itself.
+
+    Starlette's default response listens for ``http.disconnect`` on
+    ``receive`` while streaming, which competes with ``request.stream()`` for
+    the same messages. Here the body iterator is the only consumer; a client
+    disconnect surfaces as ``ClientDisconnect`` from ``request.stream()``.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return await super().__call__(scope, receive, send)
+
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,89 @@
+"""
+Fake Gemini provider for tests and benchmarks.
+
+Mimics the parts of ``google.generativeai.GenerativeModel`` used by
+``GeminiPromptGenerator`` without any network access.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Union
+
+from backend.gemini_integration import GeminiPromptGenerator
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "zimage_turbo_fixtures.json"
+
+
+def load_fixture(name: str) -> dict:
+    with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)[name]
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Returns a canned reply after ``latency`` seconds.
+
+    ``reply`` may be a string or a callable receiving the request contents.
+    Every call is recorded in ``calls`` (its generation config in ``configs``).
+    ``stream=True`` calls return the reply in ``chunk_size`` pieces.
+    """
+
+    def __init__(self, reply: Union[str, Callable[[Any], str]], latency: float = 0.0):
+        self.reply = reply
+        self.latency = latency
+        self.calls: List[Any] = []
+        self.configs: List[Any] = []
+        self.chunk_size = 40
+        self.chunks_read = 0
+
+    def _reply_for(self, contents: Any) -> str:
+        self.calls.append(contents)
+        reply = self.reply(contents) if callable(self.reply) else self.reply
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def generate_content(self, contents, generation_config=None, **kwargs):
+        self.configs.append(generation_config)
+        time.sleep(self.latency)
+        return FakeResponse(self._reply_for(contents))
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False, **kwargs):
+        self.configs.append(generation_config)
+        await asyncio.sleep(self.latency)
+        if stream:
+            return FakeStream(self._reply_for(contents), self.chunk_size, self)
+        return FakeResponse(self._reply_for(contents))
+
+
+class FakeStream:
+    """``stream=True`` reply: the text in ``chunk_size`` pieces; ``model.chunks_read`` counts consumed chunks."""
+
+    def __init__(self, text: str, chunk_size: int, model: FakeModel):
+        self.pieces = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.model = model
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            await asyncio.sleep(0)
+            self.model.chunks_read += 1
+            yield FakeResponse(piece)
+
+
+def make_generator(
+    reply: Union[str, Callable[[Any], str]],
+    latency: float = 0.0,
+    vision_reply: Optional[Union[str, Callable[[Any], str]]] = None,
+) -> GeminiPromptGenerator:
+    """Build a ``GeminiPromptGenerator`` whose models are fakes."""
+    generator = GeminiPromptGenerator(api_key="test-key")
+    generator.model = FakeModel(reply, latency=latency)
+    generator.model_vision = FakeModel(vision_reply if vision_reply is not None else reply, latency=latency)
+    return generator
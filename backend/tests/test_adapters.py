@@ -1,6 +1,10 @@
 import unittest
 
-from backend.adapters import FluxAdapter, BananaAdapter, get_adapter
+from unittest.mock import patch
+
+from backend.adapters import (
+    AdapterRegistry, BaseAdapter, FluxAdapter, BananaAdapter, get_adapter, adapt_many, collect_text_parts,
+)
 from backend.models import BasePrompt, Subject, Environment, Style, TechSpecs
 
 
@@ -53,6 +57,94 @@ class AdapterTests(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_adapter("unknown")
 
+    def test_get_adapter_returns_shared_singletons(self):
+        self.assertIs(get_adapter("flux"), get_adapter(" FLUX "))
+        self.assertIs(get_adapter("nano banana"), get_adapter("banana-pro"))
+
+    def test_adapt_many_matches_single_adapters(self):
+        results = adapt_many(self.base_prompt, ["flux", "banana", "banana-pro"])
+
+        self.assertEqual(set(results), {"flux", "banana-pro"})
+        self.assertEqual(results["flux"]["data"], FluxAdapter().adapt(self.base_prompt))
+        self.assertEqual(results["banana-pro"]["data"], BananaAdapter().adapt(self.base_prompt))
+        self.assertEqual(results["flux"]["warnings"], [])
+        self.assertEqual(results["banana-pro"]["warnings"], [])
+
+    def test_adapt_many_walks_text_parts_once(self):
+        with patch("backend.adapters.collect_text_parts", wraps=collect_text_parts) as collect:
+            adapt_many(self.base_prompt)
+        self.assertEqual(collect.call_count, 1)
+
+    def test_adapt_many_reports_per_target_warnings(self):
+        self.base_prompt.technical.sampler = "lms_karras"
+        results = adapt_many(self.base_prompt)
+
+        self.assertEqual(results["flux"]["warnings"], ["Unsupported sampler: lms_karras"])
+        self.assertEqual(results["banana-pro"]["warnings"], [])
+
+    def test_adapt_many_unknown_target(self):
+        with self.assertRaises(ValueError):
+            adapt_many(self.base_prompt, ["flux", "unknown"])
+
+
+class _EchoAdapter(BaseAdapter):
+    model_name = "echo"
+    aliases = ("echo-v1",)
+
+    def adapt(self, base_prompt, parts=None):
+        return {"model": "echo"}
+
+
+class _FakeEntryPoint:
+    def __init__(self, name, value, loaded):
+        self.name = name
+        self.value = value
+        self._loaded = loaded
+
+    def load(self):
+        if isinstance(self._loaded, Exception):
+            raise self._loaded
+        return self._loaded
+
+
+class AdapterRegistryTests(unittest.TestCase):
+    def test_register_and_describe(self):
+        registry = AdapterRegistry(entry_point_group=None)
+        registry.register(FluxAdapter())
+        registry.register(_EchoAdapter(), aliases=("Echo Model",))
+
+        self.assertIsInstance(registry.get("echo model"), _EchoAdapter)
+        described = {d["model"]: d for d in registry.describe()}
+        self.assertEqual(described["echo"]["aliases"], ["echo", "echo model", "echo-v1"])
+        self.assertIn("euler", described["flux"]["capabilities"]["samplers"])
+        self.assertIn("16:9", described["flux"]["capabilities"]["aspect_ratios"])
+
+    def test_alias_conflict_is_rejected(self):
+        registry = AdapterRegistry(entry_point_group=None)
+        registry.register(FluxAdapter())
+
+        class Impostor(_EchoAdapter):
+            aliases = ("flux",)
+
+        with self.assertRaises(ValueError):
+            registry.register(Impostor())
+
+    def test_entry_point_plugins_are_loaded_once(self):
+        entry_points = [
+            _FakeEntryPoint("echo", "pkg:EchoAdapter", _EchoAdapter),
+            _FakeEntryPoint("broken", "pkg:Broken", ImportError("missing dependency")),
+        ]
+        registry = AdapterRegistry(entry_point_group="promptos.adapters")
+
+        with patch("backend.adapters.metadata.entry_points", return_value=entry_points) as discover:
+            self.assertIsInstance(registry.get("echo"), _EchoAdapter)
+            registry.get("echo-v1")
+            self.assertEqual(registry.names(), ["echo"])
+
+        discover.assert_called_once_with(group="promptos.adapters")
+        with self.assertRaises(ValueError):
+            registry.get("broken")
+
 
 if __name__ == "__main__":
     unittest.main()
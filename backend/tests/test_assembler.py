@@ -0,0 +1,129 @@
+"""
+Tests for the local template assembler (no-LLM JSON -> prompt path)
+"""
+
+import json
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.assembler import (
+    EYE_PHRASES,
+    FACE_PHRASES,
+    HAIR_PHRASES,
+    LIGHTING_PHRASES,
+    SKIN_TONE_PHRASES,
+    assemble_prompt,
+    assemble_prompt_text,
+    quote_text,
+)
+from backend.models import (
+    EyeDescription,
+    FacialStructure,
+    HairDescription,
+    LightingType,
+    SkinTone,
+    ZImageTurboPrompt,
+    find_forbidden_words,
+)
+from backend.rewrite import ForbiddenWordRewriter
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+def fixture_prompt(**scene) -> ZImageTurboPrompt:
+    data = load_fixture("valid_prompt")
+    data["scene"].update(scene)
+    return ZImageTurboPrompt(**data)
+
+
+class AssemblerTests(unittest.TestCase):
+    def test_modules_in_system_prompt_order(self):
+        text = assemble_prompt_text(fixture_prompt())
+
+        self.assertTrue(text.startswith("Valentina Ruiz is a 22-year-old Colombian-Lebanese student from Medellín."))
+        order = [
+            "medium skin tone with olive undertones",
+            "is standing at outdoor café table",
+            "in a historic piazza in Bari",
+            "low golden hour sun",
+            "warm, dry air",
+            "three-quarter view",
+            '"Caffè Bari"',
+            "Shot on Fujifilm X-T4",
+        ]
+        positions = [text.index(fragment) for fragment in order]
+        self.assertEqual(positions, sorted(positions))
+        self.assertTrue(text.endswith("natural color rendering."))
+
+    def test_phrase_tables_cover_every_enum_member(self):
+        for enum_cls, table in (
+            (SkinTone, SKIN_TONE_PHRASES),
+            (HairDescription, HAIR_PHRASES),
+            (FacialStructure, FACE_PHRASES),
+            (EyeDescription, EYE_PHRASES),
+            (LightingType, LIGHTING_PHRASES),
+        ):
+            self.assertEqual(set(table), set(enum_cls), msg=enum_cls.__name__)
+            for phrase in table.values():
+                self.assertEqual(find_forbidden_words(phrase), [], msg=phrase)
+
+    def test_text_content_is_double_quoted(self):
+        self.assertEqual(quote_text(' “Open" \n daily '), "Open' daily")
+        data = load_fixture("valid_prompt")
+        data["text_elements"]["elements"][0]["content"] = 'Da "Nonna" Maria'
+        data["text_elements"]["elements"][0]["placement"] = "top center"
+        text = assemble_prompt_text(ZImageTurboPrompt(**data))
+        self.assertIn('The words "Da \'Nonna\' Maria" appear at the top center', text)
+
+    def test_forbidden_words_from_user_fields_are_rewritten(self):
+        rewriter = ForbiddenWordRewriter()
+        output = assemble_prompt(fixture_prompt(atmosphere="stunning, bustling afternoon"), rewriter)
+
+        self.assertTrue(output.forbidden_words_check)
+        self.assertEqual(output.rewritten_words, ["stunning"])
+        self.assertIn("defined by bustling afternoon", output.full_prompt_text)
+        self.assertEqual(rewriter.stats()["rewritten"], 1)
+
+    def test_only_known_gerunds_get_a_subject(self):
+        data = load_fixture("valid_prompt")
+        data["action"] = {"action": "Bring the espresso cup to the table"}
+        self.assertIn("Bring the espresso cup to the table.", assemble_prompt_text(ZImageTurboPrompt(**data)))
+        data["action"] = {"action": "King's chess piece in one hand"}
+        self.assertIn("King's chess piece in one hand.", assemble_prompt_text(ZImageTurboPrompt(**data)))
+        data["action"] = {"action": "Leaning against the café wall"}
+        self.assertIn("Valentina is leaning against the café wall.", assemble_prompt_text(ZImageTurboPrompt(**data)))
+
+
+class LocalModeTests(unittest.IsolatedAsyncioTestCase):
+    async def test_local_mode_needs_only_stage_one(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+
+        output = await generator.generate_full_prompt_async("Valentina in Bari", mode="local")
+
+        self.assertEqual(len(generator.model.calls), 1)
+        self.assertEqual(output.full_prompt_text, assemble_prompt_text(output.json_structure))
+        with self.assertRaises(ValueError):
+            await generator.generate_full_prompt_async("Valentina in Bari", mode="draft")
+
+
+class JsonToPromptEndpointTests(unittest.TestCase):
+    def test_local_mode_works_without_generator(self):
+        with patch.object(main, "generator", None):
+            client = TestClient(main.app)
+            response = client.post("/api/json-to-prompt", json=load_fixture("valid_prompt"))
+            polish = client.post("/api/json-to-prompt?mode=polish", json=load_fixture("valid_prompt"))
+            unknown = client.post("/api/json-to-prompt?mode=draft", json=load_fixture("valid_prompt"))
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["mode"], "local")
+        self.assertTrue(body["validation_passed"])
+        self.assertIn('"Caffè Bari"', body["prompt_text"])
+        self.assertEqual(polish.status_code, 500)
+        self.assertEqual(unknown.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Tests for the async GeminiPromptGenerator path and its concurrency behaviour
+"""
+
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend import main
+from backend.models import BasePrompt, ZImageTurboPrompt
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+class AsyncGeneratorTests(unittest.IsolatedAsyncioTestCase):
+    """Async variants parse the same replies as their sync counterparts"""
+
+    async def test_text_to_json_async_parses_fenced_reply(self):
+        reply = "```json\n" + json.dumps(load_fixture("valid_prompt")) + "\n```"
+        generator = make_generator(reply)
+
+        result = await generator.text_to_json_async("Valentina in Bari")
+
+        self.assertIsInstance(result, ZImageTurboPrompt)
+        self.assertEqual(result.character.identity.name, "Valentina Ruiz")
+        self.assertIn("Valentina in Bari", generator.model.calls[0])
+
+    async def test_text_to_base_prompt_async(self):
+        generator = make_generator(json.dumps(load_fixture("valid_base_prompt")))
+
+        result = await generator.text_to_base_prompt_async("Valentina in Bari")
+
+        self.assertIsInstance(result, BasePrompt)
+        self.assertEqual(result.environment.location, "historic piazza in Bari old town")
+
+    async def test_invalid_json_raises_value_error(self):
+        generator = make_generator("not json at all")
+
+        with self.assertRaises(ValueError):
+            await generator.text_to_json_async("Valentina in Bari")
+
+    async def test_generate_full_prompt_async_runs_both_stages(self):
+        prompt_json = json.dumps(load_fixture("valid_prompt"))
+        generator = make_generator(
+            lambda contents: prompt_json if "USER INPUT" in contents else "Valentina Ruiz stands in Bari."
+        )
+
+        output = await generator.generate_full_prompt_async("Valentina in Bari")
+
+        self.assertEqual(output.full_prompt_text, "Valentina Ruiz stands in Bari.")
+        self.assertTrue(output.forbidden_words_check)
+        self.assertEqual(len(generator.model.calls), 2)
+
+
+class ImageBytesTests(unittest.IsolatedAsyncioTestCase):
+    """Uploads go straight from memory to the vision call"""
+
+    async def test_image_bytes_to_json_async_passes_bytes_and_mime_type(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+
+        result = await generator.image_bytes_to_json_async(b"\x89PNG fake", "image/png")
+
+        self.assertEqual(result.character.identity.name, "Valentina Ruiz")
+        image_part = generator.model_vision.calls[0][1]
+        self.assertEqual(image_part, {"mime_type": "image/png", "data": b"\x89PNG fake"})
+
+    async def test_upload_endpoint_does_not_touch_disk(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        transport = httpx.ASGITransport(app=main.app)
+
+        with patch.object(main, "generator", generator), \
+                patch("tempfile.NamedTemporaryFile", side_effect=AssertionError("temp file used")):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post(
+                    "/api/image-to-json", files={"file": ("shot.webp", b"RIFF fake", "image/webp")}
+                )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(generator.model_vision.calls[0][1]["mime_type"], "image/webp")
+
+
+class AsyncConcurrencyBenchmarkTests(unittest.IsolatedAsyncioTestCase):
+    """N concurrent requests should finish in roughly one provider latency, not N"""
+
+    LATENCY = 0.2
+    N = 10
+
+    async def test_concurrent_generator_calls_overlap(self):
+        generator = make_generator(json.dumps(load_fixture("valid_base_prompt")), latency=self.LATENCY)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(generator.text_to_base_prompt_async(f"idea {i}") for i in range(self.N))
+        )
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(results), self.N)
+        self.assertLess(elapsed, self.LATENCY * 3)
+
+    async def test_concurrent_endpoint_requests_do_not_block_event_loop(self):
+        generator = make_generator(json.dumps(load_fixture("valid_base_prompt")), latency=self.LATENCY)
+        transport = httpx.ASGITransport(app=main.app)
+
+        with patch.object(main, "generator", generator):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                started = time.perf_counter()
+                responses = await asyncio.gather(
+                    *(client.post("/api/text-to-base", json={"text": f"idea {i}"}) for i in range(self.N))
+                )
+                elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        self.assertLess(elapsed, self.LATENCY * 3)
+
+    async def test_concurrent_uploads_do_not_stall_other_endpoints(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")), latency=self.LATENCY)
+        transport = httpx.ASGITransport(app=main.app)
+        health_latencies = []
+
+        async def poll_health(client, stop):
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = await client.get("/health")
+                health_latencies.append(time.perf_counter() - started)
+                self.assertEqual(response.status_code, 200)
+                await asyncio.sleep(0.01)
+
+        with patch.object(main, "generator", generator):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                stop = asyncio.Event()
+                poller = asyncio.create_task(poll_health(client, stop))
+                started = time.perf_counter()
+                uploads = await asyncio.gather(*(
+                    client.post(
+                        "/api/image-to-json",
+                        files={"file": (f"img{i}.jpg", bytes([i]) * 1024 * 1024, "image/jpeg")},
+                    )
+                    for i in range(self.N)
+                ))
+                elapsed = time.perf_counter() - started
+                stop.set()
+                await poller
+
+        self.assertTrue(all(r.status_code == 200 for r in uploads))
+        self.assertLess(elapsed, self.LATENCY * 3)
+        self.assertGreater(len(health_latencies), 3)
+        self.assertLess(max(health_latencies), self.LATENCY)
+
+
+if __name__ == "__main__":
+    unittest.main()
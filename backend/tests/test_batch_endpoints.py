@@ -0,0 +1,118 @@
+"""
+Integration tests for batch endpoints
+"""
+
+import json
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.repair import SchemaRepairer
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+class TextToBaseBatchTests(unittest.TestCase):
+    def setUp(self):
+        base_prompt = json.dumps(load_fixture("valid_base_prompt"))
+
+        def reply(contents):
+            if "broken idea" in contents:
+                return "this is not json"
+            if "schema idea" in contents:
+                return json.dumps({"subject": {"description": "no environment"}})
+            return base_prompt
+
+        self.generator = make_generator(reply)
+        # Schema errors must reach the envelope, not the repair follow-up
+        self.generator.repairer = SchemaRepairer(llm_followup=False)
+        patcher = patch.object(main, "generator", self.generator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def test_results_in_input_order_with_per_item_errors(self):
+        response = self.client.post(
+            "/api/text-to-base/batch",
+            json={"texts": ["idea one", "broken idea", "   ", "idea four", "schema idea"], "concurrency": 2},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["total"], 5)
+        self.assertEqual(body["succeeded"], 2)
+        self.assertEqual(body["failed"], 3)
+
+        results = body["results"]
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3, 4])
+        self.assertTrue(results[0]["success"])
+        self.assertEqual(results[0]["data"]["subject"]["description"][:14], "Valentina Ruiz")
+
+        self.assertFalse(results[1]["success"])
+        self.assertEqual(results[1]["error"]["error_code"], "PROVIDER_ERROR")
+        self.assertEqual(results[1]["error"]["details"][0]["field_path"], "texts.1")
+
+        self.assertEqual(results[2]["error"]["error_code"], "VALIDATION_ERROR")
+        self.assertTrue(results[3]["success"])
+        # A reply that parses but fails the BasePrompt schema
+        self.assertEqual(results[4]["error"]["error_code"], "VALIDATION_ERROR")
+        # The empty item never reaches Gemini
+        self.assertEqual(len(self.generator.model.calls), 4)
+
+    def test_rejects_oversized_batch(self):
+        with patch.object(main, "BATCH_MAX_ITEMS", 2):
+            response = self.client.post("/api/text-to-base/batch", json={"texts": ["a", "b", "c"]})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AdaptBulkTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_streams_results_in_input_order(self):
+        lines = [
+            json.dumps(load_fixture("valid_base_prompt")),
+            json.dumps({"environment": {"location": "historic piazza"}}),
+            "not json",
+            json.dumps({"subject": {"description": "Valentina Ruiz"}, "environment": {"location": "Bari"}}),
+        ]
+
+        response = self.client.post("/api/adapt/flux/bulk", content="\n".join(lines) + "\n")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        results = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([r["line"] for r in results], [1, 2, 3, 4])
+
+        self.assertTrue(results[0]["success"])
+        self.assertEqual(results[0]["data"]["model"], "flux")
+
+        self.assertFalse(results[1]["success"])
+        self.assertEqual(results[1]["error"]["error_code"], "VALIDATION_ERROR")
+        self.assertIn("subject", [d["field_path"] for d in results[1]["error"]["details"]])
+
+        self.assertEqual(results[2]["error"]["error_code"], "VALIDATION_ERROR")
+
+        self.assertTrue(results[3]["success"])
+        self.assertIn("style", results[3]["defaults_applied"])
+
+    def test_adapter_value_error_is_provider_error(self):
+        line = json.dumps(load_fixture("valid_base_prompt"))
+        with patch("backend.adapters.FluxAdapter.adapt", side_effect=ValueError("adapter failed")):
+            response = self.client.post("/api/adapt/flux/bulk", content=line + "\n")
+
+        result = json.loads(response.text.splitlines()[0])
+        self.assertFalse(result["success"])
+        self.assertEqual(result["error"]["error_code"], "PROVIDER_ERROR")
+
+    def test_unknown_model_fails_before_streaming(self):
+        response = self.client.post("/api/adapt/unknown-model/bulk", content="{}\n")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error_code"], "PROVIDER_ERROR")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Unit tests for the content-addressed response cache
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from backend.cache import MemoryLRUCache, ResponseCache, SQLiteCache, make_cache_key
+from backend.models import BasePrompt
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+class CacheKeyTests(unittest.TestCase):
+    def test_key_ignores_whitespace_differences(self):
+        a = make_cache_key("text_to_json", "SYS", "gemini", {"temperature": 0.7}, "Valentina  in\nBari")
+        b = make_cache_key("text_to_json", "SYS", "gemini", {"temperature": 0.7}, " Valentina in Bari ")
+        self.assertEqual(a, b)
+
+    def test_key_changes_with_system_prompt_and_config(self):
+        base = make_cache_key("text_to_json", "SYS", "gemini", {"temperature": 0.7}, "idea")
+        self.assertNotEqual(base, make_cache_key("text_to_json", "SYS v2", "gemini", {"temperature": 0.7}, "idea"))
+        self.assertNotEqual(base, make_cache_key("text_to_json", "SYS", "gemini", {"temperature": 0.8}, "idea"))
+        self.assertNotEqual(base, make_cache_key("text_to_base", "SYS", "gemini", {"temperature": 0.7}, "idea"))
+
+
+class MemoryLRUCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = MemoryLRUCache(max_entries=2, ttl_seconds=None)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_expired_entries_are_dropped(self):
+        cache = MemoryLRUCache(max_entries=10, ttl_seconds=0.01)
+        cache.set("a", "1")
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.expirations, 1)
+
+    def test_len_counts_only_live_entries(self):
+        cache = MemoryLRUCache(max_entries=10, ttl_seconds=0.01)
+        cache.set("a", "1")
+        time.sleep(0.02)
+        cache.set("b", "2")
+
+        self.assertEqual(len(cache), 1)
+
+    def test_backend_interface_is_abstract(self):
+        from backend.cache import CacheBackend
+
+        with self.assertRaises(TypeError):
+            CacheBackend()
+
+
+class TieredCacheTests(unittest.TestCase):
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            first = ResponseCache(disk=SQLiteCache(path))
+            first.set("key", "value")
+            first.disk.close()
+
+            second = ResponseCache(disk=SQLiteCache(path))
+            self.assertEqual(second.get("key"), "value")
+            self.assertEqual(second.stats()["disk_hits"], 1)
+            # Promoted into memory: second lookup is a memory hit
+            self.assertEqual(second.get("key"), "value")
+            self.assertEqual(second.stats()["disk_hits"], 1)
+            second.disk.close()
+
+    def test_counts_hits_and_misses(self):
+        cache = ResponseCache()
+        self.assertIsNone(cache.get("missing"))
+        cache.set("key", "value")
+        cache.get("key")
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_removal_listeners_hear_evictions_and_deletes(self):
+        cache = ResponseCache(memory=MemoryLRUCache(max_entries=1, ttl_seconds=None))
+        removed = []
+        cache.add_removal_listener(removed.append)
+        cache.add_removal_listener(removed.append)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.delete("b")
+
+        self.assertEqual(removed, ["a", "b"])
+
+    def test_memory_eviction_with_disk_tier_is_not_a_removal(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(
+                memory=MemoryLRUCache(max_entries=1, ttl_seconds=None),
+                disk=SQLiteCache(os.path.join(tmp, "cache.sqlite"), ttl_seconds=0.01),
+            )
+            removed = []
+            cache.add_removal_listener(removed.append)
+            cache.set("a", "1")
+            cache.set("b", "2")
+            self.assertEqual(removed, [])
+
+            time.sleep(0.02)
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(removed, ["a"])
+            cache.disk.close()
+
+
+class GeneratorCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.generator = make_generator(json.dumps(load_fixture("valid_base_prompt")))
+        self.generator.cache = ResponseCache()
+
+    async def test_repeated_input_skips_gemini(self):
+        first = await self.generator.text_to_base_prompt_async("Valentina in Bari")
+        second = await self.generator.text_to_base_prompt_async("Valentina  in Bari")
+        third = self.generator.text_to_base_prompt("Valentina in Bari")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual(len(self.generator.model.calls), 1)
+        self.assertEqual(self.generator.metrics()["cache"]["hits"], 2)
+
+    async def test_unparseable_entry_is_treated_as_miss(self):
+        key = self.generator._request_key(
+            "text_to_base", self.generator.MODEL_NAME, self.generator.TEXT_TO_BASE_CONFIG, "idea", BasePrompt
+        )
+        self.generator.cache.set(key, '{"old_schema": 1}')
+
+        result = await self.generator.text_to_base_prompt_async("idea")
+
+        self.assertIsInstance(result, BasePrompt)
+        self.assertEqual(len(self.generator.model.calls), 1)
+        stats = self.generator.metrics()["cache"]
+        self.assertEqual(stats["discarded"], 1)
+        self.assertEqual(stats["hits"], 0)
+        # The fresh result replaced the stale entry
+        self.assertEqual(BasePrompt.model_validate_json(self.generator.cache.get(key)), result)
+
+    def test_schema_change_changes_key(self):
+        class OtherModel(BasePrompt):
+            extra: str = ""
+
+        a = self.generator._request_key("text_to_base", "m", {}, "idea", BasePrompt)
+        b = self.generator._request_key("text_to_base", "m", {}, "idea", OtherModel)
+        self.assertNotEqual(a, b)
+
+    async def test_disk_tier_used_from_async_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = SQLiteCache(os.path.join(tmp, "cache.sqlite"))
+            self.generator.cache = ResponseCache(disk=disk)
+            await self.generator.text_to_base_prompt_async("Valentina in Bari")
+            self.generator.cache.memory.clear()
+
+            await self.generator.text_to_base_prompt_async("Valentina in Bari")
+
+            self.assertEqual(len(self.generator.model.calls), 1)
+            self.assertEqual(self.generator.metrics()["cache"]["disk_hits"], 1)
+            disk.close()
+
+    async def test_system_prompt_change_invalidates_entries(self):
+        await self.generator.text_to_base_prompt_async("Valentina in Bari")
+        with patch("backend.gemini_integration.get_system_prompt", return_value="NEW SYSTEM PROMPT"):
+            await self.generator.text_to_base_prompt_async("Valentina in Bari")
+
+        self.assertEqual(len(self.generator.model.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,386 @@
+"""
+Civitai import against a local stand-in server (no network access)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.civitai_bulk import BulkImporter, ImportJobStore, new_job
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+FAKE_IMAGE = b"\xff\xd8\xff\xe0 fake jpeg"
+GALLERY_SIZE = 7  # images in the fake "valentina" user gallery
+
+
+class FakeCivitaiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(self, body: bytes, content_type: str, chunk_size: int = 1024) -> None:
+        """No Content-Length: the client only notices the size while streaming."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for start in range(0, len(body), chunk_size):
+                chunk = body[start:start + chunk_size]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass  # client aborted the download
+
+    def _gallery_item(self, image_id: int) -> dict:
+        return {
+            "id": image_id,
+            "url": f"{self.server.base_url}/img/{image_id}.jpg",
+            "meta": {"prompt": f"Valentina Ruiz in Bari, scene {image_id}"},
+        }
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        url = urlsplit(self.path)
+        if url.path == "/api/v1/images":
+            # Cursor pagination like Civitai: metadata.nextCursor
+            params = parse_qs(url.query)
+            start = int(params.get("cursor", ["0"])[0])
+            limit = int(params["limit"][0])
+            end = min(start + limit, GALLERY_SIZE)
+            payload = {
+                "items": [self._gallery_item(i) for i in range(start + 1, end + 1)],
+                "metadata": {"nextCursor": end if end < GALLERY_SIZE else None},
+            }
+            self._send(200, json.dumps(payload).encode(), "application/json")
+        elif self.path.startswith("/api/v1/images/"):
+            image_id = self.path.rsplit("/", 1)[-1]
+            payload = {"id": image_id, "url": f"{self.server.base_url}/img/{image_id}.jpg", "meta": {}}
+            self._send(200, json.dumps(payload).encode(), "application/json")
+        elif self.path == "/img/huge.jpg":
+            self._send(200, b"\xff\xd8\xff" + b"\x00" * 8192, "image/jpeg")
+        elif self.path == "/img/chunked.jpg":
+            self._send_chunked(b"\xff\xd8\xff" + b"\x00" * 8192, "image/jpeg")
+        elif self.path == "/img/page.jpg":
+            self._send(200, b"<html></html>", "text/html")
+        elif self.path.startswith("/img/"):
+            # Distinct bytes per image, so concurrent imports are not coalesced
+            image_id = self.path[len("/img/"):].split(".")[0]
+            self._send(200, FAKE_IMAGE + image_id.encode(), "image/jpeg")
+        else:
+            self._send(404, b"{}", "application/json")
+
+
+class FakeCivitaiServer:
+    """ThreadingHTTPServer on an ephemeral port that counts TCP connections."""
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeCivitaiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.connections = 0
+        self.httpd.requests = []
+        self.httpd.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return self.httpd.base_url
+
+    def __enter__(self) -> "FakeCivitaiServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class CivitaiImportConnectionTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeCivitaiServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        env = patch.dict(os.environ, {"CIVITAI_API_BASE": f"{self.server.base_url}/api/v1"})
+        env.start()
+        self.addCleanup(env.stop)
+        generator = patch.object(main, "generator", make_generator(json.dumps(load_fixture("valid_prompt"))))
+        generator.start()
+        self.addCleanup(generator.stop)
+
+    def test_imports_reuse_one_pooled_connection(self):
+        with TestClient(main.app) as client:
+            for image_id in ("101", "102", "103"):
+                response = client.post("/api/import/civitai", json={"image_id": image_id, "mode": "image"})
+                self.assertEqual(response.status_code, 200, response.text)
+                self.assertEqual(response.json()["image_id"], image_id)
+
+        # 3 metadata fetches + 3 image downloads over a single keep-alive connection
+        self.assertEqual(len(self.server.httpd.requests), 6)
+        self.assertEqual(self.server.httpd.connections, 1)
+
+    def test_lifespan_closes_the_client(self):
+        with TestClient(main.app):
+            client = main.http_client
+            self.assertIsNotNone(client)
+        self.assertTrue(client.is_closed)
+        self.assertIsNone(main.http_client)
+
+
+class CivitaiImageDownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeCivitaiServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        env = patch.dict(os.environ, {
+            "CIVITAI_API_BASE": f"{self.server.base_url}/api/v1",
+            "CIVITAI_MAX_IMAGE_BYTES": "4096",
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        self.generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        patcher = patch.object(main, "generator", self.generator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _import(self, image_id: str):
+        with TestClient(main.app) as client:
+            return client.post("/api/import/civitai", json={"image_id": image_id, "mode": "image"})
+
+    def test_image_goes_to_vision_call_from_memory(self):
+        with patch("tempfile.NamedTemporaryFile", side_effect=AssertionError("temp file used")):
+            response = self._import("101")
+
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(
+            self.generator.model_vision.calls[0][1], {"mime_type": "image/jpeg", "data": FAKE_IMAGE + b"101"}
+        )
+
+    def test_declared_oversize_is_rejected_before_reading(self):
+        response = self._import("huge")
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.generator.model_vision.calls, [])
+
+    def test_streamed_oversize_is_aborted(self):
+        response = self._import("chunked")
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.generator.model_vision.calls, [])
+
+    def test_non_image_content_type_is_rejected(self):
+        response = self._import("page")
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.generator.model_vision.calls, [])
+
+
+
+class BulkImportTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeCivitaiServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        env = patch.dict(os.environ, {"CIVITAI_API_BASE": f"{self.server.base_url}/api/v1"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.directory = tempfile.mkdtemp()
+        self.generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        self.client = httpx.AsyncClient()
+        self.addAsyncCleanup(self.client.aclose)
+
+    def _importer(self, **kwargs) -> BulkImporter:
+        kwargs.setdefault("rate_per_host", 0)
+        return BulkImporter(ImportJobStore(self.directory), **kwargs)
+
+    async def _run(self, importer: BulkImporter, job: dict) -> dict:
+        await importer.start(job, self.client, self.generator)
+        await importer.wait(job["job_id"])
+        return importer.store.load(job["job_id"])
+
+    async def test_id_list_is_imported_and_persisted(self):
+        saved = await self._run(self._importer(), new_job(image_ids=["11", "12", "13"]))
+
+        self.assertEqual(saved["status"], "completed")
+        self.assertEqual(sorted(saved["results"]), ["11", "12", "13"])
+        self.assertEqual(saved["results"]["11"]["json_structure"]["character"]["identity"]["name"], "Valentina Ruiz")
+        with open(os.path.join(self.directory, ImportJobStore.LEDGER)) as f:
+            self.assertEqual(sorted(f.read().splitlines()), ["auto\t11", "auto\t12", "auto\t13"])
+
+    async def test_finished_jobs_leave_memory(self):
+        importer = self._importer()
+        job = new_job(image_ids=["11"])
+
+        saved = await self._run(importer, job)
+
+        self.assertEqual(importer._jobs, {})
+        self.assertEqual(importer.get(job["job_id"]), saved)
+
+    async def test_repeated_ids_are_imported_once(self):
+        saved = await self._run(self._importer(), new_job(image_ids=["11", "12", "11", "11"]))
+
+        self.assertEqual(sorted(saved["results"]), ["11", "12"])
+        self.assertEqual(len(self.generator.model_vision.calls), 2)
+        with open(os.path.join(self.directory, ImportJobStore.LEDGER)) as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+
+    async def test_listing_pages_through_cursor(self):
+        importer = self._importer(page_size=3)
+
+        saved = await self._run(importer, new_job(query={"username": "valentina"}))
+
+        self.assertEqual(saved["status"], "completed")
+        self.assertEqual(len(saved["results"]), GALLERY_SIZE)
+        listing = [p for p in self.server.httpd.requests if p.startswith("/api/v1/images?")]
+        self.assertEqual(len(listing), 3)
+        self.assertTrue(all("username=valentina" in p for p in listing))
+        # Embedded prompt text used, no image downloads
+        self.assertFalse(any(p.startswith("/img/") for p in self.server.httpd.requests))
+
+    async def test_max_items_caps_listing(self):
+        saved = await self._run(self._importer(page_size=3), new_job(query={"username": "valentina"}, max_items=4))
+        self.assertEqual(sorted(saved["results"], key=int), ["1", "2", "3", "4"])
+
+    async def test_already_imported_ids_are_skipped(self):
+        importer = self._importer()
+        await self._run(importer, new_job(image_ids=["11", "12"]))
+
+        saved = await self._run(self._importer(), new_job(image_ids=["11", "12", "13"]))
+
+        self.assertEqual(sorted(saved["results"]), ["13"])
+        self.assertEqual(sorted(saved["skipped"]), ["11", "12"])
+        # Single-image records carry no prompt, so each import is one vision call
+        self.assertEqual(len(self.generator.model_vision.calls), 3)
+
+    async def test_ledger_is_kept_per_mode(self):
+        await self._run(self._importer(), new_job(image_ids=["11"], mode="image"))
+
+        again = await self._run(self._importer(), new_job(image_ids=["11"], mode="image"))
+        auto = await self._run(self._importer(), new_job(image_ids=["11"], mode="auto"))
+
+        self.assertEqual(again["skipped"], ["11"])
+        self.assertEqual(auto["skipped"], [])
+        self.assertEqual(sorted(auto["results"]), ["11"])
+
+    async def test_legacy_ledger_lines_count_as_auto(self):
+        with open(os.path.join(self.directory, ImportJobStore.LEDGER), "w") as f:
+            f.write("11\n")
+        store = ImportJobStore(self.directory)
+
+        self.assertTrue(store.is_imported("11", "auto"))
+        self.assertFalse(store.is_imported("11", "fast"))
+
+    async def test_resume_continues_from_saved_cursor(self):
+        importer = self._importer(page_size=3)
+        first = new_job(query={"username": "valentina"}, max_items=3)
+        await self._run(importer, first)
+
+        # Same job, limit raised: picks up at the stored cursor
+        resumed = importer.store.load(first["job_id"])
+        resumed["max_items"] = 100
+        saved = await self._run(self._importer(page_size=3), resumed)
+
+        self.assertEqual(len(saved["results"]), GALLERY_SIZE)
+        listing = [p for p in self.server.httpd.requests if p.startswith("/api/v1/images?")]
+        self.assertNotIn("cursor", listing[0])
+        self.assertIn("cursor=3", listing[1])
+        self.assertEqual(len(self.generator.model.calls), GALLERY_SIZE)
+
+    async def test_shutdown_saves_job_as_interrupted(self):
+        self.generator = make_generator(json.dumps(load_fixture("valid_prompt")), latency=5)
+        importer = self._importer()
+        job = new_job(image_ids=["11"])
+        await importer.start(job, self.client, self.generator)
+        await asyncio.sleep(0.1)
+
+        await importer.shutdown()
+
+        self.assertEqual(importer.store.load(job["job_id"])["status"], "interrupted")
+
+    async def test_requests_are_rate_limited_per_host(self):
+        importer = self._importer(rate_per_host=20)
+
+        started = time.perf_counter()
+        await self._run(importer, new_job(image_ids=[str(i) for i in range(5)]))
+        elapsed = time.perf_counter() - started
+
+        # 5 metadata requests to one host at 20/s need at least 4 intervals
+        self.assertGreaterEqual(elapsed, 4 * 0.05 - 0.01)
+        self.assertGreater(importer.limiter.waited, 0)
+
+
+class BulkImportEndpointTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeCivitaiServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        env = patch.dict(os.environ, {"CIVITAI_API_BASE": f"{self.server.base_url}/api/v1"})
+        env.start()
+        self.addCleanup(env.stop)
+        for name, value in (
+            ("generator", make_generator(json.dumps(load_fixture("valid_prompt")))),
+            ("bulk_importer", BulkImporter(ImportJobStore(tempfile.mkdtemp()), rate_per_host=0)),
+        ):
+            patcher = patch.object(main, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_start_and_poll_job(self):
+        with TestClient(main.app) as client:
+            response = client.post("/api/import/civitai/bulk", json={"query": {"username": "valentina"}})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job_id"]
+
+            for _ in range(100):
+                status = client.get(f"/api/import/civitai/bulk/{job_id}").json()
+                if status["status"] == "completed":
+                    break
+                time.sleep(0.02)
+
+            self.assertEqual(status["imported"], GALLERY_SIZE)
+            full = client.get(f"/api/import/civitai/bulk/{job_id}", params={"include_results": True}).json()
+            self.assertEqual(len(full["results"]), GALLERY_SIZE)
+
+    def test_fast_mode_runs_without_generator(self):
+        with patch.object(main, "generator", None), TestClient(main.app) as client:
+            response = client.post("/api/import/civitai/bulk", json={"query": {"username": "valentina"}, "mode": "fast"})
+            self.assertEqual(response.status_code, 202, response.text)
+            job_id = response.json()["job_id"]
+            for _ in range(100):
+                status = client.get(f"/api/import/civitai/bulk/{job_id}").json()
+                if status["status"] == "completed":
+                    break
+                time.sleep(0.02)
+            rejected = client.post("/api/import/civitai/bulk", json={"image_ids": ["1"], "mode": "turbo"})
+
+        self.assertEqual(status["imported"], GALLERY_SIZE)
+        self.assertEqual(rejected.status_code, 400)
+
+    def test_requires_exactly_one_source(self):
+        with TestClient(main.app) as client:
+            both = client.post("/api/import/civitai/bulk", json={"image_ids": ["1"], "query": {"username": "x"}})
+            missing = client.get("/api/import/civitai/bulk/does-not-exist")
+        self.assertEqual(both.status_code, 400)
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
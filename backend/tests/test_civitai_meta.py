@@ -0,0 +1,143 @@
+"""
+Tests for the deterministic Civitai meta -> TechSpecs/BasePrompt mapping
+"""
+
+import json
+import unittest
+
+import httpx
+
+from backend.civitai import extract_item
+from backend.civitai_meta import (
+    apply_meta_technical,
+    clean_prompt_text,
+    meta_to_base_prompt,
+    meta_to_tech_specs,
+    normalize_sampler,
+)
+from backend.models import BasePrompt, TechSpecs
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+CIVITAI_META = {
+    "prompt": "masterpiece, best quality, (Valentina Ruiz:1.2), navy linen blazer, "
+              "<lora:film_grain:0.6> in a historic piazza in Bari, golden hour light",
+    "negativePrompt": "blurry, lowres",
+    "sampler": "DPM++ 2M Karras",
+    "cfgScale": 6.5,
+    "seed": 3843118390144226,
+    "steps": "30",
+    "Size": "832x1216",
+    "Model": "juggernautXL",
+}
+
+
+class SamplerTests(unittest.TestCase):
+    def test_display_names_map_to_sampler_ids(self):
+        cases = {
+            "DPM++ 2M Karras": "dpmpp_2m",
+            "DPM++ 2M SDE Exponential": "dpmpp_2m_sde",
+            "Euler a": "euler_a",
+            "euler_ancestral": "euler_a",
+            "dpmpp_2m": "dpmpp_2m",
+            "UniPC": "uni_pc",
+        }
+        for name, expected in cases.items():
+            self.assertEqual(normalize_sampler(name), expected, name)
+
+    def test_unknown_sampler_is_kept(self):
+        self.assertEqual(normalize_sampler(" Custom Sampler "), "Custom Sampler")
+        self.assertIsNone(normalize_sampler(""))
+
+
+class TechSpecsMappingTests(unittest.TestCase):
+    def test_maps_all_fields(self):
+        specs = meta_to_tech_specs(CIVITAI_META)
+        self.assertEqual(specs, TechSpecs(
+            seed=3843118390144226,
+            steps=30,
+            cfg_scale=6.5,
+            sampler="dpmpp_2m",
+            resolution="832x1216",
+            aspect_ratio="13:19",
+            negative_prompt="blurry, lowres",
+        ))
+
+    def test_invalid_values_stay_unset(self):
+        specs = meta_to_tech_specs({"seed": "random", "steps": 20.5, "cfgScale": "nan", "Size": "big"})
+        self.assertEqual(specs, TechSpecs())
+
+    def test_record_dimensions_are_the_size_fallback(self):
+        specs = meta_to_tech_specs({}, width=1024, height=1536)
+        self.assertEqual((specs.resolution, specs.aspect_ratio), ("1024x1536", "2:3"))
+
+    def test_meta_overrides_llm_values(self):
+        base = BasePrompt(**load_fixture("valid_base_prompt"), technical=TechSpecs(seed=1, guidance=3.5))
+        merged = apply_meta_technical(base, CIVITAI_META).technical
+        self.assertEqual(merged.seed, 3843118390144226)
+        self.assertEqual(merged.guidance, 3.5)
+
+
+class BasePromptMappingTests(unittest.TestCase):
+    def test_clean_prompt_text_strips_a1111_syntax(self):
+        self.assertEqual(
+            clean_prompt_text("(Valentina:1.3), [navy blazer] <lora:x:0.5>\nBREAK in Bari"),
+            "Valentina, navy blazer, in Bari",
+        )
+
+    def test_fast_mapping_splits_subject_and_environment(self):
+        base = meta_to_base_prompt(CIVITAI_META)
+        self.assertEqual(base.subject.description, "Valentina Ruiz")
+        self.assertEqual(base.subject.attributes, ["navy linen blazer", "golden hour light"])
+        self.assertEqual(base.environment.location, "in a historic piazza in Bari")
+        self.assertEqual(base.technical.sampler, "dpmpp_2m")
+
+    def test_scene_only_prompt_still_has_a_subject(self):
+        base = meta_to_base_prompt({"prompt": "masterpiece, best quality, city street at night, in Tokyo"})
+        self.assertEqual(base.subject.description, "city street at night")
+        self.assertEqual(base.environment.location, "in Tokyo")
+
+    def test_quality_tags_only_raise(self):
+        with self.assertRaises(ValueError):
+            meta_to_base_prompt({"prompt": "masterpiece, best quality, 8k"})
+
+    def test_missing_prompt_raises(self):
+        with self.assertRaises(ValueError):
+            meta_to_base_prompt({"seed": 1})
+
+
+class ExtractModeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = httpx.AsyncClient()
+        self.addAsyncCleanup(self.client.aclose)
+        self.record = {"id": 1, "meta": CIVITAI_META}
+
+    async def test_fast_mode_makes_no_llm_call(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        item = await extract_item(self.client, generator, self.record, "fast")
+        self.assertEqual(item["base_prompt"]["technical"]["seed"], 3843118390144226)
+        self.assertEqual(generator.model.calls, [])
+
+    async def test_base_mode_sends_only_the_cleaned_prompt(self):
+        reply = dict(load_fixture("valid_base_prompt"), technical={"seed": 7, "sampler": "euler"})
+        generator = make_generator(json.dumps(reply))
+        item = await extract_item(self.client, generator, self.record, "base")
+
+        request = json.dumps(generator.model.calls[0], ensure_ascii=False)
+        self.assertNotIn("lora:", request)
+        self.assertNotIn("lowres", request)
+        self.assertEqual(item["base_prompt"]["technical"]["seed"], 3843118390144226)
+        self.assertEqual(item["base_prompt"]["technical"]["sampler"], "dpmpp_2m")
+
+    async def test_auto_mode_reports_technical(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        item = await extract_item(self.client, generator, self.record, "auto")
+        self.assertIn("json_structure", item)
+        self.assertEqual(item["technical"]["steps"], 30)
+
+    async def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            await extract_item(self.client, None, self.record, "turbo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Unit tests for async concurrency helpers
+"""
+
+import asyncio
+import json
+import unittest
+
+from backend.concurrency import SingleFlight, bounded_gather
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+class BoundedGatherTests(unittest.IsolatedAsyncioTestCase):
+    async def test_results_keep_input_order_and_respect_limit(self):
+        in_flight = 0
+        peak = 0
+
+        async def work(item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01 * (5 - item))
+            in_flight -= 1
+            return item * 10
+
+        results = await bounded_gather(range(5), work, limit=2)
+
+        self.assertEqual(results, [0, 10, 20, 30, 40])
+        self.assertEqual(peak, 2)
+
+    async def test_failures_are_returned_per_item(self):
+        async def work(item):
+            if item == 1:
+                raise ValueError("bad item")
+            return item
+
+        results = await bounded_gather([0, 1, 2], work, limit=3)
+
+        self.assertEqual(results[0], 0)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 2)
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_identical_calls_share_one_upstream_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(5)))
+
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {"issued": 1, "coalesced": 4, "in_flight": 0})
+
+    async def test_error_is_delivered_to_every_caller(self):
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(3)), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.issued, 1)
+
+    async def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+
+        async def upstream():
+            return "result"
+
+        await flight.do("key", upstream)
+        await flight.do("key", upstream)
+
+        self.assertEqual(flight.issued, 2)
+        self.assertEqual(flight.coalesced, 0)
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", upstream))
+        second = asyncio.ensure_future(flight.do("key", upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        self.assertEqual(await second, "result")
+
+
+class GeneratorSingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def test_duplicate_requests_coalesce_in_generator(self):
+        generator = make_generator(json.dumps(load_fixture("valid_base_prompt")), latency=0.05)
+
+        results = await asyncio.gather(
+            *(generator.text_to_base_prompt_async("Valentina in Bari") for _ in range(4)),
+            generator.text_to_base_prompt_async("something else"),
+        )
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(generator.model.calls), 2)
+        self.assertEqual(generator.metrics()["singleflight"]["coalesced"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
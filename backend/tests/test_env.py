@@ -0,0 +1,41 @@
+"""
+Tests for numeric environment settings with startup fallbacks
+"""
+
+import unittest
+from unittest.mock import patch
+
+from backend.cache import ResponseCache
+from backend.env import env_float, env_int
+from backend.pipeline import PromptPipeline
+
+
+class EnvNumberTests(unittest.TestCase):
+    def test_malformed_value_falls_back_to_default(self):
+        with patch.dict("os.environ", {"BATCH_CONCURRENCY": "eight"}):
+            self.assertEqual(env_int("BATCH_CONCURRENCY", 8), 8)
+        with patch.dict("os.environ", {"BATCH_CONCURRENCY": "0"}):
+            self.assertEqual(env_int("BATCH_CONCURRENCY", 8), 8)
+        with patch.dict("os.environ", {"BATCH_CONCURRENCY": "3"}):
+            self.assertEqual(env_int("BATCH_CONCURRENCY", 8), 3)
+
+    def test_minimum_and_floats(self):
+        with patch.dict("os.environ", {"CPU_WORKERS": "0", "CIVITAI_RATE_PER_HOST": "2.5"}):
+            self.assertEqual(env_int("CPU_WORKERS", 4, minimum=0), 0)
+            self.assertEqual(env_float("CIVITAI_RATE_PER_HOST", 5.0), 2.5)
+        with patch.dict("os.environ", {"CIVITAI_RATE_PER_HOST": "-1"}):
+            self.assertEqual(env_float("CIVITAI_RATE_PER_HOST", 5.0), 5.0)
+
+    def test_bad_cache_setting_keeps_the_cache(self):
+        with patch.dict("os.environ", {"PROMPT_CACHE_TTL_SECONDS": "1d", "PROMPT_CACHE_MAX_ENTRIES": "many"}):
+            cache = ResponseCache.from_env()
+
+        self.assertEqual((cache.memory.ttl_seconds, cache.memory.max_entries), (86400.0, 1024))
+
+    def test_pipeline_limits_fall_back(self):
+        with patch.dict("os.environ", {"PIPELINE_STAGE1_CONCURRENCY": "8x"}):
+            self.assertEqual(PromptPipeline.from_env().stage1_concurrency, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Tests for the perceptual-hash near-duplicate cache of vision results
+"""
+
+import io
+import json
+import random
+import unittest
+
+from PIL import Image
+
+from backend.cache import MemoryLRUCache, ResponseCache
+from backend.image_cache import MultiIndexHash, PerceptualImageIndex, dhash
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+def make_photo(seed: int, size=(1200, 800), fmt="JPEG", quality=92) -> bytes:
+    """Blocky random image with enough structure for a stable dHash."""
+    rng = random.Random(seed)
+    small = Image.new("RGB", (12, 8))
+    small.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(12 * 8)])
+    image = small.resize(size, Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def recompress(data: bytes, size, quality: int, crop: float = 0.0) -> bytes:
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    image = image.crop((int(width * crop), int(height * crop), width, height))
+    image = image.resize(size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class DHashTests(unittest.TestCase):
+    def test_resized_recompressed_copy_is_close(self):
+        original = make_photo(1)
+        copy = recompress(original, (600, 400), quality=60, crop=0.04)
+        self.assertLessEqual((dhash(original) ^ dhash(copy)).bit_count(), 6)
+
+    def test_different_images_are_far_apart(self):
+        self.assertGreater((dhash(make_photo(1)) ^ dhash(make_photo(2))).bit_count(), 12)
+
+    def test_undecodable_bytes(self):
+        self.assertIsNone(dhash(b"not an image"))
+
+
+class MultiIndexHashTests(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        index = MultiIndexHash()
+        stored = {str(i): rng.getrandbits(64) for i in range(5000)}
+        for key, value in stored.items():
+            index.add(value, key)
+
+        for max_distance in (0, 3, 6, 9):
+            for _ in range(200):
+                query = rng.choice(list(stored.values()))
+                for bit in rng.sample(range(64), rng.randrange(max_distance + 3)):
+                    query ^= 1 << bit
+                expected = min(
+                    ((value ^ query).bit_count() for value in stored.values()),
+                    default=None,
+                )
+                found = index.nearest(query, max_distance)
+                if expected is not None and expected <= max_distance:
+                    self.assertIsNotNone(found)
+                    self.assertEqual(found[1], expected)
+                else:
+                    self.assertIsNone(found)
+
+    def test_remove(self):
+        index = MultiIndexHash()
+        index.add(0xFFFF, "a")
+        index.remove("a")
+        self.assertIsNone(index.nearest(0xFFFF, 4))
+        self.assertEqual(len(index), 0)
+
+
+class GeneratorImageDedupTests(unittest.IsolatedAsyncioTestCase):
+    def _generator(self, max_distance=6):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        generator.cache = ResponseCache()
+        generator.image_index = PerceptualImageIndex(max_distance=max_distance)
+        return generator
+
+    async def test_exact_duplicate_hits_cache(self):
+        generator = self._generator()
+        image = make_photo(1)
+
+        await generator.image_bytes_to_json_async(image)
+        await generator.image_bytes_to_json_async(image)
+
+        self.assertEqual(len(generator.model_vision.calls), 1)
+        self.assertEqual(generator.metrics()["image_dedup"]["near_hits"], 0)
+
+    async def test_near_duplicate_reuses_stored_result(self):
+        generator = self._generator()
+        original = make_photo(1)
+
+        first = await generator.image_bytes_to_json_async(original)
+        second = await generator.image_bytes_to_json_async(
+            recompress(original, (600, 400), quality=60, crop=0.04)
+        )
+
+        self.assertEqual(second, first)
+        self.assertEqual(len(generator.model_vision.calls), 1)
+        self.assertEqual(generator.metrics()["image_dedup"]["near_hits"], 1)
+
+    async def test_threshold_is_configurable(self):
+        generator = self._generator(max_distance=0)
+        original = make_photo(1)
+        copy = recompress(original, (600, 400), quality=60, crop=0.04)
+        self.assertNotEqual(dhash(original), dhash(copy))
+
+        await generator.image_bytes_to_json_async(original)
+        await generator.image_bytes_to_json_async(copy)
+
+        self.assertEqual(len(generator.model_vision.calls), 2)
+
+    async def test_distinct_images_call_the_model(self):
+        generator = self._generator()
+
+        await generator.image_bytes_to_json_async(make_photo(1))
+        await generator.image_bytes_to_json_async(make_photo(2))
+
+        self.assertEqual(len(generator.model_vision.calls), 2)
+
+    async def test_evicted_entry_is_dropped_from_index(self):
+        generator = self._generator()
+        original = make_photo(1)
+        await generator.image_bytes_to_json_async(original)
+        generator.cache.clear()
+
+        await generator.image_bytes_to_json_async(recompress(original, (600, 400), quality=60))
+
+        self.assertEqual(len(generator.model_vision.calls), 2)
+        # Old pointer discarded, the copy's own key indexed
+        self.assertEqual(generator.metrics()["image_dedup"]["entries"], 1)
+
+    async def test_lru_eviction_prunes_index(self):
+        generator = self._generator()
+        generator.cache = ResponseCache(memory=MemoryLRUCache(max_entries=2, ttl_seconds=None))
+
+        for seed in range(5):
+            await generator.image_bytes_to_json_async(make_photo(seed))
+
+        self.assertEqual(generator.metrics()["image_dedup"]["entries"], 2)
+
+    async def test_declared_mime_type_does_not_split_the_cache(self):
+        generator = self._generator()
+        image = make_photo(1)
+
+        await generator.image_bytes_to_json_async(image, "image/jpeg")
+        await generator.image_bytes_to_json_async(image, "image/jpg")
+
+        self.assertEqual(len(generator.model_vision.calls), 1)
+        self.assertEqual(generator.cache.stats()["hits"], 1)
+
+    def test_sync_path_uses_the_same_cache(self):
+        generator = self._generator()
+        original = make_photo(1)
+
+        generator.image_bytes_to_json(original)
+        generator.image_bytes_to_json(recompress(original, (800, 533), quality=70))
+
+        self.assertEqual(len(generator.model_vision.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
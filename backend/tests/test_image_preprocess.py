@@ -0,0 +1,106 @@
+"""
+Tests for image sniffing, downscaling and re-encoding before the vision call
+"""
+
+import io
+import json
+import unittest
+
+from PIL import Image
+
+from backend.image_preprocess import ImagePreprocessor, sniff_image_format
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+def make_image(fmt: str, size=(3000, 2000), mode="RGB", **save_kwargs) -> bytes:
+    image = Image.new(mode, size, (180, 120, 60, 255)[: len(mode)])
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue()
+
+
+class SniffImageFormatTests(unittest.TestCase):
+    def test_detects_common_formats(self):
+        self.assertEqual(sniff_image_format(make_image("JPEG", (8, 8))), "image/jpeg")
+        self.assertEqual(sniff_image_format(make_image("PNG", (8, 8))), "image/png")
+        self.assertEqual(sniff_image_format(make_image("WEBP", (8, 8))), "image/webp")
+        self.assertEqual(sniff_image_format(make_image("GIF", (8, 8))), "image/gif")
+
+    def test_detects_iso_bmff_brands(self):
+        self.assertEqual(sniff_image_format(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00"), "image/heic")
+        self.assertEqual(sniff_image_format(b"\x00\x00\x00\x1cftypavif\x00\x00\x00\x00"), "image/avif")
+
+    def test_unknown_bytes(self):
+        self.assertIsNone(sniff_image_format(b"not an image"))
+
+
+class ImagePreprocessorTests(unittest.TestCase):
+    def test_downscales_and_reencodes_as_jpeg(self):
+        data = make_image("PNG")
+        preprocessor = ImagePreprocessor(max_edge=1024)
+
+        result = preprocessor.process(data, "image/jpeg")
+
+        self.assertEqual(result.mime_type, "image/jpeg")
+        self.assertEqual(result.original_size, (3000, 2000))
+        self.assertEqual(max(result.output_size), 1024)
+        self.assertLess(result.output_bytes, result.input_bytes)
+        self.assertEqual(set(result.timings), {"sniff", "decode", "resize", "encode"})
+        self.assertEqual(Image.open(io.BytesIO(result.data)).format, "JPEG")
+
+    def test_strips_metadata_and_applies_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6          # Orientation: rotate 90° CW
+        exif[0x010F] = "Camera"   # Make
+        data = make_image("JPEG", size=(400, 200), exif=exif.tobytes())
+
+        result = ImagePreprocessor(max_edge=1024).process(data)
+
+        output = Image.open(io.BytesIO(result.data))
+        self.assertEqual(output.size, (200, 400))
+        self.assertEqual(len(output.getexif()), 0)
+
+    def test_flattens_transparency(self):
+        data = make_image("PNG", size=(64, 64), mode="RGBA")
+        result = ImagePreprocessor().process(data)
+        self.assertEqual(Image.open(io.BytesIO(result.data)).mode, "RGB")
+
+    def test_undecodable_input_passes_through_with_sniffed_type(self):
+        data = b"\x00\x00\x00\x18ftypheic" + b"\x00" * 64
+        result = ImagePreprocessor().process(data, "application/octet-stream")
+        self.assertEqual(result.data, data)
+        self.assertEqual(result.mime_type, "image/heic")
+
+    def test_stats_report_bytes_saved_and_stage_times(self):
+        preprocessor = ImagePreprocessor(max_edge=512)
+        preprocessor.process(make_image("PNG"))
+        preprocessor.process(b"garbage")
+
+        stats = preprocessor.stats()
+
+        self.assertEqual((stats["images"], stats["reencoded"], stats["passthrough"]), (2, 1, 1))
+        self.assertEqual(stats["bytes_saved"], stats["bytes_in"] - stats["bytes_out"])
+        self.assertGreater(stats["bytes_saved"], 0)
+        self.assertGreater(stats["stage_ms"]["encode"], 0)
+
+    def test_disabled_only_sniffs(self):
+        data = make_image("PNG", size=(32, 32))
+        result = ImagePreprocessor(enabled=False).process(data, "image/jpeg")
+        self.assertEqual((result.data, result.mime_type), (data, "image/png"))
+
+
+class GeneratorPreprocessTests(unittest.IsolatedAsyncioTestCase):
+    async def test_vision_call_receives_preprocessed_image(self):
+        generator = make_generator(json.dumps(load_fixture("valid_prompt")))
+        generator.preprocessor = ImagePreprocessor(max_edge=800)
+
+        await generator.image_bytes_to_json_async(make_image("PNG"), "image/jpeg")
+
+        image_part = generator.model_vision.calls[0][1]
+        self.assertEqual(image_part["mime_type"], "image/jpeg")
+        self.assertEqual(max(Image.open(io.BytesIO(image_part["data"])).size), 800)
+        self.assertEqual(generator.metrics()["image_preprocess"]["reencoded"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Tests for the directory/archive bulk ingest CLI
+"""
+
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+from sqlalchemy import create_engine, select
+
+from backend.db_models import LibraryPrompt
+from backend.ingest import DatabaseSink, IngestManifest, NdjsonSink, main, run_ingest
+
+
+def render(index: int, fmt: str = "PNG") -> bytes:
+    parameters = (
+        f"Valentina Ruiz, scene {index}, in a historic piazza in Bari\n"
+        f"Negative prompt: blurry\n"
+        f"Steps: 30, Sampler: Euler a, CFG scale: 7, Seed: {index}, Size: 64x48"
+    )
+    image = Image.new("RGB", (64, 48), (index, 90, 60))
+    buffer = io.BytesIO()
+    if fmt == "PNG":
+        info = PngInfo()
+        info.add_text("parameters", parameters)
+        image.save(buffer, format="PNG", pnginfo=info)
+    else:
+        exif = Image.Exif()
+        exif.get_ifd(0x8769)[0x9286] = b"UNICODE\0" + parameters.encode("utf-16-be")
+        image.save(buffer, format=fmt, exif=exif)
+    return buffer.getvalue()
+
+
+class IngestTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.library = os.path.join(self.tmp, "renders")
+        os.makedirs(os.path.join(self.library, "day1", "raw"))
+        files = {
+            "a.png": render(1),
+            "day1/b.png": render(2),
+            "day1/raw/c.jpg": render(3, "JPEG"),
+            "day1/raw/d.webp": render(4, "WEBP"),
+            "day1/copy-of-a.png": render(1),
+            "day1/notes.txt": b"not an image",
+        }
+        for name, data in files.items():
+            with open(os.path.join(self.library, name), "wb") as f:
+                f.write(data)
+        Image.new("RGB", (8, 8)).save(os.path.join(self.library, "plain.png"))
+        self.manifest_path = os.path.join(self.tmp, "manifest.jsonl")
+
+    def _run(self, path, sink=None, executor=None):
+        stream = io.StringIO()
+        counts = run_ingest(
+            path,
+            sink or NdjsonSink(stream),
+            IngestManifest(self.manifest_path),
+            workers=2,
+            executor=executor,
+        )
+        return counts, [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_directory_in_process_pool(self):
+        counts, records = self._run(self.library)
+        self.assertEqual(counts["imported"], 4)
+        self.assertEqual(counts["duplicates"], 1)
+        self.assertEqual(counts["no_metadata"], 1)
+
+        by_name = {os.path.basename(r["path"]): r for r in records}
+        self.assertEqual(by_name["c.jpg"]["base_prompt"]["technical"]["sampler"], "euler_a")
+        self.assertEqual(by_name["d.webp"]["base_prompt"]["environment"]["location"], "in a historic piazza in Bari")
+        self.assertFalse(by_name["plain.png"]["success"])
+
+    def test_resume_skips_unchanged_and_picks_up_new_files(self):
+        self._run(self.library)
+        with open(os.path.join(self.library, "e.png"), "wb") as f:
+            f.write(render(5))
+        shutil.move(os.path.join(self.library, "a.png"), os.path.join(self.library, "renamed.png"))
+
+        with ThreadPoolExecutor(2) as executor:
+            counts, records = self._run(self.library, executor=executor)
+        self.assertEqual(counts["unchanged"], 5)
+        self.assertEqual(counts["imported"], 1)
+        self.assertEqual(counts["duplicates"], 1)  # renamed file, same hash
+        self.assertEqual([os.path.basename(r["path"]) for r in records], ["e.png"])
+
+    def test_zip_and_tar_archives(self):
+        zip_path = os.path.join(self.tmp, "renders.zip")
+        tar_path = os.path.join(self.tmp, "renders.tar.gz")
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("batch/1.png", render(11))
+            zf.writestr("batch/2.png", render(12))
+        with tarfile.open(tar_path, "w:gz") as tf:
+            for index in (21, 22, 23):
+                data = render(index)
+                info = tarfile.TarInfo(f"batch/{index}.png")
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+
+        with ThreadPoolExecutor(2) as executor:
+            zip_counts, zip_records = self._run(zip_path, executor=executor)
+            tar_counts, _ = self._run(tar_path, executor=executor)
+        self.assertEqual(zip_counts["imported"], 2)
+        self.assertEqual(tar_counts["imported"], 3)
+        self.assertTrue(all(r["path"].startswith(f"{zip_path}::batch/") for r in zip_records))
+
+    def test_database_sink(self):
+        url = f"sqlite:///{os.path.join(self.tmp, 'library.db')}"
+        LibraryPrompt.__table__.create(create_engine(url))
+
+        with ThreadPoolExecutor(2) as executor:
+            self._run(self.library, sink=DatabaseSink(url), executor=executor)
+        with create_engine(url).connect() as connection:
+            rows = connection.execute(select(LibraryPrompt.generator, LibraryPrompt.base_prompt_json)).all()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row.generator for row in rows}, {"a1111"})
+
+    def test_cli(self):
+        output = os.path.join(self.tmp, "library.ndjson")
+        args = [self.library, "--output", output, "--manifest", self.manifest_path, "--workers", "1"]
+        self.assertEqual(main(args), 0)
+        with open(output, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 5)
+        self.assertEqual(main([os.path.join(self.library, "day1", "notes.txt")]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -225,5 +225,62 @@ class AdaptEndpointIntegrationTests(unittest.TestCase):
         self.assertIn("contents", data_output)
 
 
+class AdaptManyEndpointIntegrationTests(unittest.TestCase):
+    """Integration tests for the /api/adapt-many endpoint"""
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_adapters_listing(self):
+        """When GET /api/adapters Then registered targets with capabilities"""
+        response = self.client.get("/api/adapters")
+
+        self.assertEqual(response.status_code, 200)
+        adapters = {a["model"]: a for a in response.json()["adapters"]}
+        self.assertIn("flux", adapters)
+        self.assertIn("nano-banana", adapters["banana-pro"]["aliases"])
+        self.assertIn("samplers", adapters["flux"]["capabilities"])
+
+    def test_all_targets_in_one_response(self):
+        """Given valid data without targets When POST to /api/adapt-many Then payload per registered model"""
+        data = {
+            "base_prompt": {
+                "subject": {"description": "Valentina Ruiz, 22, Colombian-Lebanese student"},
+                "environment": {"location": "historic piazza in Bari old town"},
+            }
+        }
+
+        response = self.client.post("/api/adapt-many", json=data)
+
+        self.assertEqual(response.status_code, 200)
+        json_response = response.json()
+        self.assertTrue(json_response["success"])
+        self.assertIn("style", json_response["defaults_applied"])
+        self.assertEqual(json_response["data"]["flux"]["data"]["model"], "flux")
+        self.assertEqual(json_response["data"]["banana-pro"]["data"]["model"], "banana-pro")
+
+    def test_validation_error_once(self):
+        """Given invalid data When POST to /api/adapt-many Then single VALIDATION_ERROR"""
+        response = self.client.post("/api/adapt-many", json={"base_prompt": {}, "targets": ["flux"]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error_code"], "VALIDATION_ERROR")
+
+    def test_unknown_target_returns_provider_error(self):
+        """Given unknown target When POST to /api/adapt-many Then PROVIDER_ERROR"""
+        data = {
+            "base_prompt": {
+                "subject": {"description": "Valentina Ruiz"},
+                "environment": {"location": "historic piazza"},
+            },
+            "targets": ["flux", "unknown-model"],
+        }
+
+        response = self.client.post("/api/adapt-many", json=data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error_code"], "PROVIDER_ERROR")
+
+
 if __name__ == "__main__":
     unittest.main()
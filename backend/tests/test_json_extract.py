@@ -0,0 +1,94 @@
+"""
+Tests for the tolerant JSON extractor and the Gemini response_schema mode
+"""
+
+import json
+import unittest
+
+from google.generativeai.types import generation_types
+
+from backend.gemini_schema import response_schema
+from backend.json_extract import extract_json
+from backend.models import BasePrompt, ZImageTurboPrompt
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+PAYLOAD = {"subject": {"description": "Valentina, {not a brace}", "attributes": ["a, b", "c]"]}}
+
+
+class ExtractJsonTests(unittest.TestCase):
+    def test_plain_json(self):
+        self.assertEqual(extract_json(json.dumps(PAYLOAD)), PAYLOAD)
+
+    def test_fenced_with_prose(self):
+        text = f"Hier ist das JSON [wie gewünscht]:\n```json\n{json.dumps(PAYLOAD, indent=2)}\n```\nViel Erfolg!"
+        self.assertEqual(extract_json(text), PAYLOAD)
+
+    def test_trailing_commas(self):
+        text = '{"subject": {"description": "x, }", "attributes": ["a", "b",],},}'
+        self.assertEqual(extract_json(text), {"subject": {"description": "x, }", "attributes": ["a", "b"]}})
+
+    def test_escaped_quotes_in_strings(self):
+        text = 'Antwort: {"text": "sie sagt \\"hallo, }\\"",}'
+        self.assertEqual(extract_json(text), {"text": 'sie sagt "hallo, }"'})
+
+    def test_byte_order_mark(self):
+        self.assertEqual(extract_json("\ufeff{}"), {})
+
+    def test_unrepairable_replies_raise(self):
+        for text in ("Leider kann ich das nicht.", '{"subject": {"description": "x"', '{"a": 1]'):
+            with self.assertRaises(json.JSONDecodeError, msg=text):
+                extract_json(text)
+
+
+class ResponseSchemaTests(unittest.TestCase):
+    def test_schema_uses_only_the_gemini_subset(self):
+        allowed = {"type", "format", "description", "nullable", "enum", "items",
+                   "properties", "required", "min_items", "max_items"}
+
+        def walk(node):
+            self.assertLessEqual(set(node), allowed)
+            for child in (node.get("properties") or {}).values():
+                walk(child)
+            if "items" in node:
+                walk(node["items"])
+
+        for model_cls in (ZImageTurboPrompt, BasePrompt):
+            walk(response_schema(model_cls))
+
+    def test_optional_and_union_fields(self):
+        technical = response_schema(BasePrompt)["properties"]["technical"]
+        self.assertTrue(technical["nullable"])
+        self.assertEqual(technical["properties"]["resolution"]["type"], "string")
+        self.assertEqual(technical["properties"]["seed"], {"type": "integer", "description": "Seed", "nullable": True})
+
+    def test_sdk_accepts_schema(self):
+        config = {"response_mime_type": "application/json", "response_schema": response_schema(ZImageTurboPrompt)}
+        converted = generation_types.to_generation_config_dict(config)
+        self.assertIn("character", converted["response_schema"].properties)
+
+
+class StructuredOutputModeTests(unittest.IsolatedAsyncioTestCase):
+    async def test_requests_carry_schema(self):
+        generator = make_generator(json.dumps(load_fixture("valid_base_prompt")))
+        generator.structured_output = True
+
+        await generator.text_to_base_prompt_async("Valentina in Bari")
+
+        config = generator.model.configs[0]
+        self.assertEqual(config["response_mime_type"], "application/json")
+        self.assertEqual(config["response_schema"], response_schema(BasePrompt))
+        self.assertEqual(config["temperature"], generator.TEXT_TO_BASE_CONFIG["temperature"])
+
+    async def test_legacy_mode_parses_fenced_reply(self):
+        reply = "Gern!\n```json\n" + json.dumps(load_fixture("valid_prompt"))[:-1] + ",}\n```"
+        generator = make_generator(reply)
+        generator.structured_output = False
+
+        result = await generator.text_to_json_async("Valentina in Bari")
+
+        self.assertIsInstance(result, ZImageTurboPrompt)
+        self.assertNotIn("response_schema", generator.model.configs[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for the pipelined two-stage prompt executor
+"""
+
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.cache import ResponseCache
+from backend.errors import EmptyInputError
+from backend.models import ZImageTurboPrompt
+from backend.pipeline import PipelineItem, PromptPipeline
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+PROMPT_TEXT = "Valentina Ruiz stands at an outdoor café table in the historic piazza of Bari."
+
+
+def make_pipeline_generator(latency: float = 0.0):
+    structure = json.dumps(load_fixture("valid_prompt"))
+    log = []
+
+    def reply(contents):
+        stage = 2 if "STRUKTURIERTES JSON" in contents else 1
+        log.append((stage, time.perf_counter()))
+        return PROMPT_TEXT if stage == 2 else structure
+
+    return make_generator(reply, latency=latency), log
+
+
+class PromptPipelineTests(unittest.IsolatedAsyncioTestCase):
+    async def test_stages_overlap_within_their_limits(self):
+        generator, log = make_pipeline_generator(latency=0.02)
+        pipeline = PromptPipeline(stage1_concurrency=2, stage2_concurrency=1)
+        items = [PipelineItem(text=f"Szene {i}") for i in range(6)]
+
+        started = time.perf_counter()
+        results = await pipeline.run(generator, items)
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(r.full_prompt_text == PROMPT_TEXT for r in results))
+        first_stage_two = min(t for stage, t in log if stage == 2)
+        last_stage_one = max(t for stage, t in log if stage == 1)
+        self.assertLess(first_stage_two, last_stage_one)
+        # Serial would be 12 calls x 20 ms; stage two (limit 1) bounds the pipeline
+        self.assertLess(elapsed, 0.2)
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["stage1"]["max_in_flight"], 2)
+        self.assertEqual(stats["stage2"]["max_in_flight"], 1)
+        self.assertGreater(stats["stage2"]["max_queued"], 0)
+        self.assertEqual(stats["stage2"]["latency"]["count"], 6)
+
+    async def test_stage_one_skipped_for_supplied_and_cached_prompts(self):
+        generator, log = make_pipeline_generator()
+        generator.cache = ResponseCache()
+        await generator.text_to_json_async("Szene im Cache")
+        log.clear()
+        supplied = ZImageTurboPrompt(**load_fixture("valid_prompt"))
+        pipeline = PromptPipeline()
+
+        results = await pipeline.run(generator, [PipelineItem(prompt_json=supplied), PipelineItem("Szene im Cache")])
+
+        self.assertEqual(results[0].json_structure, supplied)
+        self.assertEqual(results[1].full_prompt_text, PROMPT_TEXT)
+        self.assertNotIn(1, [stage for stage, _ in log])
+        self.assertEqual(pipeline.stats()["stage1_skipped"], {"supplied": 1, "cached": 1})
+
+    async def test_uncached_item_costs_one_cache_lookup(self):
+        generator, _ = make_pipeline_generator()
+        generator.cache = ResponseCache()
+
+        await PromptPipeline().run(generator, [PipelineItem("Neue Szene")])
+
+        stats = generator.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (0, 1))
+
+    async def test_failures_stay_per_item_and_in_order(self):
+        generator, _ = make_pipeline_generator()
+        pipeline = PromptPipeline()
+
+        results = await pipeline.run(generator, [PipelineItem("Szene"), PipelineItem("   "), PipelineItem("Szene 2")])
+
+        self.assertIsInstance(results[1], EmptyInputError)
+        self.assertEqual([type(r).__name__ for r in (results[0], results[2])], ["PromptAssemblyOutput"] * 2)
+
+
+class PromptBatchEndpointTests(unittest.TestCase):
+    def test_batch_endpoint_and_metrics(self):
+        generator, log = make_pipeline_generator()
+        supplied = load_fixture("valid_prompt")
+        supplied["character"]["clothing"] = "olive linen shirt"  # not coalesced with item 0
+        with patch.object(main, "generator", generator), patch.object(main, "prompt_pipeline", PromptPipeline()):
+            client = TestClient(main.app)
+            response = client.post("/api/text-to-prompt/batch", json={"items": [
+                {"text": "Valentina in Bari"},
+                {"json_structure": supplied},
+                {"text": ""},
+            ]})
+            metrics = client.get("/api/metrics").json()
+
+        body = response.json()
+        self.assertEqual((body["total"], body["succeeded"], body["failed"]), (3, 2, 1))
+        self.assertEqual(body["results"][0]["data"]["prompt_text"], PROMPT_TEXT)
+        self.assertEqual(body["results"][2]["error"]["details"][0]["field_path"], "items.2")
+        self.assertEqual([stage for stage, _ in log], [1, 2, 2])
+        self.assertEqual(metrics["pipeline"]["stage1_skipped"]["supplied"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
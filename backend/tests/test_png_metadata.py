@@ -0,0 +1,187 @@
+"""
+Tests for the PNG text-chunk reader and A1111/ComfyUI metadata parsing
+"""
+
+import io
+import json
+import struct
+import unittest
+import zlib
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from backend import main
+from backend.png_metadata import extract_png_metadata, parse_a1111_parameters, read_png_info
+
+A1111_PARAMETERS = (
+    "Valentina Ruiz, navy linen blazer, in a historic piazza in Bari\n"
+    "Negative prompt: blurry, lowres\n"
+    'Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 6.5, Seed: 3843118390, Size: 832x1216, '
+    'Model: juggernautXL, Lora hashes: "film_grain: 1a2b, skin: 3c4d"'
+)
+
+COMFY_PROMPT = {
+    "3": {"class_type": "KSampler", "inputs": {
+        "seed": 42, "steps": 25, "cfg": 5.0, "sampler_name": "euler_ancestral", "scheduler": "normal",
+        "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0], "model": ["4", 0],
+    }},
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sdxl.safetensors"}},
+    "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 1024, "height": 1024, "batch_size": 1}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": ["10", 0], "clip": ["4", 1]}},
+    "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "blurry", "clip": ["4", 1]}},
+    "10": {"class_type": "PrimitiveString", "inputs": {"value": "Valentina Ruiz at the harbour in Bari"}},
+}
+
+COMFY_WORKFLOW = {
+    "nodes": [
+        {"id": 3, "type": "KSampler", "widgets_values": [7, "fixed", 20, 4.5, "dpmpp_2m", "karras", 1.0],
+         "inputs": [{"name": "positive", "link": 1}, {"name": "negative", "link": 2}, {"name": "latent_image", "link": 3}]},
+        {"id": 6, "type": "CLIPTextEncode", "widgets_values": ["Valentina Ruiz in Bari"], "inputs": []},
+        {"id": 7, "type": "CLIPTextEncode", "widgets_values": ["lowres"], "inputs": []},
+        {"id": 5, "type": "EmptyLatentImage", "widgets_values": [896, 1152, 1], "inputs": []},
+    ],
+    "links": [[1, 6, 0, 3, 0, "CONDITIONING"], [2, 7, 0, 3, 1, "CONDITIONING"], [3, 5, 0, 3, 3, "LATENT"]],
+}
+
+
+def make_png(info: PngInfo = None, size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (120, 90, 60)).save(buffer, format="PNG", pnginfo=info)
+    return buffer.getvalue()
+
+
+def png_with(**text) -> bytes:
+    info = PngInfo()
+    for key, value in text.items():
+        info.add_text(key, value)
+    return make_png(info)
+
+
+def chunk(chunk_type: bytes, body: bytes, crc: int = None) -> bytes:
+    crc = zlib.crc32(chunk_type + body) if crc is None else crc
+    return struct.pack(">I", len(body)) + chunk_type + body + struct.pack(">I", crc)
+
+
+class CountingFile(io.BytesIO):
+    """Records how many bytes were actually read."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class ChunkReaderTests(unittest.TestCase):
+    def test_text_chunk_variants(self):
+        info = PngInfo()
+        info.add_text("plain", "a")
+        info.add_text("compressed", "b" * 500, zip=True)
+        info.add_itxt("international", "Medellín", zip=True)
+        result = read_png_info(make_png(info, size=(64, 48)))
+        self.assertEqual((result.width, result.height), (64, 48))
+        self.assertEqual(result.text, {"plain": "a", "compressed": "b" * 500, "international": "Medellín"})
+
+    def test_pixel_data_is_not_read(self):
+        header = make_png(PngInfo())[:33]  # signature + IHDR
+        data = (
+            header
+            + chunk(b"tEXt", b"parameters\0" + A1111_PARAMETERS.encode())
+            + chunk(b"IDAT", bytes(2_000_000))
+            + chunk(b"tEXt", b"late\0after the image data")
+            + chunk(b"IEND", b"")
+        )
+        source = CountingFile(data)
+        info = read_png_info(source)
+        self.assertIn("parameters", info.text)
+        self.assertNotIn("late", info.text)
+        self.assertLess(source.bytes_read, 1024)
+
+        self.assertIn("late", read_png_info(memoryview(data), stop_at_idat=False).text)
+
+    def test_corrupt_chunk_is_skipped(self):
+        header = make_png(PngInfo())[:33]
+        data = header + chunk(b"tEXt", b"parameters\0x", crc=0) + chunk(b"IEND", b"")
+        self.assertEqual(read_png_info(data).text, {})
+
+    def test_not_a_png(self):
+        with self.assertRaises(ValueError):
+            read_png_info(b"\xff\xd8\xff\xe0 jpeg")
+
+
+class A1111ParsingTests(unittest.TestCase):
+    def test_parameters(self):
+        meta = parse_a1111_parameters(A1111_PARAMETERS)
+        self.assertEqual(meta["prompt"], "Valentina Ruiz, navy linen blazer, in a historic piazza in Bari")
+        self.assertEqual(meta["negativePrompt"], "blurry, lowres")
+        self.assertEqual(meta["sampler"], "DPM++ 2M Karras")
+        self.assertEqual(meta["Size"], "832x1216")
+        self.assertEqual(meta["Lora hashes"], "film_grain: 1a2b, skin: 3c4d")
+
+    def test_prompt_only(self):
+        self.assertEqual(parse_a1111_parameters("Valentina Ruiz\nin Bari"), {"prompt": "Valentina Ruiz\nin Bari"})
+
+    def test_png_to_meta(self):
+        metadata = extract_png_metadata(png_with(parameters=A1111_PARAMETERS))
+        self.assertEqual(metadata.generator, "a1111")
+        self.assertEqual(metadata.meta["seed"], "3843118390")
+
+
+class ComfyUIParsingTests(unittest.TestCase):
+    def test_api_graph(self):
+        metadata = extract_png_metadata(png_with(prompt=json.dumps(COMFY_PROMPT), workflow="{}"))
+        self.assertEqual(metadata.generator, "comfyui")
+        self.assertEqual(metadata.meta, {
+            "prompt": "Valentina Ruiz at the harbour in Bari",
+            "negativePrompt": "blurry",
+            "seed": 42,
+            "steps": 25,
+            "cfgScale": 5.0,
+            "sampler": "euler_ancestral",
+            "scheduler": "normal",
+            "Size": "1024x1024",
+        })
+
+    def test_workflow_fallback(self):
+        metadata = extract_png_metadata(png_with(workflow=json.dumps(COMFY_WORKFLOW)))
+        self.assertEqual(metadata.meta["prompt"], "Valentina Ruiz in Bari")
+        self.assertEqual(metadata.meta["negativePrompt"], "lowres")
+        self.assertEqual((metadata.meta["seed"], metadata.meta["steps"]), (7, 20))
+        self.assertEqual(metadata.meta["Size"], "896x1152")
+
+    def test_plain_png_has_no_metadata(self):
+        self.assertIsNone(extract_png_metadata(make_png()))
+        self.assertIsNone(extract_png_metadata(png_with(prompt="not json")))
+
+
+class PngImportEndpointTests(unittest.TestCase):
+    def _upload(self, data: bytes, **params):
+        with patch.object(main, "generator", None):
+            client = TestClient(main.app)
+            return client.post("/api/import/comfy-png", params=params, files={"file": ("render.png", data, "image/png")})
+
+    def test_fast_import_without_generator(self):
+        response = self._upload(png_with(parameters=A1111_PARAMETERS))
+        self.assertEqual(response.status_code, 200, response.text)
+        body = response.json()
+        self.assertEqual(body["generator"], "a1111")
+        self.assertEqual(body["base_prompt"]["technical"]["sampler"], "dpmpp_2m")
+        self.assertEqual(body["base_prompt"]["technical"]["seed"], 3843118390)
+        self.assertEqual(body["base_prompt"]["environment"]["location"], "in a historic piazza in Bari")
+        self.assertEqual(body["missing_fields"], ["technical.guidance"])
+
+    def test_rejections(self):
+        self.assertEqual(self._upload(b"GIF89a").status_code, 415)
+        self.assertEqual(self._upload(make_png()).status_code, 422)
+        self.assertEqual(self._upload(make_png(), mode="turbo").status_code, 400)
+        self.assertEqual(self._upload(make_png(), mode="base").status_code, 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
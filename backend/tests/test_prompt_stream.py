@@ -0,0 +1,113 @@
+"""
+Tests for the SSE text-to-prompt stream
+"""
+
+import json
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.rewrite import DEFAULT_REPLACEMENTS, ForbiddenWordRewriter
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+CLEAN_TEXT = (
+    "Valentina Ruiz stands at an outdoor café table in the historic piazza of Bari, "
+    "one hand holding an espresso cup while golden hour sun falls across the baroque facade. "
+) * 6
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def make_stream_generator(prompt_text: str, regenerated_text: str = CLEAN_TEXT):
+    structure = json.dumps(load_fixture("valid_prompt"))
+
+    def reply(contents):
+        if "VERMEIDE UNBEDINGT" in contents:
+            return regenerated_text
+        if "STRUKTURIERTES JSON" in contents:
+            return prompt_text
+        return structure
+
+    generator = make_generator(reply)
+    generator.model.chunk_size = 16
+    return generator
+
+
+class StreamFullPromptTests(unittest.IsolatedAsyncioTestCase):
+    async def _events(self, generator):
+        return [event async for event in generator.stream_full_prompt_async("Valentina in Bari")]
+
+    async def test_json_first_then_chunks_then_done(self):
+        generator = make_stream_generator("A stunning shot. " + CLEAN_TEXT)
+
+        events = await self._events(generator)
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "json")
+        self.assertEqual(events[0][1]["json_structure"]["character"]["identity"]["name"], "Valentina Ruiz")
+        self.assertEqual(names[-1], "done")
+        self.assertIn("forbidden", names)
+        self.assertEqual("".join(p["text"] for n, p in events if n == "chunk"), "A stunning shot. " + CLEAN_TEXT)
+
+        done = events[-1][1]
+        self.assertTrue(done["validation_passed"])
+        self.assertEqual(done["rewritten_words"], ["stunning"])
+        self.assertFalse(done["regenerated"])
+        self.assertNotIn("stunning", done["prompt_text"])
+        metrics = generator.metrics()["streaming"]
+        self.assertEqual((metrics["ttfb"]["count"], metrics["first_text"]["count"]), (1, 1))
+
+    async def test_unfixable_word_aborts_stream_early(self):
+        generator = make_stream_generator("A cartoon mood. " + CLEAN_TEXT * 4)
+        table = {word: text for word, text in DEFAULT_REPLACEMENTS.items() if word != "cartoon"}
+        generator.rewriter = ForbiddenWordRewriter(table)
+
+        events = await self._events(generator)
+
+        names = [name for name, _ in events]
+        restart = names.index("restart")
+        self.assertEqual(events[restart][1], {"words": ["cartoon"]})
+        self.assertEqual(events[restart - 1], ("forbidden", {"word": "cartoon", "start": 2, "end": 9, "local_fix": False}))
+        done = events[-1][1]
+        self.assertTrue(done["regenerated"])
+        self.assertEqual(done["prompt_text"], CLEAN_TEXT)
+        # The first stream was abandoned after a few chunks, not read to the end
+        regenerated_chunks = -(-len(CLEAN_TEXT) // 16)
+        self.assertLessEqual(generator.model.chunks_read - regenerated_chunks, 3)
+        self.assertEqual(generator.metrics()["streaming"]["early_regenerations"], 1)
+        self.assertEqual(generator.rewriter.regenerations, 1)
+
+
+class StreamEndpointTests(unittest.TestCase):
+    def test_sse_response(self):
+        generator = make_stream_generator(CLEAN_TEXT)
+        with patch.object(main, "generator", generator):
+            response = TestClient(main.app).post("/api/text-to-prompt/stream", json={"text": "Valentina in Bari"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = parse_sse(response.text)
+        self.assertEqual(events[0][0], "json")
+        self.assertEqual(events[-1][0], "done")
+        self.assertIsNotNone(events[0][1]["ttfb_ms"])
+
+    def test_stage_one_failure_becomes_error_event(self):
+        generator = make_generator("kein json")
+        with patch.object(main, "generator", generator):
+            response = TestClient(main.app).post("/api/text-to-prompt/stream", json={"text": "Valentina in Bari"})
+
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["error"])
+        self.assertEqual(events[0][1]["error_code"], "PROVIDER_ERROR")
+
+
+if __name__ == "__main__":
+    unittest.main()
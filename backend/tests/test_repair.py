@@ -0,0 +1,105 @@
+"""
+Tests for the schema repair stage (enum snapping + follow-up call)
+"""
+
+import json
+import unittest
+
+from pydantic import ValidationError
+
+from backend.errors import SchemaValidationError
+from backend.models import LightingType, SkinTone, ZImageTurboPrompt
+from backend.repair import SchemaRepairer, field_annotation, snap_enum_value
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+def broken_prompt(**overrides) -> dict:
+    data = load_fixture("valid_prompt")
+    descriptors = data["character"]["physical_descriptors"]
+    descriptors["skin_tone"] = overrides.get("skin_tone", "medium skin tone, olive undertones")
+    data["scene"]["lighting"] = overrides.get("lighting", "GOLDEN_HOUR")
+    if "age" in overrides:
+        data["character"]["identity"]["age"] = overrides["age"]
+    return data
+
+
+class SnapTests(unittest.TestCase):
+    def test_snap_values_and_member_names(self):
+        self.assertEqual(snap_enum_value("medium skin tone, olive undertones", SkinTone), SkinTone.MEDIUM_OLIVE.value)
+        self.assertEqual(snap_enum_value("MEDIUM_OLIVE", SkinTone), SkinTone.MEDIUM_OLIVE.value)
+        self.assertEqual(snap_enum_value("golden-hour sun", LightingType), LightingType.GOLDEN_HOUR.value)
+        self.assertIsNone(snap_enum_value("cinematic lighting", LightingType))
+        self.assertIsNone(snap_enum_value("light skin", SkinTone))  # ambiguous
+        self.assertIsNone(snap_enum_value(42, LightingType))
+
+    def test_field_annotation_follows_nested_models(self):
+        self.assertIs(field_annotation(ZImageTurboPrompt, ("character", "physical_descriptors", "skin_tone")), SkinTone)
+        self.assertIs(field_annotation(ZImageTurboPrompt, ("scene", "lighting")), LightingType)
+        self.assertIsNone(field_annotation(ZImageTurboPrompt, ("scene", "unknown")))
+
+    def test_snap_repairs_without_llm(self):
+        repairer = SchemaRepairer()
+        data = broken_prompt()
+        with self.assertRaises(ValidationError) as ctx:
+            ZImageTurboPrompt(**data)
+
+        attempt = repairer.snap(ZImageTurboPrompt, data, ctx.exception)
+
+        self.assertEqual(attempt.result.scene.lighting, LightingType.GOLDEN_HOUR)
+        self.assertEqual(attempt.result.character.physical_descriptors.skin_tone, SkinTone.MEDIUM_OLIVE)
+        self.assertEqual(data["scene"]["lighting"], "GOLDEN_HOUR")  # input untouched
+
+
+class GeneratorRepairTests(unittest.IsolatedAsyncioTestCase):
+    async def test_enum_errors_are_snapped_locally(self):
+        generator = make_generator(json.dumps(broken_prompt()))
+
+        result = await generator.text_to_json_async("Valentina in Bari")
+
+        self.assertEqual(result.scene.lighting, LightingType.GOLDEN_HOUR)
+        self.assertEqual(len(generator.model.calls), 1)
+        stats = generator.metrics()["schema_repair"]
+        self.assertEqual((stats["snapped"], stats["repair_rate"]), (1, 1.0))
+        self.assertGreater(stats["tokens_saved"], 0)
+
+    async def test_remaining_errors_go_to_a_small_followup(self):
+        original = json.dumps(broken_prompt(lighting="moonlight", age=300))
+
+        def reply(contents):
+            if "USER INPUT" in contents:
+                return original
+            return '{"scene.lighting": "soft daylight", "character.identity.age": 30}'
+
+        generator = make_generator(reply)
+        result = generator.text_to_json("Valentina in Bari")
+
+        self.assertEqual((result.scene.lighting, result.character.identity.age), (LightingType.SOFT_DAYLIGHT, 30))
+        followup = generator.model.calls[1]
+        self.assertIn("scene.lighting", followup)
+        self.assertIn('"golden hour sun"', followup)  # allowed values listed
+        self.assertNotIn("Caffè Bari", followup)  # valid fields stay out of the request
+        self.assertEqual(generator.model.configs[1]["response_mime_type"], "application/json")
+        stats = generator.metrics()["schema_repair"]
+        self.assertEqual(stats["followup_repaired"], 1)
+        self.assertLess(stats["followup_tokens"], stats["tokens_saved"])
+
+    async def test_useless_followup_keeps_original_error(self):
+        generator = make_generator(lambda contents: json.dumps(broken_prompt(lighting="moonlight")))
+
+        with self.assertRaises(SchemaValidationError) as ctx:
+            await generator.text_to_json_async("Valentina in Bari")
+
+        self.assertEqual([e["loc"] for e in ctx.exception.errors], [("scene", "lighting")])
+        self.assertEqual(generator.metrics()["schema_repair"]["failed"], 1)
+
+    async def test_followup_can_be_disabled(self):
+        generator = make_generator(json.dumps(broken_prompt(lighting="moonlight")))
+        generator.repairer = SchemaRepairer(llm_followup=False)
+
+        with self.assertRaises(SchemaValidationError):
+            await generator.text_to_json_async("Valentina in Bari")
+        self.assertEqual(len(generator.model.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests for the local forbidden-word rewrite stage
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from backend.models import ZImageTurboPrompt
+from backend.rewrite import (
+    DEFAULT_REPLACEMENTS,
+    ForbiddenWordRewriter,
+    load_replacement_table,
+    rewrite_forbidden_words,
+)
+from backend.tests.fake_gemini import load_fixture, make_generator
+
+
+class RewriteForbiddenWordsTests(unittest.TestCase):
+    def test_clean_text_is_untouched(self):
+        text = "Valentina Ruiz, a German designer, sits in the piazza."
+        result = rewrite_forbidden_words(text, "Valentina Ruiz")
+        self.assertEqual(result.text, text)
+        self.assertEqual(result.replaced, [])
+        self.assertTrue(result.resolved)
+
+    def test_removes_quality_markers_and_tidies_punctuation(self):
+        result = rewrite_forbidden_words("Warm light on stone, masterpiece, 8k.")
+        self.assertEqual(result.text, "Warm light on stone.")
+        self.assertEqual([m.word for m in result.replaced], ["masterpiece", "8k"])
+
+    def test_removal_at_sentence_start_recapitalizes(self):
+        result = rewrite_forbidden_words("Stunning, warm light falls. She is pretty, calm.")
+        self.assertEqual(result.text, "Warm light falls. She is calm.")
+
+    def test_generic_subject_becomes_name_and_absorbs_article(self):
+        result = rewrite_forbidden_words(
+            "The beautiful woman holds a cup; the woman smiles.", "Valentina Ruiz"
+        )
+        self.assertEqual(result.text, "Valentina Ruiz holds a cup; Valentina smiles.")
+        self.assertTrue(result.resolved)
+
+    def test_two_generic_subjects_stay_unresolved(self):
+        text = "The woman walks. The man waits."
+        result = rewrite_forbidden_words(text, "Valentina Ruiz")
+        self.assertEqual(result.text, text)
+        self.assertEqual([m.word for m in result.unresolved], ["woman", "man"])
+
+    def test_generic_word_outside_subject_stays_unresolved(self):
+        result = rewrite_forbidden_words("Stunning light. She is a person of note.", "Valentina Ruiz")
+        self.assertEqual(result.text, "Light. She is a person of note.")
+        self.assertEqual([m.word for m in result.unresolved], ["person"])
+
+    def test_two_person_scene_is_regenerated(self):
+        generator = make_generator(
+            lambda contents: "Valentina Ruiz waits." if "VERMEIDE" in contents else "The woman walks. The man waits."
+        )
+
+        output = generator.json_to_prompt_text(ZImageTurboPrompt(**load_fixture("valid_prompt")))
+
+        self.assertEqual(output.full_prompt_text, "Valentina Ruiz waits.")
+        self.assertEqual(len(generator.model.calls), 2)
+        self.assertEqual(generator.metrics()["rewrite"]["regenerations"], 1)
+
+    def test_spans_refer_to_input(self):
+        text = "A man waits"
+        result = rewrite_forbidden_words(text, "Marco Bianchi")
+        span = result.replaced[0]
+        self.assertEqual(text[span.start:span.end], "A man")
+        self.assertEqual(result.text, "Marco Bianchi waits")
+
+    def test_name_placeholder_without_name_stays_unresolved(self):
+        result = rewrite_forbidden_words("a woman sits")
+        self.assertFalse(result.resolved)
+        self.assertEqual([m.word for m in result.unresolved], ["a woman"])
+
+    def test_word_without_table_entry_stays_unresolved(self):
+        table = dict(DEFAULT_REPLACEMENTS)
+        del table["cartoon"]
+        result = rewrite_forbidden_words("cartoon, stunning colours", replacements=table)
+        self.assertEqual(result.text, "cartoon, colours")
+        self.assertEqual([m.word for m in result.unresolved], ["cartoon"])
+
+
+class ReplacementTableTests(unittest.TestCase):
+    def _write(self, payload) -> str:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_overrides_merge_over_defaults(self):
+        table = load_replacement_table(self._write({"Cartoon": "photograph", "8k": None}))
+        self.assertEqual(table["cartoon"], "photograph")
+        self.assertNotIn("8k", table)
+        self.assertEqual(table["stunning"], "")
+
+    def test_rejects_unknown_words(self):
+        with self.assertRaises(ValueError):
+            load_replacement_table(self._write({"sunset": ""}))
+
+    def test_from_env_falls_back_on_invalid_table(self):
+        with patch.dict(os.environ, {"PROMPT_REWRITE_TABLE": self._write(["not", "a", "dict"])}):
+            rewriter = ForbiddenWordRewriter.from_env()
+        self.assertEqual(rewriter.replacements, DEFAULT_REPLACEMENTS)
+
+
+class GeneratorRewriteTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.prompt_json = ZImageTurboPrompt(**load_fixture("valid_prompt"))
+
+    async def test_local_rewrite_avoids_regeneration(self):
+        generator = make_generator("A stunning woman stands in the piazza, masterpiece.")
+
+        output = await generator.json_to_prompt_text_async(self.prompt_json)
+
+        self.assertEqual(output.full_prompt_text, "Valentina Ruiz stands in the piazza.")
+        self.assertTrue(output.forbidden_words_check)
+        self.assertEqual(output.rewritten_words, ["stunning", "woman", "masterpiece"])
+        self.assertEqual(len(generator.model.calls), 1)
+        self.assertEqual(generator.metrics()["rewrite"]["regenerations_avoided"], 1)
+
+    async def test_unresolvable_text_is_regenerated_once(self):
+        table = dict(DEFAULT_REPLACEMENTS)
+        del table["cartoon"]
+        generator = make_generator(
+            lambda contents: "Valentina Ruiz in the piazza." if "VERMEIDE" in contents else "A cartoon piazza."
+        )
+        generator.rewriter = ForbiddenWordRewriter(table)
+
+        output = await generator.json_to_prompt_text_async(self.prompt_json)
+
+        self.assertEqual(output.full_prompt_text, "Valentina Ruiz in the piazza.")
+        self.assertEqual(len(generator.model.calls), 2)
+        self.assertIn("cartoon", generator.model.calls[1])
+        stats = generator.metrics()["rewrite"]
+        self.assertEqual((stats["regenerations"], stats["regenerations_avoided"]), (1, 0))
+
+    def test_sync_path_rewrites_too(self):
+        generator = make_generator("The gorgeous man smiles in the light.")
+
+        output = generator.json_to_prompt_text(self.prompt_json)
+
+        self.assertEqual(output.full_prompt_text, "Valentina Ruiz smiles in the light.")
+        self.assertEqual(len(generator.model.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,308 @@
+"""
+Tests for incremental story rendering (GlobalAssets dependency tracking)
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event, insert, select
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.db_models import Prompt
+from backend.models import GlobalAssets, Story, ZImageTurboPrompt
+from backend.pipeline import PromptPipeline
+from backend.story import StoryEngine, StoryPromptStore, apply_global_assets
+from backend.tests.fake_gemini import load_fixture, make_generator
+from backend.tests.test_prompt_stream import parse_sse
+
+ACTIONS = (
+    "Standing at outdoor café table, one hand holding espresso cup",
+    "Walking across the piazza with a paper map",
+    "Sitting on the church steps, reading a postcard",
+)
+
+
+def make_story(**assets) -> Story:
+    prompts = []
+    for number, action in enumerate(ACTIONS, start=1):
+        data = load_fixture("valid_prompt")
+        data["action"]["action"] = action
+        data["sequence_number"] = number
+        prompts.append(ZImageTurboPrompt(**data))
+    return Story(id="story-1", title="Ein Tag in Bari", prompts=prompts, global_assets=GlobalAssets(**assets))
+
+
+def make_story_generator():
+    state = {"error": None}
+
+    def reply(contents):
+        if state["error"] is not None:
+            return state["error"]
+        for action in ACTIONS:
+            if action in contents:
+                return f"Valentina Ruiz: {action}."
+        return "Valentina Ruiz in Bari."
+
+    return make_generator(reply), state
+
+
+def render_calls(generator) -> int:
+    return sum(1 for contents in generator.model.calls if "STRUKTURIERTES JSON" in contents)
+
+
+class GlobalAssetTests(unittest.TestCase):
+    def test_assets_fold_into_the_scene(self):
+        prompt = make_story().prompts[0]
+        assets = GlobalAssets(style_preset="analog film", color_grading="teal and orange", overall_atmosphere_override="quiet Sunday morning")
+
+        effective, depends_on = apply_global_assets(prompt, assets)
+
+        self.assertEqual(effective.scene.atmosphere, "quiet Sunday morning")
+        self.assertEqual(
+            effective.scene.technical_specs,
+            "Shot on Fujifilm X-T4, natural color rendering, analog film style, teal and orange color grading",
+        )
+        self.assertEqual(set(depends_on), {
+            "global_assets.style_preset", "global_assets.color_grading", "global_assets.overall_atmosphere_override",
+        })
+        self.assertIsNone(effective.sequence_number)
+
+    def test_color_grading_suffix(self):
+        prompt = make_story().prompts[0]
+        for grading, expected in (
+            ("upgrade-free teal", "upgrade-free teal color grading"),
+            ("warm film grading", "warm film grading"),
+        ):
+            effective, _ = apply_global_assets(prompt, GlobalAssets(color_grading=grading))
+            self.assertTrue(effective.scene.technical_specs.endswith(", " + expected), msg=grading)
+
+    def test_default_assets_leave_the_scene_alone(self):
+        prompt = make_story().prompts[0]
+
+        effective, depends_on = apply_global_assets(prompt, GlobalAssets())
+
+        self.assertEqual(effective.scene, prompt.scene)
+        self.assertEqual(depends_on, {})
+
+
+class StoryEngineTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.generator, self.state = make_story_generator()
+        self.engine = StoryEngine(PromptPipeline())
+
+    async def render(self, story: Story):
+        before = render_calls(self.generator)
+        result = await self.engine.render(self.generator, story)
+        return result, render_calls(self.generator) - before
+
+    async def test_only_changed_scenes_are_regenerated(self):
+        story = make_story()
+        result, calls = await self.render(story)
+        self.assertEqual((calls, result.regenerated, result.skipped), (3, 3, 0))
+
+        result, calls = await self.render(story)
+        self.assertEqual((calls, result.skipped), (0, 3))
+
+        story.prompts[1].action.pose_details = "map folded under one arm"
+        result, calls = await self.render(story)
+        self.assertEqual(calls, 1)
+        self.assertEqual([scene.reused for scene in result.scenes], [True, False, True])
+
+    async def test_global_asset_changes(self):
+        await self.render(make_story())
+
+        result, calls = await self.render(make_story(color_grading="teal and orange"))
+        self.assertEqual((calls, result.regenerated), (3, 3))
+        self.assertEqual(result.scenes[0].depends_on, {"global_assets.color_grading": "teal and orange"})
+
+        # Override equal to what every scene already says: effective inputs unchanged
+        same = load_fixture("valid_prompt")["scene"]["atmosphere"]
+        result, calls = await self.render(make_story(color_grading="teal and orange", overall_atmosphere_override=same))
+        self.assertEqual((calls, result.skipped), (0, 3))
+
+    async def test_identical_scenes_count_as_skipped(self):
+        story = make_story()
+        for prompt in story.prompts:
+            prompt.action.action = ACTIONS[0]
+
+        result, calls = await self.render(story)
+
+        self.assertEqual((calls, result.regenerated, result.skipped), (1, 1, 2))
+        self.assertEqual([s.reused for s in result.scenes], [False, True, True])
+        self.assertEqual(self.engine.stats()["skip_rate"], round(2 / 3, 3))
+
+    async def test_system_prompt_change_invalidates_stored_scenes(self):
+        await self.render(make_story())
+
+        with patch("backend.gemini_integration.get_system_prompt", return_value="Neuer System-Prompt"):
+            result, calls = await self.render(make_story())
+
+        self.assertEqual((calls, result.skipped), (3, 0))
+
+    async def test_metadata_changes_reuse_outputs(self):
+        story = make_story()
+        await self.render(story)
+        story.prompts.reverse()
+        for number, prompt in enumerate(story.prompts, start=1):
+            prompt.sequence_number = number
+
+        result, calls = await self.render(story)
+
+        self.assertEqual(calls, 0)
+        self.assertEqual([s.output.json_structure.sequence_number for s in result.scenes], [1, 2, 3])
+        self.assertEqual(result.scenes[0].output.full_prompt_text, f"Valentina Ruiz: {ACTIONS[2]}.")
+
+    async def test_failed_scenes_are_not_stored(self):
+        self.state["error"] = RuntimeError("quota")
+        result, _ = await self.render(make_story())
+        self.assertEqual(result.failed, 3)
+
+        self.state["error"] = None
+        result, calls = await self.render(make_story())
+        self.assertEqual((calls, result.regenerated), (3, 3))
+        self.assertEqual(self.engine.stats()["failed"], 3)
+
+
+def track_renders(generator, delays):
+    """Wrap the JSON->text call: per-action delay, records peak concurrency and finish order."""
+    original = generator.json_to_prompt_text_async
+    state = {"in_flight": 0, "peak": 0, "finished": []}
+
+    async def render(prompt_json):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep(delays.get(prompt_json.action.action, 0.0))
+            return await original(prompt_json)
+        finally:
+            state["in_flight"] -= 1
+            state["finished"].append(prompt_json.action.action)
+
+    generator.json_to_prompt_text_async = render
+    return state
+
+
+class ParallelStoryRenderTests(unittest.IsolatedAsyncioTestCase):
+    async def test_results_follow_sequence_numbers(self):
+        generator, _ = make_story_generator()
+        # Last scene finishes first
+        tracked = track_renders(generator, {ACTIONS[0]: 0.03, ACTIONS[1]: 0.02, ACTIONS[2]: 0.0})
+        story = make_story()
+        story.prompts.reverse()
+
+        result = await StoryEngine(PromptPipeline()).render(generator, story)
+
+        self.assertEqual(tracked["finished"], list(ACTIONS[::-1]))
+        self.assertEqual([s.sequence_number for s in result.scenes], [1, 2, 3])
+        self.assertEqual([s.index for s in result.scenes], [2, 1, 0])
+        self.assertEqual(tracked["peak"], 3)
+
+    async def test_stream_yields_as_scenes_finish(self):
+        generator, _ = make_story_generator()
+        track_renders(generator, {ACTIONS[0]: 0.03, ACTIONS[1]: 0.0, ACTIONS[2]: 0.01})
+        engine = StoryEngine(PromptPipeline())
+
+        unordered = [s.sequence_number async for s in engine.render_stream(generator, make_story(color_grading="warm"))]
+        story = make_story(color_grading="cold")
+        ordered = [s.sequence_number async for s in engine.render_stream(generator, story, ordered=True)]
+
+        self.assertEqual(unordered, [2, 3, 1])
+        self.assertEqual(ordered, [1, 2, 3])
+
+    async def test_budget_is_shared_between_stories(self):
+        generator, _ = make_story_generator()
+        tracked = track_renders(generator, dict.fromkeys(ACTIONS, 0.01))
+        engine = StoryEngine(PromptPipeline(stage2_concurrency=8), concurrency=2)
+
+        results = await asyncio.gather(
+            engine.render(generator, make_story(color_grading="warm")),
+            engine.render(generator, make_story(color_grading="cold")),
+        )
+
+        self.assertEqual([r.regenerated for r in results], [3, 3])
+        self.assertEqual(tracked["peak"], 2)
+
+
+class StoryPromptStoreTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.store = StoryPromptStore(f"sqlite:///{self.path}")
+        Prompt.__table__.create(self.store.engine)
+        self.ids = [uuid.uuid4() for _ in ACTIONS]
+        with self.store.engine.begin() as connection:
+            connection.execute(insert(Prompt.__table__), [
+                {"id": prompt_id, "story_id": uuid.uuid4(), "character_id": uuid.uuid4(),
+                 "scene_id": uuid.uuid4(), "action": action}
+                for prompt_id, action in zip(self.ids, ACTIONS)
+            ])
+
+    def tearDown(self):
+        self.store.close()
+        os.remove(self.path)
+
+    def test_scenes_are_written_in_one_bulk_update(self):
+        generator, _ = make_story_generator()
+        story = make_story()
+        for prompt, prompt_id in zip(story.prompts, self.ids):
+            prompt.id = str(prompt_id)
+        story.prompts[2].id = None  # not persisted yet
+        result = asyncio.run(StoryEngine(PromptPipeline()).render(generator, story))
+        statements = []
+        event.listen(self.store.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        written = self.store.save(result.scenes)
+
+        self.assertEqual(written, 2)
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith("UPDATE prompts"))
+        table = Prompt.__table__
+        with self.store.engine.connect() as connection:
+            rows = dict(connection.execute(select(table.c.action, table.c.final_prompt_text)).all())
+        self.assertEqual(rows[ACTIONS[0]], f"Valentina Ruiz: {ACTIONS[0]}.")
+        self.assertIsNone(rows[ACTIONS[2]])
+
+
+class StoryRenderEndpointTests(unittest.TestCase):
+    def test_render_reports_skipped_scenes(self):
+        generator, _ = make_story_generator()
+        payload = make_story().model_dump()
+        with patch.object(main, "generator", generator), \
+                patch.object(main, "story_engine", StoryEngine(PromptPipeline())):
+            client = TestClient(main.app)
+            first = client.post("/api/story/render", json=payload).json()
+            payload["prompts"][2]["action"]["action"] = "Sitting on the church steps, writing a postcard"
+            second = client.post("/api/story/render", json=payload).json()
+            unknown = client.post("/api/story/render?mode=draft", json=payload)
+            metrics = client.get("/api/metrics").json()
+
+        self.assertEqual((first["regenerated"], first["skipped"]), (3, 0))
+        self.assertEqual((second["regenerated"], second["skipped"]), (1, 2))
+        self.assertEqual([r["reused"] for r in second["results"]], [True, True, False])
+        self.assertEqual(second["results"][0]["data"]["json_structure"]["sequence_number"], 1)
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(metrics["story"]["skipped"], 2)
+        self.assertEqual(second["persisted"], 0)
+
+    def test_stream_endpoint(self):
+        generator, _ = make_story_generator()
+        payload = make_story().model_dump()
+        with patch.object(main, "generator", generator), \
+                patch.object(main, "story_engine", StoryEngine(PromptPipeline())):
+            client = TestClient(main.app)
+            response = client.post("/api/story/render/stream?ordered=true", json=payload)
+
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["scene"] * 3 + ["done"])
+        self.assertEqual([data["sequence_number"] for _, data in events[:3]], [1, 2, 3])
+        self.assertEqual(events[-1][1]["regenerated"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
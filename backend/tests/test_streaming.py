@@ -0,0 +1,58 @@
+"""
+Unit tests for streaming helpers
+"""
+
+import unittest
+
+from starlette.requests import ClientDisconnect
+
+from backend.streaming import RequestStreamingResponse, iter_ndjson_lines
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def _collect(chunks, **kwargs):
+    return [item async for item in iter_ndjson_lines(chunks, **kwargs)]
+
+
+class IterNdjsonLinesTests(unittest.IsolatedAsyncioTestCase):
+    async def test_lines_split_across_chunks(self):
+        lines = await _collect(_chunks(b'{"a": 1}\n{"b"', b': 2}\n', b'{"c": 3}'))
+
+        self.assertEqual(lines, [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (3, b'{"c": 3}')])
+
+    async def test_blank_lines_are_skipped_but_counted(self):
+        lines = await _collect(_chunks(b'{"a": 1}\n\n  \n{"b": 2}\n'))
+
+        self.assertEqual(lines, [(1, b'{"a": 1}'), (4, b'{"b": 2}')])
+
+    async def test_oversized_line_is_reported_and_skipped(self):
+        lines = await _collect(_chunks(b"x" * 8, b"x" * 8, b'\n{"a": 1}\n'), max_line_bytes=10)
+
+        self.assertEqual(lines, [(1, None), (2, b'{"a": 1}')])
+
+
+class RequestStreamingResponseTests(unittest.IsolatedAsyncioTestCase):
+    async def test_os_error_during_send_becomes_client_disconnect(self):
+        async def body():
+            yield b"line\n"
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                raise OSError("connection reset")
+
+        response = RequestStreamingResponse(body(), media_type="application/x-ndjson")
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+        with self.assertRaises(ClientDisconnect):
+            await response(scope, receive, send)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Unit tests for the single-pass forbidden-word scanner
+"""
+
+import unittest
+
+from backend.models import (
+    extract_forbidden_words,
+    find_forbidden_words,
+    validate_no_forbidden_words,
+)
+from backend.wordscan import WordMatch, WordMatcher
+
+
+class WordMatcherTests(unittest.TestCase):
+    def test_reports_word_and_span(self):
+        text = "A Stunning view"
+        matches = WordMatcher(["stunning"]).find_all(text)
+        self.assertEqual(matches, [WordMatch("stunning", 2, 10)])
+        self.assertEqual(text[2:10], "Stunning")
+
+    def test_respects_word_boundaries(self):
+        matcher = WordMatcher(["man"])
+        self.assertEqual(matcher.find_all("German performance, craftsmen, manager"), [])
+        self.assertEqual([m.word for m in matcher.find_all("the man, a Man.")], ["man", "man"])
+
+    def test_prefers_longest_phrase(self):
+        matcher = WordMatcher(["man", "a man"])
+        self.assertEqual(matcher.find_all("a man waits"), [WordMatch("a man", 0, 5)])
+
+    def test_shorter_word_found_after_rejected_longer_match(self):
+        # "a man" starts inside "data" and is rejected; "man" must still be found
+        matcher = WordMatcher(["man", "a man"])
+        self.assertEqual(matcher.find_all("data man"), [WordMatch("man", 5, 8)])
+
+    def test_hyphenated_and_multiword_patterns(self):
+        matcher = WordMatcher(["award-winning", "trending on artstation"])
+        words = [m.word for m in matcher.find_all("An Award-Winning shot, trending on ArtStation")]
+        self.assertEqual(words, ["award-winning", "trending on artstation"])
+
+    def test_spans_fall_back_when_lowercasing_changes_length(self):
+        # "İ".lower() is two code points; spans must still index the original text
+        text = "İstanbul at dawn, stunning"
+        matches = WordMatcher(["stunning"]).find_all(text)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(text[matches[0].start:matches[0].end], "stunning")
+
+
+class StreamScannerTests(unittest.TestCase):
+    TEXT = "A stunning view of İstanbul, the woman at the Germa" + "n market, trending on artstation"
+
+    def test_chunked_scan_matches_full_scan(self):
+        matcher = WordMatcher(["stunning", "woman", "man", "trending on artstation"])
+        for size in (1, 3, 7, 64):
+            scanner = matcher.stream()
+            found = []
+            for i in range(0, len(self.TEXT), size):
+                found += scanner.feed(self.TEXT[i:i + size])
+            found += scanner.finish()
+            self.assertEqual(found, matcher.find_all(self.TEXT), msg=f"chunk size {size}")
+            self.assertEqual(scanner.text, self.TEXT)
+
+    def test_match_is_held_back_until_the_word_ends(self):
+        scanner = WordMatcher(["man"]).stream()
+        self.assertEqual(scanner.feed("the man"), [])  # could still become "manager"
+        self.assertEqual(scanner.feed("ager and the man"), [])
+        self.assertEqual(scanner.feed(" waits"), [WordMatch("man", 20, 23)])
+
+
+class ForbiddenWordTests(unittest.TestCase):
+    def test_clean_prompt_passes(self):
+        text = "Valentina, a German designer, at a street performance in Bari."
+        self.assertTrue(validate_no_forbidden_words(text))
+        self.assertEqual(extract_forbidden_words(text), [])
+
+    def test_extract_is_unique_in_order(self):
+        text = "masterpiece, stunning light, another masterpiece"
+        self.assertFalse(validate_no_forbidden_words(text))
+        self.assertEqual(extract_forbidden_words(text), ["masterpiece", "stunning"])
+        self.assertEqual(len(find_forbidden_words(text)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
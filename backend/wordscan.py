@@ -0,0 +1,193 @@
+"""
+Multi-pattern word scanner with word-boundary semantics
+
+The pattern set is folded into a trie (the goto structure of Aho–Corasick)
+and compiled once into a single regular expression, so a text is scanned in
+one pass by the C regex engine instead of one substring scan per pattern.
+Matches only count on token boundaries: "man" does not match inside
+"German" or "performance".
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+
+class WordMatch(NamedTuple):
+    """One pattern occurrence; ``start``/``end`` index into the scanned text."""
+    word: str
+    start: int
+    end: int
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Compile a word list into a prefix-sharing regex alternation."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Longer continuations first, the shorter word as fallback
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class WordMatcher:
+    """
+    Precompiled, case-insensitive matcher for a fixed set of words/phrases.
+
+    Matches are leftmost-longest and non-overlapping ("a man" is reported
+    once, not additionally as "man").
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words = frozenset(w.lower() for w in words if w)
+        pattern = "(?:" + _trie_pattern(sorted(self.words)) + r")\b"
+        self._regex = re.compile(pattern)
+        # Fallback for texts whose lower-casing changes their length
+        self._regex_ci = re.compile(pattern, re.IGNORECASE)
+
+    def finditer(self, text: str) -> Iterator[WordMatch]:
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return self._scan(lowered, self._regex, 0)
+        return self._scan(text, self._regex_ci, 0)
+
+    def _scan(self, haystack: str, regex: "re.Pattern[str]", position: int) -> Iterator[WordMatch]:
+        while True:
+            match = regex.search(haystack, position)
+            if match is None:
+                return
+            start, end = match.span()
+            if start > 0 and _is_word_char(haystack[start - 1]):
+                # Inside a longer word - retry one character later so a
+                # shorter pattern inside this span is not skipped
+                position = start + 1
+                continue
+            yield WordMatch(match.group().lower(), start, end)
+            position = end
+
+    def find_all(self, text: str) -> List[WordMatch]:
+        return list(self.finditer(text))
+
+    def contains_any(self, text: str) -> bool:
+        return next(self.finditer(text), None) is not None
+
+    def stream(self) -> "StreamScanner":
+        """Incremental scanner for text that arrives in chunks."""
+        return StreamScanner(self)
+
+
+class StreamScanner:
+    """
+    Scans a growing text chunk by chunk with the same results as one
+    ``finditer`` over the complete text.
+
+    A match is only reported once it cannot change any more: the text must
+    extend at least one character (for the word boundary) past the longest
+    pattern that could start there. Only that undecided tail is rescanned
+    with the next chunk.
+    """
+
+    def __init__(self, matcher: WordMatcher):
+        self.matcher = matcher
+        self._horizon = max((len(w) for w in matcher.words), default=0) + 1
+        self._parts: List[str] = []
+        self._haystack = ""  # lower-cased text (or the original if lower-casing changes lengths)
+        self._case_fallback = False
+        self._position = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> List[WordMatch]:
+        """Append ``chunk``; returns the matches that became final (offsets into :attr:`text`)."""
+        self._parts.append(chunk)
+        lowered = chunk.lower()
+        if not self._case_fallback and len(lowered) != len(chunk):
+            self._case_fallback = True
+            self._haystack = "".join(self._parts[:-1])
+        self._haystack += chunk if self._case_fallback else lowered
+        return self._advance(final=False)
+
+    def finish(self) -> List[WordMatch]:
+        """Matches in the remaining tail once the text is complete."""
+        return self._advance(final=True)
+
+    def _advance(self, final: bool) -> List[WordMatch]:
+        regex = self.matcher._regex_ci if self._case_fallback else self.matcher._regex
+        decided = len(self._haystack) if final else len(self._haystack) - self._horizon
+        found: List[WordMatch] = []
+        for match in self.matcher._scan(self._haystack, regex, self._position):
+            if match.start > decided:
+                self._position = match.start
+                return found
+            found.append(match)
+            self._position = match.end
+        self._position = max(self._position, decided)
+        return found
+
+
+if __name__ == "__main__":
+    # Benchmark: legacy per-word substring loop vs. single-pass matcher
+    # on a ~1,000-word prompt.
+    import random
+    import timeit
+
+    from backend.models import FORBIDDEN_WORDS, find_forbidden_words
+
+    vocabulary = (
+        "Valentina Ruiz stands at the outdoor café table in the historic piazza of Bari, "
+        "one hand holding an espresso cup while soft daylight falls across the baroque "
+        "facade. Warm stone, long shadows, linen blazer, German tourists, street "
+        "performance, craftsmen, hazel eyes with gold flecks, three-quarter view."
+    ).split()
+    rng = random.Random(42)
+    clean = " ".join(rng.choice(vocabulary) for _ in range(1000))
+    dirty = clean + " a stunning masterpiece"
+
+    def legacy(text: str, words: Iterable[str] = FORBIDDEN_WORDS) -> List[str]:
+        # validate_no_forbidden_words + extract_forbidden_words as before
+        text_lower = text.lower()
+        found = [word for word in words if word in text_lower]
+        if found:
+            text_lower = text.lower()
+            found = [word for word in words if word in text_lower]
+        return found
+
+    def best_of(fn) -> float:
+        runs = 1000
+        return min(timeit.repeat(fn, number=runs, repeat=5)) / runs
+
+    for label, text in (("clean", clean), ("with hits", dirty)):
+        old = best_of(lambda: legacy(text))
+        new = best_of(lambda: find_forbidden_words(text))
+        print(
+            f"{label:>10}: legacy {old * 1e6:7.1f} µs  matcher {new * 1e6:7.1f} µs  "
+            f"speedup {old / new:4.1f}x  legacy hits {sorted(legacy(text))}  "
+            f"matcher hits {[m.word for m in find_forbidden_words(text)]}"
+        )
+
+    # Cost of the legacy loop grows with the word list, the matcher's barely does
+    extended = list(FORBIDDEN_WORDS) + [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8)) for _ in range(200)
+    ]
+    matcher = WordMatcher(extended)
+    old = best_of(lambda: legacy(clean, extended))
+    new = best_of(lambda: matcher.find_all(clean))
+    print(
+        f"{len(extended)} words: legacy {old * 1e6:7.1f} µs  matcher {new * 1e6:7.1f} µs  "
+        f"speedup {old / new:4.1f}x"
+    )